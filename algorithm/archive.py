@@ -0,0 +1,411 @@
+# algorithms/archive.py
+# Array-backed MAP-Elites archive.
+# Scores and BD coordinates of every elite live in preallocated NumPy tensors indexed by
+# (*grid cell, slot), with an occupancy mask, so archive statistics are vectorized reductions.
+# Long text payloads are interned once in a reference-counted side store.
+
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import config
+from .pareto_front import ParetoFront
+
+class TextStore:
+    """Interns strings under integer IDs. Each distinct text is held once; IDs are reference counted."""
+    def __init__(self):
+        self._texts: List[Optional[str]] = []
+        self._refs: List[int] = []
+        self._ids: Dict[str, int] = {}
+        self._free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def intern(self, text: str) -> int:
+        text_id = self._ids.get(text)
+        if text_id is None:
+            if self._free:
+                text_id = self._free.pop()
+                self._texts[text_id] = text
+                self._refs[text_id] = 0
+            else:
+                text_id = len(self._texts)
+                self._texts.append(text)
+                self._refs.append(0)
+            self._ids[text] = text_id
+        self._refs[text_id] += 1
+        return text_id
+
+    def get(self, text_id: int) -> str:
+        return self._texts[text_id]
+
+    def release(self, text_id: int):
+        self._refs[text_id] -= 1
+        if self._refs[text_id] == 0:
+            del self._ids[self._texts[text_id]]
+            self._texts[text_id] = None
+            self._free.append(text_id)
+
+
+class GridArchive:
+    """
+    Multi-objective grid archive: each cell holds a ParetoFront of at most `capacity` elites.
+
+    - scores:     float tensor (*grid_shape, capacity, num_objectives), NaN in empty slots
+    - bd:         float tensor (*grid_shape, capacity, bd_dim), NaN in empty slots
+    - elite_ids:  int tensor (*grid_shape, capacity), -1 in empty slots
+    - occupied:   bool mask (*grid_shape, capacity)
+    - cell_hypervolume: float tensor (*grid_shape) of per-cell hypervolumes
+
+    Read access mirrors the old Dict[cell, List[elite]]: keys are occupied cells in the order
+    they were first filled, and archive[cell] materializes the cell's elites as dicts.
+    """
+    TEXT_FIELDS = ("prompt_text", "solution_text", "parent_prompt_text")
+
+    def __init__(self, grid_shape: Sequence[int], capacity: int, num_objectives: int = 2,
+                 bd_dim: Optional[int] = None, reference_point: Optional[Sequence[float]] = None):
+        self.grid_shape = tuple(grid_shape)
+        self.capacity = capacity
+        self.num_objectives = num_objectives
+        self.bd_dim = bd_dim if bd_dim is not None else len(self.grid_shape)
+        self.reference_point = reference_point
+        self.texts = TextStore()
+        self._fronts: Dict[Tuple[int, ...], ParetoFront] = {}
+        self._next_id = 0
+        self._allocate_storage()
+
+    # --- storage layout (overridden by SparseGridArchive) ---
+
+    def _allocate_storage(self):
+        slots = self.grid_shape + (self.capacity,)
+        self.scores = np.full(slots + (self.num_objectives,), np.nan)
+        self.bd = np.full(slots + (self.bd_dim,), np.nan)
+        self.elite_ids = np.full(slots, -1, dtype=np.int64)
+        self.occupied = np.zeros(slots, dtype=bool)
+        self.cell_hypervolume = np.zeros(self.grid_shape)
+        self.cell_rank = np.full(self.grid_shape, -1, dtype=np.int64)  # order cells were first filled
+
+    def _new_cell(self, cell: Tuple[int, ...]):
+        """Storage index of a cell that is being filled for the first time."""
+        self.cell_rank[cell] = len(self._fronts) - 1
+        return cell
+
+    def _storage_index(self, cell: Tuple[int, ...]):
+        return cell
+
+    def _slot_ranks(self, slots: Tuple[np.ndarray, ...]) -> np.ndarray:
+        """First-filled rank of the cell of each occupied slot."""
+        return self.cell_rank[slots[:-1]]
+
+    # --- insertion ---
+
+    def add(self, elite: Dict[str, Any]) -> bool:
+        """
+        Offers an elite to the Pareto front of its cell (elite['bd_bin_coords']).
+        Returns True if it is on the front afterwards.
+        """
+        cell = tuple(int(c) for c in elite['bd_bin_coords'])
+        if len(cell) != len(self.grid_shape):
+            raise ValueError(f"Cell {cell} does not match the archive's {len(self.grid_shape)}-D grid.")
+        front = self._fronts.get(cell)
+        if front is None:
+            front = self._fronts[cell] = ParetoFront(capacity=self.capacity, reference_point=self.reference_point)
+            index = self._new_cell(cell)
+        else:
+            index = self._storage_index(cell)
+
+        record = dict(elite)
+        record['_elite_id'] = self._next_id
+        self._next_id += 1
+        for field in self.TEXT_FIELDS:
+            if record.get(field) is not None:
+                record[field] = self.texts.intern(record[field])
+
+        before = {r['_elite_id']: r for r in front}
+        accepted = front.insert(record)
+        after = {r['_elite_id'] for r in front}
+        for elite_id, old in before.items():
+            if elite_id not in after:
+                self._release(old)
+        if not accepted:
+            self._release(record)
+        self._write_cell(index, front)
+        return accepted
+
+    def _release(self, record: Dict[str, Any]):
+        for field in self.TEXT_FIELDS:
+            if record.get(field) is not None:
+                self.texts.release(record[field])
+
+    def _write_cell(self, index, front: ParetoFront):
+        n = len(front)
+        self.scores[index] = np.nan
+        self.bd[index] = np.nan
+        self.elite_ids[index] = -1
+        self.occupied[index] = False
+        if n:
+            self.scores[index][:n] = [r['scores'] for r in front]
+            self.bd[index][:n] = [r['bd_float_coords'] for r in front]
+            self.elite_ids[index][:n] = [r['_elite_id'] for r in front]
+            self.occupied[index][:n] = True
+        if self.reference_point is not None:
+            self.cell_hypervolume[index] = front.hypervolume
+
+    # --- mapping-like read access ---
+
+    def _materialize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        elite = {k: v for k, v in record.items() if k != '_elite_id'}
+        for field in self.TEXT_FIELDS:
+            if elite.get(field) is not None:
+                elite[field] = self.texts.get(elite[field])
+        return elite
+
+    def __len__(self) -> int:
+        return len(self._fronts)
+
+    def __contains__(self, cell) -> bool:
+        return tuple(cell) in self._fronts
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        return iter(self._fronts)
+
+    def keys(self):
+        return self._fronts.keys()
+
+    def __getitem__(self, cell) -> List[Dict[str, Any]]:
+        return [self._materialize(r) for r in self._fronts[tuple(cell)]]
+
+    def get(self, cell, default=None):
+        return self[cell] if cell in self else default
+
+    def items(self):
+        for cell in self._fronts:
+            yield cell, self[cell]
+
+    def values(self):
+        for cell in self._fronts:
+            yield self[cell]
+
+    # --- vectorized statistics ---
+
+    @property
+    def num_elites(self) -> int:
+        return int(self.occupied.sum())
+
+    @property
+    def num_cells(self) -> int:
+        """Number of cells in the grid, occupied or not."""
+        return int(np.prod(self.grid_shape))
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of grid cells holding at least one elite."""
+        return int(self.occupied[..., 0].sum()) / self.num_cells
+
+    @property
+    def qd_score(self) -> float:
+        """MOME QD-score: the sum of the per-cell hypervolumes."""
+        return float(self.cell_hypervolume.sum())
+
+    def elite_slots(self) -> Tuple[np.ndarray, ...]:
+        """Index arrays of the occupied slots, ordered like iterating the cells and their elites."""
+        slots = np.nonzero(self.occupied)
+        order = np.lexsort((slots[-1], self._slot_ranks(slots)))
+        return tuple(axis[order] for axis in slots)
+
+    def elite_scores(self) -> np.ndarray:
+        """(num_elites, num_objectives) array of every elite's scores, in elite_slots() order."""
+        return self.scores[self.elite_slots()]
+
+    def elite_field(self, field: str) -> List[Any]:
+        """A field of every elite that has it, in elite_slots() order."""
+        values = [r[field] for front in self._fronts.values() for r in front if field in r]
+        if field in self.TEXT_FIELDS:
+            values = [self.texts.get(v) if v is not None else None for v in values]
+        return values
+
+
+class SparseGridArchive(GridArchive):
+    """
+    GridArchive for N-D grids that only allocates storage for occupied cells.
+    Cells are hashed by their flat (raveled) grid index to a row of growable tensors:
+    scores (rows, capacity, n_obj), bd (rows, capacity, bd_dim), elite_ids, occupied and
+    cell_hypervolume (rows,). Rows are handed out in first-filled order, so a row is also
+    its cell's rank. A 20^4 grid costs memory only for the cells actually reached.
+    """
+    INITIAL_ROWS = 64
+
+    def _allocate_storage(self):
+        rows = self.INITIAL_ROWS
+        self.scores = np.full((rows, self.capacity, self.num_objectives), np.nan)
+        self.bd = np.full((rows, self.capacity, self.bd_dim), np.nan)
+        self.elite_ids = np.full((rows, self.capacity), -1, dtype=np.int64)
+        self.occupied = np.zeros((rows, self.capacity), dtype=bool)
+        self.cell_hypervolume = np.zeros(rows)
+        self.cell_flat_index = np.full(rows, -1, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+
+    def flat_index(self, cell: Sequence[int]) -> int:
+        return int(np.ravel_multi_index(tuple(cell), self.grid_shape))
+
+    def _grow(self):
+        def extend(array: np.ndarray, fill) -> np.ndarray:
+            extra = np.full(array.shape, fill, dtype=array.dtype)
+            return np.concatenate([array, extra])
+        self.scores = extend(self.scores, np.nan)
+        self.bd = extend(self.bd, np.nan)
+        self.elite_ids = extend(self.elite_ids, -1)
+        self.occupied = extend(self.occupied, False)
+        self.cell_hypervolume = extend(self.cell_hypervolume, 0.0)
+        self.cell_flat_index = extend(self.cell_flat_index, -1)
+
+    def _new_cell(self, cell: Tuple[int, ...]) -> int:
+        row = len(self._rows)
+        if row == self.scores.shape[0]:
+            self._grow()
+        flat = self.flat_index(cell)
+        self._rows[flat] = row
+        self.cell_flat_index[row] = flat
+        return row
+
+    def _storage_index(self, cell: Tuple[int, ...]) -> int:
+        return self._rows[self.flat_index(cell)]
+
+    def _slot_ranks(self, slots: Tuple[np.ndarray, ...]) -> np.ndarray:
+        return slots[0]
+
+    def occupied_cells(self) -> np.ndarray:
+        """(num_occupied, n_dims) array of occupied cell coordinates, in first-filled order."""
+        flat = self.cell_flat_index[:len(self._rows)]
+        return np.stack(np.unravel_index(flat, self.grid_shape), axis=-1)
+
+
+class CVTArchive(GridArchive):
+    """
+    Centroidal Voronoi Tessellation archive: one cell per centroid, keyed (index,).
+    Candidates are assigned to their nearest centroid with a KD-tree, so the number of
+    cells is set independently of the BD dimensionality.
+    """
+    def __init__(self, centroids: np.ndarray, capacity: int, **kwargs):
+        self.centroids = np.asarray(centroids, dtype=float)
+        kwargs.setdefault('bd_dim', self.centroids.shape[1])
+        super().__init__((self.centroids.shape[0],), capacity, **kwargs)
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            from scipy.spatial import cKDTree  # type: ignore
+            self._tree = cKDTree(self.centroids)
+        return self._tree
+
+    def assign_batch(self, bd_float_coords: np.ndarray) -> np.ndarray:
+        """Nearest-centroid index of each row of an (n, bd_dim) array, in one KD-tree query."""
+        _, indices = self.tree.query(np.atleast_2d(np.asarray(bd_float_coords, dtype=float)))
+        return np.asarray(indices, dtype=np.int64)
+
+    def __getstate__(self):
+        # The KD-tree is rebuilt on demand instead of being pickled into checkpoints.
+        state = dict(self.__dict__)
+        state['_tree'] = None
+        return state
+
+
+def compute_cvt_centroids(n_centroids: int, samples: np.ndarray, seed: int = 0) -> np.ndarray:
+    """k-means centroids of the given BD samples."""
+    from sklearn.cluster import KMeans  # type: ignore
+    samples = np.asarray(samples, dtype=float)
+    if samples.shape[0] < n_centroids:
+        raise ValueError(f"Need at least {n_centroids} samples for {n_centroids} CVT centroids, got {samples.shape[0]}.")
+    kmeans = KMeans(n_clusters=n_centroids, n_init=1, random_state=seed).fit(samples)
+    return kmeans.cluster_centers_
+
+def load_or_build_cvt_centroids(path: str, n_centroids: int, samples: np.ndarray, seed: int = 0) -> np.ndarray:
+    """
+    Loads cached CVT centroids from `path` (.npz) if they were built for the same number of
+    centroids, seed and samples; otherwise runs k-means on the samples and caches the result.
+    """
+    samples = np.asarray(samples, dtype=float)
+    samples_hash = hashlib.sha256(np.ascontiguousarray(samples).tobytes()).hexdigest()
+    if os.path.exists(path):
+        cached = np.load(path)
+        if (int(cached['n_centroids']) == n_centroids and int(cached['seed']) == seed
+                and str(cached['samples_hash']) == samples_hash):
+            return cached['centroids']
+        print(f"CVT centroids in {path} are stale; recomputing.")
+    print(f"Computing {n_centroids} CVT centroids from {samples.shape[0]} samples...")
+    centroids = compute_cvt_centroids(n_centroids, samples, seed)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, centroids=centroids, n_centroids=n_centroids, seed=seed, samples_hash=samples_hash)
+    os.replace(tmp_path, path)
+    return centroids
+
+def load_cvt_centroids(path: str) -> np.ndarray:
+    """The centroids cached at `path` by load_or_build_cvt_centroids."""
+    if not os.path.exists(path):
+        raise ValueError(f"No CVT centroids at {path}. A 'cvt' archive needs the centroids it was built with: "
+                         f"pass centroids= or centroids_path=, or run MAP-Elites with ARCHIVE_BACKEND = 'cvt' first.")
+    with np.load(path) as cached:
+        return cached['centroids']
+
+def make_cvt_archive(grid_shape: Optional[Sequence[int]], capacity: int, centroids: Optional[np.ndarray] = None,
+                     centroids_path: Optional[str] = None, **kwargs) -> CVTArchive:
+    """
+    A CVTArchive over `centroids`, or over the centroids cached at `centroids_path`
+    (default config.CVT_CENTROIDS_PATH). The cells are set by the centroids, so `grid_shape`
+    may be None; otherwise it must be (number of centroids,).
+    """
+    if centroids is None:
+        centroids = load_cvt_centroids(centroids_path or config.CVT_CENTROIDS_PATH)
+    archive = CVTArchive(centroids, capacity, **kwargs)
+    if grid_shape is not None and tuple(grid_shape) != archive.grid_shape:
+        raise ValueError(f"Grid shape {tuple(grid_shape)} does not match the {archive.grid_shape[0]} CVT centroids.")
+    return archive
+
+
+ARCHIVE_BACKENDS = {
+    "grid": GridArchive,
+    "sparse": SparseGridArchive,
+    "cvt": make_cvt_archive,
+}
+
+def make_archive(backend: str, grid_shape: Optional[Sequence[int]], capacity: int, **kwargs) -> GridArchive:
+    """Creates an empty archive of the given backend ("grid", "sparse" or "cvt"; see make_cvt_archive)."""
+    if backend not in ARCHIVE_BACKENDS:
+        raise ValueError(f"Unknown archive backend '{backend}'. Choose from {sorted(ARCHIVE_BACKENDS)}.")
+    return ARCHIVE_BACKENDS[backend](grid_shape, capacity, **kwargs)
+
+def parse_cell_key(key: str) -> Tuple[int, ...]:
+    """Inverse of str(cell) as written by save_archive, e.g. "(3, 0, 7)" -> (3, 0, 7)."""
+    return tuple(int(part) for part in key.strip("()[] ").split(",") if part.strip())
+
+def load_archive(path: str, backend: Optional[str] = None, grid_shape: Optional[Sequence[int]] = None,
+                 capacity: Optional[int] = None, **kwargs) -> GridArchive:
+    """
+    Rebuilds an archive from a JSON file written by MAPElitesAlgorithm.save_archive.
+    The grid shape defaults to the smallest one containing every saved cell, the capacity to
+    the largest saved cell, and the backend to sparse for grids of more than two dimensions.
+    CVT archives are not recognised from the file: pass backend="cvt", and the centroids
+    (centroids= or centroids_path=, default config.CVT_CENTROIDS_PATH) set the cells.
+    """
+    with open(path, 'r') as f:
+        saved = json.load(f)
+    cells = {parse_cell_key(key): elites for key, elites in saved.items()}
+    if grid_shape is None and backend != "cvt":
+        grid_shape = tuple(int(v) + 1 for v in np.max(list(cells), axis=0)) if cells else (1,)
+    if capacity is None:
+        capacity = max((len(elites) for elites in cells.values()), default=1)
+    if backend is None:
+        backend = "sparse" if len(grid_shape) > 2 else "grid"
+    archive = make_archive(backend, grid_shape, capacity, **kwargs)
+    outside = [cell for cell in cells if len(cell) != len(archive.grid_shape)
+               or any(not 0 <= c < n for c, n in zip(cell, archive.grid_shape))]
+    if outside:
+        raise ValueError(f"Saved cells {outside[:5]} lie outside the archive's cells {archive.grid_shape}.")
+    for cell, elites in cells.items():
+        for elite in elites:
+            archive.add(dict(elite, bd_bin_coords=cell))
+    return archive
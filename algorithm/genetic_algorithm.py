@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
 from .nds_utils import fast_non_dominated_sort, calculate_crowding_distance
 from analysis_utils import compute_hypervolume
+from fitness_memo import FitnessMemo, genotype_key
 
 if TYPE_CHECKING:
     from cfg_generator import CFGPromptGenerator
@@ -53,6 +54,7 @@ class GeneticAlgorithm:
         self.task_loader = task_loader
         self.solution_evaluator = solution_evaluator
         self.population: List[Dict[str, Any]] = []
+        self.fitness_memo = FitnessMemo()
         self.fixed_problem_id: Optional[str] = None  # <-- Add this line
 
     def _create_and_evaluate_individual(self, generation: int, genotype: Optional[Dict] = None) -> Dict[str, Any]:
@@ -68,7 +70,9 @@ class GeneticAlgorithm:
             del genotype["start"]
         genotype["macgyver_problem_text"] = problem['problem_text']
         prompt_text = self.cfg_generator.construct_full_prompt(genotype, problem['problem_text'])
-        eval_results = self.solution_evaluator.evaluate_prompt(prompt_text, problem['problem_text'])
+        eval_results = self.fitness_memo.get_or_evaluate(
+            genotype_key(genotype, problem['problem_id']),
+            lambda: self.solution_evaluator.evaluate_prompt(prompt_text, problem['problem_text']))
         prompt_text = decode_unicode(prompt_text)
         solution_text = extract_pure_solution(decode_unicode(eval_results['solution_text']))
         candidate_data = {
@@ -77,7 +81,7 @@ class GeneticAlgorithm:
             "scores": [eval_results['raw_divergent'], eval_results['raw_convergent']],
             "individual_scores": eval_results['scores'],
             "solution_text": solution_text,
-            "problem_id": problem['id'],
+            "problem_id": problem['problem_id'],
             "category": problem['category'],  # <-- Add this line
             "generation": generation
         }
@@ -136,10 +140,7 @@ class GeneticAlgorithm:
         print(f"Generation {generation}: Pop Size={log_entry['population_size']}, Non-Dominated={log_entry['num_non_dominated']}. Avg Conv: {log_entry['avg_convergent']:.2f}, Avg Divergent: {log_entry['avg_divergent_creativity']:.4f}")
 
         # Compute hypervolume and archive convergence
-        points = df[['raw_divergent', 'raw_convergent']].values.tolist()
-        points = [[max(0.0, x), max(0.0, y)] for x, y in points]  # Clamp negatives to zero
-        reference_point = [0.0, 0.0]
-        hypervolume = compute_hypervolume(points, reference_point)
+        hypervolume = compute_hypervolume(df[['raw_divergent', 'raw_convergent']].values, config.HYPERVOLUME_REFERENCE_POINT)
         hv_log = {
             "generation": generation,
             "hypervolume": hypervolume
@@ -215,6 +216,7 @@ class GeneticAlgorithm:
                 self.save_population(f"ga_population_gen_{gen}.json")  # Save every 2 generations
 
         print("--- Genetic Algorithm Run Finished ---")
+        print(f"Fitness memo: {self.fitness_memo.stats()}")
         self.save_population("ga_final_population.json")
         return self.population
 
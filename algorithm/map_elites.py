@@ -4,10 +4,12 @@
 import os
 import sys
 import json
+import pickle
 import random
 import re
+import threading
 import numpy as np
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from typing import Dict, Any, List, Tuple, Optional, TYPE_CHECKING
 
@@ -15,8 +17,12 @@ from typing import Dict, Any, List, Tuple, Optional, TYPE_CHECKING
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
-from .nds_utils import fast_non_dominated_sort, calculate_crowding_distance
+from .archive import CVTArchive, GridArchive, load_or_build_cvt_centroids, make_archive
 from analysis_utils import compute_hypervolume
+from bd_table import bin_coords_batch, style_string as build_style_string
+from fitness_memo import FitnessMemo, genotype_key
+from llm_cache import replay_scope
+from umap_artifacts import compute_bounds, load_umap_artifacts, save_umap_artifacts
 # from evaluation import LexicalDiversityCalculator  # Commented out, not used
 
 if TYPE_CHECKING:
@@ -25,6 +31,7 @@ if TYPE_CHECKING:
     from evaluation import SolutionEvaluator
     from llm_services import LLM_API_Handler
     from umap import UMAP  # type: ignore
+    from bd_table import BehaviorDescriptorTable
 
 def extract_pure_solution(raw_output: str) -> str:
     """
@@ -49,7 +56,8 @@ class MAPElitesAlgorithm:
                  task_loader: 'TaskLoader', 
                  solution_evaluator: 'SolutionEvaluator', 
                  llm_handler: 'LLM_API_Handler', 
-                 umap_model: 'UMAP'):
+                 umap_model: 'UMAP',
+                 bd_table: Optional['BehaviorDescriptorTable'] = None):
         self.cfg_generator = cfg_generator
         self.task_loader = task_loader
         self.solution_evaluator = solution_evaluator
@@ -57,13 +65,31 @@ class MAPElitesAlgorithm:
         self.umap_model = umap_model
         
         self.grid_shape = config.GRID_SHAPE
-        self.archive: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
         
         self.umap_min, self.umap_max = self._calculate_umap_bounds()
         print(f"UMAP bounds calculated: Min={self.umap_min}, Max={self.umap_max}")
+        self.archive = self._create_archive()
+
+        # Optional precomputed BD table: style genes -> (BD coords, bin) without embedding or UMAP.
+        self.bd_table = bd_table
+        if self.bd_table is not None:
+            if isinstance(self.archive, CVTArchive):
+                self.bd_table.bins = self.archive.assign_batch(self.bd_table.coords)[:, None]
+            else:
+                self.bd_table.ensure_bins(self.umap_min, self.umap_max, self.grid_shape)
+            print(f"Using precomputed BD table with {len(self.bd_table)} style combinations.")
 
         self._pending_evals: List[Dict[str, Any]] = []
         self._embedding_cache: Dict[str, np.ndarray] = {}
+        self._umap_lock = threading.Lock()
+        self.evaluation_workers = config.EVALUATION_WORKERS
+        # Generations are selected up front and evaluated as a batch when evaluating in parallel
+        # or through the pipelined evaluator; otherwise each parent sees the previous insertions.
+        self.batch_generations = self.evaluation_workers > 1 or hasattr(solution_evaluator, "iter_evaluations")
+        self.evaluations = 0
+        self.fitness_memo = FitnessMemo()
+        # Individuals prepared so far in the current generation; names their LLM replay scope.
+        self._replay_position: Tuple[int, int] = (-1, 0)
         
         self.fixed_problem_id: Optional[str] = None 
     
@@ -71,8 +97,14 @@ class MAPElitesAlgorithm:
 
     def _calculate_umap_bounds(self) -> Tuple[List[float], List[float]]:
         """
-        Loads the prompt dataset used for UMAP training to find the projection space boundaries.
+        Loads the projection space boundaries persisted by prepare_umap.py. If they are missing
+        or stale, re-embeds the UMAP training prompts to compute them and persists the result.
         """
+        artifacts = load_umap_artifacts()
+        if artifacts is not None:
+            print("Loaded persisted UMAP boundaries.")
+            return artifacts['umap_min'], artifacts['umap_max']
+
         print("Calculating dynamic UMAP boundaries...")
         try:
             with open(config.UMAP_PROMPT_DATASET_PATH, 'r') as f:
@@ -80,13 +112,8 @@ class MAPElitesAlgorithm:
             
             prompt_texts = [item['prompt_text'] for item in prompts_data]
 
-            def batch_list(data, batch_size):
-                return [data[i:i + batch_size] for i in range(0, len(data), batch_size)]
-
             all_embeddings = []
-            batch_size = 32  # Reduce if you still get 413 errors
-            for batch in batch_list(prompt_texts, batch_size):
-                batch_emb = self.llm_handler.get_embeddings(batch)
+            for batch_emb in self.llm_handler.get_embeddings_batch(prompt_texts, config.EMBEDDING_BATCH_SIZE):
                 if batch_emb is not None:
                     all_embeddings.append(batch_emb)
             if not all_embeddings:
@@ -94,45 +121,56 @@ class MAPElitesAlgorithm:
             embeddings = np.vstack(all_embeddings)
             
             transformed_coords = self.umap_model.transform(embeddings)
+            save_umap_artifacts(embeddings, transformed_coords)
             
-            min_bounds = np.min(transformed_coords, axis=0)
-            max_bounds = np.max(transformed_coords, axis=0)
-            padding = (max_bounds - min_bounds) * 0.10
-            
-            return (min_bounds - padding).tolist(), (max_bounds + padding).tolist()
+            return compute_bounds(transformed_coords)
 
         except (FileNotFoundError, ValueError) as e:
             print(f"Warning: Could not calculate dynamic UMAP bounds ({e}). Falling back to default [-5, 5].")
-            return [-5.0, -5.0], [5.0, 5.0]
-
-    def _get_bin_coords(self, bd_float_coords: np.ndarray) -> Tuple[int, int]:
+            return [-5.0] * config.UMAP_N_COMPONENTS, [5.0] * config.UMAP_N_COMPONENTS
+
+    def _create_archive(self) -> GridArchive:
+        """Creates the empty archive selected by config.ARCHIVE_BACKEND."""
+        if config.ARCHIVE_BACKEND == "cvt":
+            artifacts = load_umap_artifacts()
+            if artifacts is not None:
+                samples = artifacts['coords']
+            else:
+                # Without stored projections, tessellate the BD bounds uniformly instead.
+                print("No stored UMAP projections; fitting CVT centroids to uniform samples of the BD bounds.")
+                rng = np.random.default_rng(0)
+                samples = rng.uniform(self.umap_min, self.umap_max,
+                                      size=(100 * config.CVT_NUM_CENTROIDS, len(self.umap_min)))
+            centroids = load_or_build_cvt_centroids(config.CVT_CENTROIDS_PATH, config.CVT_NUM_CENTROIDS, samples)
+            return make_archive("cvt", None, config.CELL_CAPACITY_LIMIT, centroids=centroids,
+                                reference_point=config.HYPERVOLUME_REFERENCE_POINT)
+
+        if len(self.grid_shape) != config.UMAP_N_COMPONENTS:
+            raise ValueError(f"GRID_SHAPE {self.grid_shape} needs one entry per UMAP component ({config.UMAP_N_COMPONENTS}).")
+        return make_archive(config.ARCHIVE_BACKEND, self.grid_shape, config.CELL_CAPACITY_LIMIT,
+                            bd_dim=config.UMAP_N_COMPONENTS,
+                            reference_point=config.HYPERVOLUME_REFERENCE_POINT)
+
+    def _get_bin_coords(self, bd_float_coords: np.ndarray) -> Tuple[int, ...]:
         """Maps continuous BD coordinates to discrete grid bin indices."""
-        x, y = bd_float_coords
-        x_bin = int(np.clip((x - self.umap_min[0]) / (self.umap_max[0] - self.umap_min[0]) * self.grid_shape[0], 0, self.grid_shape[0] - 1))
-        y_bin = int(np.clip((y - self.umap_min[1]) / (self.umap_max[1] - self.umap_min[1]) * self.grid_shape[1], 0, self.grid_shape[1] - 1))
-        return (x_bin, y_bin)
-
-    def _place_in_archive(self, candidate: Dict[str, Any]):
-        """Places a new candidate into the archive using NDS for its cell."""
-        bin_coords = candidate['bd_bin_coords']
-        current_front = self.archive.get(bin_coords, [])
-        combined = current_front + [candidate]
-        
-        front_indices_list = fast_non_dominated_sort(combined)
-        if not front_indices_list: 
-            return
-        
-        new_front_indices = front_indices_list[0]
-        new_front = [combined[i] for i in new_front_indices]
+        return self._get_bin_coords_batch(np.atleast_2d(bd_float_coords))[0]
 
-        if len(new_front) > config.CELL_CAPACITY_LIMIT:
-            distances = calculate_crowding_distance(new_front)
-            sorted_by_crowding = sorted(zip(new_front, distances), key=lambda x: x[1], reverse=True)
-            new_front = [item for item, dist in sorted_by_crowding[:config.CELL_CAPACITY_LIMIT]]
+    def _get_bin_coords_batch(self, bd_float_coords: np.ndarray) -> List[Tuple[int, ...]]:
+        """Bins an (n, d) array of BD coordinates in one vectorized pass."""
+        if isinstance(self.archive, CVTArchive):
+            return [(int(i),) for i in self.archive.assign_batch(bd_float_coords)]
+        bins = bin_coords_batch(bd_float_coords, self.umap_min, self.umap_max, self.grid_shape)
+        return [tuple(int(b) for b in row) for row in bins]
 
-        self.archive[bin_coords] = new_front
+    def _place_in_archive(self, candidate: Dict[str, Any]):
+        """Offers a new candidate to the Pareto front of its cell."""
+        self.archive.add(candidate)
 
-    def _evaluate_and_place_new_individual(self, generation: int, genotype: Optional[Dict] = None, parent_prompt_text: Optional[str] = None):
+    def _prepare_individual(self, generation: int, genotype: Optional[Dict] = None, parent_prompt_text: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Draws everything random about a new individual (genotype if none is given, problem)
+        and builds its prompt. Runs on the main thread so seeded runs stay reproducible.
+        """
         if genotype is None:
             genotype = self.cfg_generator.generate_random_genotype()
         
@@ -144,28 +182,63 @@ class MAPElitesAlgorithm:
         genotype = genotype.copy()
         genotype["macgyver_problem_text"] = problem['problem_text']  # Store actual problem text
         prompt_text = self.cfg_generator.construct_full_prompt(genotype, problem['problem_text'])
+        last_generation, position = self._replay_position
+        position = position + 1 if generation == last_generation else 0
+        self._replay_position = (generation, position)
+        return {
+            "generation": generation,
+            "genotype": genotype,
+            "problem": problem,
+            "prompt_text": prompt_text,
+            "parent_prompt_text": parent_prompt_text,
+            "replay_scope": f"{generation}:{position}",
+        }
 
-        eval_results = self.solution_evaluator.evaluate_prompt(prompt_text, problem['problem_text'])
+    def _evaluate_individual(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Runs the network-bound part for a prepared individual: solution evaluation and BD.
+        Safe to call from worker threads. Returns None if the BD could not be computed.
+        Evaluation results already produced by the pipelined evaluator are used as they are.
+        """
+        genotype = job['genotype']
+        problem = job['problem']
+        prompt_text = job['prompt_text']
 
-        # --- Embed only the prompt style (without the problem text) for BD ---
-        # Construct a style-only string (adjust keys as needed for your genes)
-        style_string = f"{genotype.get('role_instruction', '')} {genotype.get('format_instruction', '')} {genotype.get('creativity_instruction', '')}".strip()
+        eval_results = job.pop('eval_results', None)
+        if eval_results is None:
+            with replay_scope(job.get('replay_scope')):
+                eval_results, job['memo_reused'] = self.fitness_memo.lookup_or_evaluate(
+                    genotype_key(genotype, problem['problem_id']),
+                    lambda: self.solution_evaluator.evaluate_prompt(prompt_text, problem['problem_text']))
 
-        if style_string in self._embedding_cache:
-            embedding = self._embedding_cache[style_string]
+        # --- Embed only the prompt style (without the problem text) for BD ---
+        # Styles from the grammar are looked up in the precomputed BD table; anything else
+        # falls back to embedding the style-only string and projecting it through UMAP.
+        # BDs precomputed for the whole batch by _compute_bds_batch are used as they are.
+        tabulated = job.get('bd')
+        if tabulated is None and self.bd_table is not None:
+            tabulated = self.bd_table.lookup(genotype)
+        if tabulated is not None:
+            bd_float, bd_bin = tabulated
         else:
-            embedding_result = self.llm_handler.get_embeddings([style_string])
-            if embedding_result is not None:
-                embedding = embedding_result
-            else:
-                return
-            if embedding is not None:
-                self._embedding_cache[style_string] = embedding
-        if embedding is None: 
-            return
+            style_string = build_style_string(genotype)
 
-        bd_float = self.umap_model.transform(embedding.reshape(1, -1))[0]
-        bd_bin = self._get_bin_coords(bd_float)
+            if style_string in self._embedding_cache:
+                embedding = self._embedding_cache[style_string]
+            else:
+                embedding_result = self.llm_handler.get_embeddings([style_string])
+                if embedding_result is not None:
+                    embedding = embedding_result
+                else:
+                    return None
+                if embedding is not None:
+                    self._embedding_cache[style_string] = embedding
+            if embedding is None: 
+                return None
+
+            with self._umap_lock:
+                bd_float = self.umap_model.transform(embedding.reshape(1, -1))[0]
+            bd_bin = self._get_bin_coords(bd_float)
 
         pure_solution = extract_pure_solution(eval_results['solution_text'])  # Only assistant reply
 
@@ -173,89 +246,301 @@ class MAPElitesAlgorithm:
 
         candidate_data = {
             "genotype": genotype,
-            "parent_prompt_text": parent_prompt_text,  # Store parent prompt string
+            "parent_prompt_text": job['parent_prompt_text'],  # Store parent prompt string
             "prompt_text": prompt_text,
             "scores": [eval_results['raw_divergent'], eval_results['raw_convergent']],
             "individual_scores": eval_results['scores'],
             "solution_text": pure_solution,  # Only the assistant's reply
             "problem_id": problem['problem_id'],
             "category": problem['category'],  # Store problem category
-            "generation": generation,
+            "generation": job['generation'],
             "bd_float_coords": bd_float.tolist(),
             "bd_bin_coords": bd_bin
         }
-        
-        self._place_in_archive(candidate_data)
+        if job.get('memo_reused'):
+            # Same genes, problem and scores as an individual already offered to the archive.
+            candidate_data["memo_reused"] = True
+        return candidate_data
+
+    def _place_candidate(self, candidate_data: Optional[Dict[str, Any]]):
+        """
+        Inserts an evaluated candidate into the archive and buffers it for logging. Candidates
+        whose result the fitness memo reused are duplicates of an earlier one: they are counted
+        and logged, but not inserted again, so a cell never fills up with copies of one elite.
+        """
+        self.evaluations += 1
+        if candidate_data is None:
+            return
+        if not candidate_data.get("memo_reused"):
+            self._place_in_archive(candidate_data)
         self._pending_evals.append(candidate_data)  # Buffer instead of writing
 
-    def _log_generation_summary(self, generation: int):
-        """Calculates and saves summary statistics for the current generation."""
-        if not self.archive: 
+    def _evaluate_and_place_new_individual(self, generation: int, genotype: Optional[Dict] = None, parent_prompt_text: Optional[str] = None):
+        job = self._prepare_individual(generation, genotype, parent_prompt_text)
+        self._place_candidate(self._evaluate_individual(job))
+
+    def _compute_bds_batch(self, jobs: List[Dict[str, Any]]):
+        """
+        Computes the BDs of a batch of prepared individuals up front and stores them in
+        job['bd']: BD table lookups first, then one embedding pass over the styles not yet
+        cached and a single projection call for all of them. Jobs whose BD could not be
+        computed here are left to the per-individual path in _evaluate_individual.
+        """
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        for job in jobs:
+            tabulated = self.bd_table.lookup(job['genotype']) if self.bd_table is not None else None
+            if tabulated is not None:
+                job['bd'] = tabulated
+            else:
+                pending.setdefault(build_style_string(job['genotype']), []).append(job)
+        if not pending:
             return
-        all_elites = [elite for cell in self.archive.values() for elite in cell]
-        df = pd.DataFrame(all_elites)
-        df[['raw_divergent', 'raw_convergent']] = pd.DataFrame(df['scores'].tolist(), index=df.index)
-        
+
+        to_embed = [style for style in pending if style not in self._embedding_cache]
+        if to_embed:
+            batches = self.llm_handler.get_embeddings_batch(to_embed, config.EMBEDDING_BATCH_SIZE)
+            for start, batch in zip(range(0, len(to_embed), config.EMBEDDING_BATCH_SIZE), batches):
+                if batch is None:
+                    continue
+                for offset, style in enumerate(to_embed[start:start + config.EMBEDDING_BATCH_SIZE]):
+                    self._embedding_cache[style] = batch[offset:offset + 1]
+        styles = [style for style in pending if style in self._embedding_cache]
+        if not styles:
+            return
+
+        embeddings = np.vstack([self._embedding_cache[style].reshape(1, -1) for style in styles])
+        with self._umap_lock:
+            coords = np.asarray(self.umap_model.transform(embeddings))
+        for style, bd_float, bd_bin in zip(styles, coords, self._get_bin_coords_batch(coords)):
+            for job in pending[style]:
+                job['bd'] = (bd_float, bd_bin)
+
+    def _evaluate_batch(self, jobs: List[Dict[str, Any]], desc: str):
+        """
+        Evaluates prepared individuals concurrently on config.EVALUATION_WORKERS threads.
+        Results are inserted into the archive in submission order, so a run is reproducible
+        for a given seed.
+        """
+        self._compute_bds_batch(jobs)
+        if hasattr(self.solution_evaluator, "iter_evaluations"):
+            self._evaluate_batch_pipelined(jobs, desc)
+            return
+        workers = min(self.evaluation_workers, len(jobs))
+        if workers <= 1:
+            for job in tqdm(jobs, desc=desc):
+                self._place_candidate(self._evaluate_individual(job))
+            return
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluate") as executor:
+            futures = [executor.submit(self._evaluate_individual, job) for job in jobs]
+            for future in tqdm(futures, desc=desc):
+                self._place_candidate(future.result())
+
+    def _evaluate_batch_pipelined(self, jobs: List[Dict[str, Any]], desc: str):
+        """
+        Streams the batch through a PipelinedSolutionEvaluator, whose stages overlap across
+        individuals, and still inserts the results in submission order. Individuals whose
+        result the fitness memo reuses are not sent through the pipeline.
+        """
+        keys = [genotype_key(job['genotype'], job['problem']['problem_id']) for job in jobs]
+        claims = [self.fitness_memo.claim(key) for key in keys]
+        to_run = [i for i, (leader, _) in enumerate(claims) if leader]
+        items = [(jobs[i]['prompt_text'], jobs[i]['problem']['problem_text']) for i in to_run]
+        resolved = set()
+        evaluations = self.solution_evaluator.iter_evaluations(items, [jobs[i].get('replay_scope') for i in to_run])
+        try:
+            for index, job in enumerate(tqdm(jobs, desc=desc)):
+                # Pull finished evaluations until this individual's result is in; a reused
+                # result comes from an earlier individual, so it is already resolved.
+                future = claims[index][1]
+                while not future.done():
+                    position, eval_results = next(evaluations)
+                    finished = to_run[position]
+                    self.fitness_memo.resolve(keys[finished], claims[finished][1], eval_results)
+                    resolved.add(finished)
+                job['eval_results'] = future.result()
+                job['memo_reused'] = not claims[index][0]
+                self._place_candidate(self._evaluate_individual(job))
+        finally:
+            evaluations.close()
+            for index in to_run:
+                if index not in resolved:
+                    self.fitness_memo.resolve(keys[index], claims[index][1], error=RuntimeError("evaluation aborted"))
+
+    def _log_generation_summary(self, generation: int, evaluations: Optional[int] = None):
+        """
+        Calculates and saves summary statistics for the current generation.
+        Steady-state runs also pass the number of completed evaluations.
+        """
+        summary = self._generation_summary(generation, evaluations)
+        if summary is not None:
+            self._write_generation_summary(summary)
+
+    def _generation_summary(self, generation: int, evaluations: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Computes the log entries for the current generation and takes the buffered results; no file I/O."""
+        if not self.archive: 
+            return None
+        scores = self.archive.elite_scores()
+        divergent, convergent = scores[:, 0], scores[:, 1]
+
         # Calculate MSTTR for all solutions in the archive
         # lex_div_calc = LexicalDiversityCalculator(segment_length=5)
-        # msttr = lex_div_calc.msttr(df['solution_text'].tolist()) if not df.empty else 0.0
+        # msttr = lex_div_calc.msttr(self.archive.elite_field('solution_text'))
 
         # Calculate average divergent creativity (semantic entropy)
-        avg_divergent_creativity = df['raw_divergent'].mean() if not df.empty else 0.0
-        max_divergent_creativity = df['raw_divergent'].max() if not df.empty else 0.0
+        avg_divergent_creativity = float(divergent.mean())
+        max_divergent_creativity = float(divergent.max())
 
         # Score distributions
-        divergent_scores = df['raw_divergent'].tolist() if not df.empty else []
-        convergent_scores = df['raw_convergent'].tolist() if not df.empty else []
+        divergent_scores = divergent.tolist()
+        convergent_scores = convergent.tolist()
 
         # Parentage/lineage tracking
-        parent_ids = df['parent_id'].tolist() if 'parent_id' in df.columns else []
+        parent_ids = self.archive.elite_field('parent_id')
 
         log_entry = {
             "generation": generation,
             "num_cells": len(self.archive),
-            "total_elites": len(all_elites),
+            "total_elites": len(scores),
             "avg_divergent_creativity": avg_divergent_creativity,  # Renamed from avg_semantic_entropy
             "max_divergent_creativity": max_divergent_creativity,
-            "avg_convergent": df['raw_convergent'].mean(),
-            "max_convergent": df['raw_convergent'].max(),
+            "avg_convergent": float(convergent.mean()),
+            "max_convergent": float(convergent.max()),
             # "msttr": msttr,  # Commented out lexical diversity
             "divergent_scores": divergent_scores,  # Score distribution
             "convergent_scores": convergent_scores,  # Score distribution
             "parent_ids": parent_ids  # Parent tracking
         }
-        with open(os.path.join(config.RESULTS_DIR, "map_elites_evolution_log.jsonl"), "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-        print(f"Generation {generation}: {log_entry['num_cells']} cells, {log_entry['total_elites']} elites. Avg Conv: {log_entry['avg_convergent']:.2f}, Avg Divergent: {avg_divergent_creativity:.4f}")
+        if evaluations is not None:
+            log_entry["evaluations"] = evaluations
 
         # Compute hypervolume and archive convergence
-        points = df[['raw_divergent', 'raw_convergent']].values.tolist()
-        points = [[max(0.0, x), max(0.0, y)] for x, y in points]
-        if points:
-            max_div = max(x for x, y in points)
-            max_conv = max(y for x, y in points)
-            reference_point = [max_div + 1.0, max_conv + 1.0]
-        else:
-            reference_point = [1.0, 1.0]
-        hypervolume = compute_hypervolume(points, reference_point)
-        archive_size = len(all_elites)
+        hypervolume = compute_hypervolume(scores, config.HYPERVOLUME_REFERENCE_POINT)
+        archive_size = len(scores)
         hv_log = {
             "generation": generation,
             "hypervolume": hypervolume,
+            "qd_score": self.archive.qd_score,  # MOME QD-score: sum of per-cell hypervolumes
+            "coverage": self.archive.coverage,
             "archive_size": archive_size
         }
+        if evaluations is not None:
+            hv_log["evaluations"] = evaluations
+
+        pending_evals, self._pending_evals = self._pending_evals, []
+        return {"log_entry": log_entry, "hv_log": hv_log, "pending_evals": pending_evals}
+
+    def _write_generation_summary(self, summary: Dict[str, Any]):
+        """Appends a summary from _generation_summary to the log files."""
+        log_entry = summary["log_entry"]
+        with open(os.path.join(config.RESULTS_DIR, "map_elites_evolution_log.jsonl"), "a") as f:
+            f.write(json.dumps(log_entry) + "\n")
+        print(f"Generation {log_entry['generation']}: {log_entry['num_cells']} cells, {log_entry['total_elites']} elites. Avg Conv: {log_entry['avg_convergent']:.2f}, Avg Divergent: {log_entry['avg_divergent_creativity']:.4f}")
+
         with open(os.path.join(config.RESULTS_DIR, "map_elites_hypervolume_log.jsonl"), "a") as f:
-            f.write(json.dumps(hv_log) + "\n")
+            f.write(json.dumps(summary["hv_log"]) + "\n")
 
         # Write buffered results
-        if self._pending_evals:
+        if summary["pending_evals"]:
             with open(os.path.join(config.RESULTS_DIR, "map_elites_evaluated_prompts.jsonl"), "a") as f:
-                for item in self._pending_evals:
+                for item in summary["pending_evals"]:
                     f.write(json.dumps(item) + "\n")
-            self._pending_evals = []
 
-    def run(self):
-        """Executes the main MAP-Elites evolutionary loop."""
+    def _run_generation_batch(self, generation: int):
+        """
+        Batch mode: selects every parent from the archive as it stood at the start of the
+        generation, mutates them all up front, then evaluates the offspring concurrently.
+        """
+        jobs = []
+        for _ in range(config.POPULATION_SIZE):
+            parent_bin = random.choice(list(self.archive.keys()))
+            parent = random.choice(self.archive[parent_bin])
+            mutated_genotype = self.cfg_generator.mutate_genotype(parent['genotype'], config.MUTATION_RATE)
+            jobs.append(self._prepare_individual(
+                generation=generation,
+                genotype=mutated_genotype,
+                parent_prompt_text=parent.get("prompt_text", None)
+            ))
+        self._evaluate_batch(jobs, desc=f"Generation {generation}")
+
+    # --- Checkpointing ---
+
+    LOG_FILES = ("map_elites_evaluated_prompts.jsonl", "map_elites_evolution_log.jsonl", "map_elites_hypervolume_log.jsonl")
+
+    def _checkpoint_path(self) -> str:
+        return os.path.join(config.RESULTS_DIR, config.CHECKPOINT_FILENAME)
+
+    def save_checkpoint(self, generation: int):
+        """
+        Atomically writes everything needed to continue the run after `generation`:
+        archive, Python/NumPy RNG state, counters, caches, pending buffer and log offsets.
+        """
+        log_offsets = {}
+        for name in self.LOG_FILES:
+            path = os.path.join(config.RESULTS_DIR, name)
+            log_offsets[name] = os.path.getsize(path) if os.path.exists(path) else 0
+        state = {
+            "version": 1,
+            "generation": generation,
+            "evaluations": self.evaluations,
+            "fixed_problem_id": self.fixed_problem_id,
+            "archive": self.archive,
+            "pending_evals": self._pending_evals,
+            "embedding_cache": self._embedding_cache,
+            "fitness_memo": self.fitness_memo,
+            "python_rng_state": random.getstate(),
+            "numpy_rng_state": np.random.get_state(),
+            # Replay slots of the sampled-response cache, so replayed calls line up after resume.
+            "llm_sample_slots": dict(getattr(self.llm_handler, "_sample_slots", {})),
+            "log_offsets": log_offsets,
+        }
+        path = self._checkpoint_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self) -> Optional[int]:
+        """
+        Restores the state saved by save_checkpoint and truncates the logs back to the
+        offsets recorded in it. Returns the checkpointed generation, or None if there is none.
+        """
+        path = self._checkpoint_path()
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state["fixed_problem_id"] != self.fixed_problem_id:
+            print(f"Warning: checkpoint was taken with problem id {state['fixed_problem_id']}, resuming with {self.fixed_problem_id}.")
+
+        self.archive = state["archive"]
+        self._pending_evals = state["pending_evals"]
+        self._embedding_cache = state["embedding_cache"]
+        self.fitness_memo = state.get("fitness_memo") or self.fitness_memo
+        self.evaluations = state["evaluations"]
+        random.setstate(state["python_rng_state"])
+        np.random.set_state(state["numpy_rng_state"])
+        if hasattr(self.llm_handler, "_sample_slots"):
+            self.llm_handler._sample_slots = dict(state["llm_sample_slots"])
+
+        # Drop whatever the crashed run logged after the checkpoint.
+        for name, offset in state["log_offsets"].items():
+            log_path = os.path.join(config.RESULTS_DIR, name)
+            with open(log_path, 'a') as f:
+                f.truncate(offset)
+        print(f"Resumed from checkpoint at generation {state['generation']} ({self.evaluations} evaluations).")
+        return state["generation"]
+
+    def run(self, resume: bool = False):
+        """Executes the main MAP-Elites evolutionary loop. With resume=True, continues from the last checkpoint."""
+        start_generation = self.load_checkpoint() if resume else None
+        if start_generation is not None:
+            self._run_generations(start_generation + 1)
+            return self._finish_run()
+        if resume:
+            print("No checkpoint found. Starting a fresh run.")
+
         print("--- Starting MAP-Elites Run ---")
         
         # Clear previous log files
@@ -264,53 +549,75 @@ class MAPElitesAlgorithm:
 
         print(f"Generating {config.NUM_INITIAL_POPULATION} initial prompts...")
         # First individual: empty/baseline
-        self._evaluate_and_place_new_individual(
+        initial_jobs = [self._prepare_individual(
             generation=0, 
             genotype=self.cfg_generator.generate_random_genotype(baseline=True),
             parent_prompt_text=None
-        )
+        )]
         # The rest: random genotypes
-        for _ in tqdm(range(config.NUM_INITIAL_POPULATION - 1), desc="Initial Population (random)"):
-            self._evaluate_and_place_new_individual(
+        for _ in range(config.NUM_INITIAL_POPULATION - 1):
+            initial_jobs.append(self._prepare_individual(
                 generation=0, 
                 genotype=self.cfg_generator.generate_random_genotype(),
                 parent_prompt_text=None
-            )
+            ))
+        self._evaluate_batch(initial_jobs, desc="Initial Population (random)")
         self._log_generation_summary(0)
         self.save_archive("map_elites_archive_gen_0.json")  # Save initial archive
+        self.save_checkpoint(0)
 
-        for gen in range(1, config.NUM_GENERATIONS + 1):
+        self._run_generations(1)
+        return self._finish_run()
+
+    def _run_generations(self, start_generation: int):
+        """Runs generations start_generation..NUM_GENERATIONS, checkpointing every CHECKPOINT_INTERVAL."""
+        for gen in range(start_generation, config.NUM_GENERATIONS + 1):
             if not self.archive:
                 print("Archive is empty. Cannot select parents. Generating a random individual.")
                 self._evaluate_and_place_new_individual(generation=gen)
                 self._log_generation_summary(gen)
                 if gen % 5 == 0:
                     self.save_archive(f"map_elites_archive_gen_{gen}.json")
+                if gen % config.CHECKPOINT_INTERVAL == 0:
+                    self.save_checkpoint(gen)
                 continue
 
             print(f"\n--- Generation {gen}/{config.NUM_GENERATIONS} ---")
-            for _ in tqdm(range(config.POPULATION_SIZE), desc=f"Generation {gen}"):
-                parent_bin = random.choice(list(self.archive.keys()))
-                parent = random.choice(self.archive[parent_bin])
-                # parent_id = parent.get("id", None)  # This is correct, just ensure parent['id'] is always set
-                mutated_genotype = self.cfg_generator.mutate_genotype(parent['genotype'], config.MUTATION_RATE)
-                parent_prompt_text = parent.get("prompt_text", None)
-                self._evaluate_and_place_new_individual(
-                    generation=gen, 
-                    genotype=mutated_genotype,
-                    parent_prompt_text=parent_prompt_text
-                )
+            if self.batch_generations:
+                self._run_generation_batch(gen)
+            else:
+                for _ in tqdm(range(config.POPULATION_SIZE), desc=f"Generation {gen}"):
+                    parent_bin = random.choice(list(self.archive.keys()))
+                    parent = random.choice(self.archive[parent_bin])
+                    # parent_id = parent.get("id", None)  # This is correct, just ensure parent['id'] is always set
+                    mutated_genotype = self.cfg_generator.mutate_genotype(parent['genotype'], config.MUTATION_RATE)
+                    parent_prompt_text = parent.get("prompt_text", None)
+                    self._evaluate_and_place_new_individual(
+                        generation=gen, 
+                        genotype=mutated_genotype,
+                        parent_prompt_text=parent_prompt_text
+                    )
             
             self._log_generation_summary(gen)
             if gen % 5 == 0:
                 self.save_archive(f"map_elites_archive_gen_{gen}.json")
+            if gen % config.CHECKPOINT_INTERVAL == 0:
+                self.save_checkpoint(gen)
 
+    def _finish_run(self):
         print("--- MAP-Elites Run Finished ---")
+        print(f"Fitness memo: {self.fitness_memo.stats()}")
         self.save_archive("map_elites_final_archive.json")
         return self.archive
         
     def save_archive(self, filename: str):
-        serializable_archive = {str(k): v for k, v in self.archive.items()}
+        self._write_archive(filename, self._archive_snapshot())
+
+    def _archive_snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Copies the cell lists; elites are never modified once inserted, so they can be shared."""
+        return {str(k): list(v) for k, v in self.archive.items()}
+
+    def _write_archive(self, filename: str, serializable_archive: Dict[str, List[Dict[str, Any]]]):
         with open(os.path.join(config.RESULTS_DIR, filename), 'w') as f:
             json.dump(serializable_archive, f, indent=2)
         print(f"Archive saved to {filename}")
@@ -5,9 +5,139 @@
 import numpy as np
 from typing import List, Dict, Any
 
+# Two-objective populations larger than SWEEP_MIN_N use the O(n log n) sweep; other
+# populations up to BROADCAST_MAX_N use the NumPy broadcast path, the rest the reference loop.
+SWEEP_MIN_N = 32
+BROADCAST_MAX_N = 256
+
 def fast_non_dominated_sort(population: List[Dict[str, Any]]) -> List[List[int]]:
     """
     Performs fast non-dominated sorting on a population.
+    Args:
+        population: A list of individuals, where each individual is a dict
+                    that must contain a 'scores' key with a list/tuple of objective values.
+    Returns:
+        A list of fronts, where each front is a list of indices of individuals.
+        Fronts and the order within each front are identical to the reference algorithm.
+    """
+    if not population:
+        return []
+
+    values = np.array([ind['scores'] for ind in population], dtype=float)
+    if values.ndim == 2 and values.shape[1] == 2 and len(population) > SWEEP_MIN_N:
+        return _non_dominated_sort_2d(values)
+    if values.ndim == 2 and len(population) <= BROADCAST_MAX_N:
+        return _non_dominated_sort_broadcast(values)
+    return _fast_non_dominated_sort_reference(population)
+
+def _non_dominated_sort_broadcast(values: np.ndarray) -> List[List[int]]:
+    """
+    Builds the full domination matrix with NumPy broadcasting, then peels the fronts
+    exactly like the reference loop. O(n^2) memory, so only used for small n.
+    """
+    geq = np.all(values[:, None, :] >= values[None, :, :], axis=2)
+    gt = np.any(values[:, None, :] > values[None, :, :], axis=2)
+    dominates = geq & gt  # dominates[i, j]: i dominates j
+    dominating_counts = dominates.sum(axis=0)
+
+    fronts = [np.flatnonzero(dominating_counts == 0).tolist()]
+    while True:
+        next_front = []
+        for i in fronts[-1]:
+            for j in np.flatnonzero(dominates[i]).tolist():
+                dominating_counts[j] -= 1
+                if dominating_counts[j] == 0:
+                    next_front.append(j)
+        if not next_front:
+            break
+        fronts.append(next_front)
+    return fronts
+
+def _non_dominated_sort_2d(values: np.ndarray) -> List[List[int]]:
+    """
+    O(n log n) non-dominated sort for two maximised objectives (sort-and-sweep).
+
+    Points are visited by decreasing (f0, f1), so every dominator of a point is visited
+    before it. Each front keeps its last-visited member, which has the largest f1 and
+    smallest f0 of the front (ties are exact duplicates); a point is dominated by front k
+    iff that member has a larger f1, or equal f1 and larger f0. Since this is monotone
+    in k, a binary search over the fronts finds each point's rank.
+
+    The reference algorithm lists front 0 by index and front k+1 in the order its members
+    are released while front k is processed, i.e. by (latest position in front k of any
+    dominator, index). Within front k, sorted by f0, the dominators of a point form a
+    contiguous range, so that key is a range-maximum query (sparse table).
+    """
+    n = len(values)
+    f0, f1 = values[:, 0], values[:, 1]
+    order = np.lexsort((-f1, -f0))
+
+    last_f0: List[float] = []
+    last_f1: List[float] = []
+    rank = np.empty(n, dtype=np.int64)
+    for i in order.tolist():
+        x, y = f0[i], f1[i]
+        lo, hi = 0, len(last_f1)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if last_f1[mid] > y or (last_f1[mid] == y and last_f0[mid] > x):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(last_f1):
+            last_f0.append(x)
+            last_f1.append(y)
+        else:
+            last_f0[lo] = x
+            last_f1[lo] = y
+        rank[i] = lo
+
+    num_fronts = len(last_f1)
+    members = [np.flatnonzero(rank == k) for k in range(num_fronts)]
+    fronts = [members[0].tolist()]
+    for k in range(1, num_fronts):
+        prev = np.array(fronts[-1])
+        position = np.empty(n, dtype=np.int64)
+        position[prev] = np.arange(len(prev))
+
+        # Previous front sorted by f0 ascending (f1 is then non-increasing).
+        by_f0 = prev[np.lexsort((-f1[prev], f0[prev]))]
+        sorted_f0 = f0[by_f0]
+        neg_sorted_f1 = -f1[by_f0]
+        table = _sparse_table_max(position[by_f0])
+
+        current = members[k]
+        lo = np.searchsorted(sorted_f0, f0[current], side='left')
+        hi = np.searchsorted(neg_sorted_f1, -f1[current], side='right')
+        release = _range_max(table, lo, hi)
+        fronts.append(current[np.lexsort((current, release))].tolist())
+    return fronts
+
+def _sparse_table_max(array: np.ndarray) -> List[np.ndarray]:
+    """Sparse table for O(1) range-maximum queries over a static array."""
+    table = [array]
+    width = 1
+    while 2 * width <= len(array):
+        prev = table[-1]
+        table.append(np.maximum(prev[:-width], prev[width:]))
+        width *= 2
+    return table
+
+def _range_max(table: List[np.ndarray], lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Vectorized max over the half-open ranges [lo, hi) (all non-empty)."""
+    length = hi - lo
+    level = np.floor(np.log2(length)).astype(np.int64)
+    result = np.empty(len(lo), dtype=np.int64)
+    for k in np.unique(level).tolist():
+        mask = level == k
+        row = table[k]
+        result[mask] = np.maximum(row[lo[mask]], row[hi[mask] - (1 << k)])
+    return result
+
+def _fast_non_dominated_sort_reference(population: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Reference O(n^2) fast non-dominated sorting (Deb et al., NSGA-II).
+    Kept as the general path for any number of objectives and for testing the fast paths.
     Args:
         population: A list of individuals, where each individual is a dict
                     that must contain a 'scores' key with a list/tuple of objective values.
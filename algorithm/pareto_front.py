@@ -0,0 +1,136 @@
+# algorithms/pareto_front.py
+# Incremental two-objective Pareto front used as the per-cell container of the MAP-Elites archive.
+# Replaces rebuilding each cell with a full non-dominated sort and crowding pass on every insertion.
+
+import numpy as np
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from analysis_utils import IncrementalHypervolume2D
+from .nds_utils import calculate_crowding_distance
+
+def _default_scores(item: Dict[str, Any]) -> Sequence[float]:
+    return item['scores']
+
+class ParetoFront:
+    """
+    A set of mutually non-dominated items (both objectives maximised), kept sorted by the
+    first objective ascending, which makes the second objective non-increasing.
+
+    - Dominance check of a candidate: one binary search plus one comparison, O(log n).
+    - Members dominated by a candidate form one contiguous run, found by two binary searches.
+    - Exact duplicates are kept, as non-dominated sorting does.
+    - When the front exceeds `capacity`, it is truncated exactly as rebuilding the cell did:
+      members in the rebuilt cell's list order (survivors, then the candidate; after a
+      truncation, the crowding order) are stably sorted by calculate_crowding_distance,
+      descending, and the first `capacity` are kept. Ties are broken by that order.
+      Truncation deliberately recomputes the full crowding pass, O(n log n) per truncating
+      insert: reading distances off the sorted front's neighbours would be O(n), but orders
+      duplicates and boundary ties differently from calculate_crowding_distance.
+
+    Behaves like a read-only list of items, so it can stand in for the archive's cell lists.
+    With a reference point, the front's hypervolume is kept up to date as members come and go.
+    """
+    def __init__(self, capacity: Optional[int] = None,
+                 scores_of: Callable[[Any], Sequence[float]] = _default_scores,
+                 reference_point: Optional[Sequence[float]] = None):
+        self.capacity = capacity
+        self.scores_of = scores_of
+        self._hv = IncrementalHypervolume2D(reference_point) if reference_point is not None else None
+        self._items: List[Any] = []
+        self._f0: List[float] = []
+        self._neg_f1: List[float] = []  # -f1, non-decreasing, so it can be bisected
+        self._seq: List[int] = []       # insertion counter of each member, in front order
+        self._next_seq = 0
+        self._cell_order: List[int] = []  # member counters in the rebuilt cell's list order
+
+    # --- list-like interface ---
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __repr__(self) -> str:
+        return f"ParetoFront({self._items!r})"
+
+    def to_list(self) -> List[Any]:
+        return list(self._items)
+
+    @property
+    def hypervolume(self) -> float:
+        """Hypervolume of the front w.r.t. the reference point given at construction."""
+        if self._hv is None:
+            raise ValueError("ParetoFront was created without a reference point.")
+        return self._hv.value
+
+    def scores(self) -> np.ndarray:
+        """(n, 2) array of member scores, in front order."""
+        return np.column_stack([self._f0, [-v for v in self._neg_f1]]) if self._items else np.empty((0, 2))
+
+    # --- front maintenance ---
+
+    def is_dominated(self, scores: Sequence[float]) -> bool:
+        """True if some member dominates the given scores."""
+        x, y = float(scores[0]), float(scores[1])
+        # Members with f0 >= x are a suffix; the first of them has the largest f1 among them.
+        k = bisect_left(self._f0, x)
+        if k == len(self._f0):
+            return False
+        f1 = -self._neg_f1[k]
+        return f1 > y or (f1 == y and self._f0[k] > x)
+
+    def insert(self, item: Any) -> bool:
+        """
+        Offers an item to the front. Removes the members it dominates, then truncates to
+        capacity by crowding distance. Returns True if the item is on the front afterwards.
+        """
+        scores = self.scores_of(item)
+        x, y = float(scores[0]), float(scores[1])
+        if self.is_dominated((x, y)):
+            return False
+
+        # Dominated members: f0 <= x (a prefix) and f1 <= y (a suffix), minus exact duplicates.
+        start = bisect_left(self._neg_f1, -y)
+        stop = bisect_right(self._f0, x)
+        if start < stop:
+            keep = [i for i in range(start, stop) if self._f0[i] == x and self._neg_f1[i] == -y]
+            removed = set(self._seq[start:stop]) - {self._seq[i] for i in keep}
+            for lst in (self._items, self._f0, self._neg_f1, self._seq):
+                kept = [lst[i] for i in keep]
+                lst[start:stop] = kept
+            if removed:
+                self._cell_order = [seq for seq in self._cell_order if seq not in removed]
+
+        if self._hv is not None:
+            self._hv.add((x, y))
+        pos = bisect_right(self._f0, x)
+        self._items.insert(pos, item)
+        self._f0.insert(pos, x)
+        self._neg_f1.insert(pos, -y)
+        self._seq.insert(pos, self._next_seq)
+        self._cell_order.append(self._next_seq)
+        self._next_seq += 1
+
+        if self.capacity is not None and len(self._items) > self.capacity:
+            return self._truncate(self._next_seq - 1)
+        return True
+
+    def _truncate(self, candidate_seq: int) -> bool:
+        # Stable sort by crowding distance (descending) of the cell's list order, keep the top.
+        position = {seq: i for i, seq in enumerate(self._seq)}
+        order = [position[seq] for seq in self._cell_order]
+        distances = calculate_crowding_distance([{'scores': [self._f0[i], -self._neg_f1[i]]} for i in order])
+        ranked = sorted(range(len(order)), key=lambda k: distances[k], reverse=True)
+        self._cell_order = [self._cell_order[k] for k in ranked[:self.capacity]]
+        dropped = sorted((order[k] for k in ranked[self.capacity:]), reverse=True)
+        for victim in dropped:
+            if self._hv is not None:
+                self._hv.remove((self._f0[victim], -self._neg_f1[victim]))
+            for lst in (self._items, self._f0, self._neg_f1, self._seq):
+                del lst[victim]
+        return candidate_seq in self._cell_order
@@ -0,0 +1,128 @@
+# algorithms/steady_state_map_elites.py
+# Asynchronous (steady-state) variant of the Multi-Objective MAP-Elites algorithm.
+# There is no generation barrier: each worker keeps selecting a parent from the live archive,
+# evaluating its mutant and inserting the result as soon as it finishes.
+
+import os
+import sys
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from tqdm import tqdm
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+
+# --- Path Correction ---
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from .map_elites import MAPElitesAlgorithm
+
+if TYPE_CHECKING:
+    from cfg_generator import CFGPromptGenerator
+    from task_loader import TaskLoader
+    from evaluation import SolutionEvaluator
+    from llm_services import LLM_API_Handler
+    from umap import UMAP  # type: ignore
+    from bd_table import BehaviorDescriptorTable
+
+class SteadyStateMAPElites(MAPElitesAlgorithm):
+    """
+    Keeps config.STEADY_STATE_WORKERS evaluations in flight at all times, so the endpoints
+    stay saturated even when individual latencies vary a lot. Logging and archive snapshots
+    are driven by the number of completed evaluations instead of generations.
+    NOTE: parents are drawn from whatever the archive holds when a worker becomes free,
+    so runs are not reproducible from a seed the way generational runs are.
+    """
+    def __init__(self,
+                 cfg_generator: 'CFGPromptGenerator',
+                 task_loader: 'TaskLoader',
+                 solution_evaluator: 'SolutionEvaluator',
+                 llm_handler: 'LLM_API_Handler',
+                 umap_model: 'UMAP',
+                 bd_table: Optional['BehaviorDescriptorTable'] = None):
+        super().__init__(cfg_generator, task_loader, solution_evaluator, llm_handler, umap_model, bd_table)
+        self.num_workers = config.STEADY_STATE_WORKERS
+        self.total_evaluations = config.STEADY_STATE_TOTAL_EVALUATIONS
+        self.log_interval = config.STEADY_STATE_LOG_INTERVAL
+        self.snapshot_interval = config.STEADY_STATE_SNAPSHOT_INTERVAL
+
+        # Guards the archive, the RNG-driven selection and all counters.
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self._progress: Optional[tqdm] = None
+        # Summaries and snapshots are taken under the lock but written by this single thread,
+        # so workers never wait on file I/O and the files are still written in order.
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._writes: List[Future] = []
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """Prepares the next individual, or returns None once the evaluation budget is used up."""
+        with self._lock:
+            if self.submitted >= self.total_evaluations:
+                return None
+            index = self.submitted
+            self.submitted += 1
+            # Individuals are tagged with the log step they were started in.
+            generation = self.completed // self.log_interval
+
+            if index == 0:
+                # First individual: empty/baseline
+                return self._prepare_individual(generation, self.cfg_generator.generate_random_genotype(baseline=True))
+            if index < config.NUM_INITIAL_POPULATION or not self.archive:
+                return self._prepare_individual(generation, self.cfg_generator.generate_random_genotype())
+
+            parent_bin = random.choice(list(self.archive.keys()))
+            parent = random.choice(self.archive[parent_bin])
+            mutated_genotype = self.cfg_generator.mutate_genotype(parent['genotype'], config.MUTATION_RATE)
+            return self._prepare_individual(generation, mutated_genotype, parent.get("prompt_text", None))
+
+    def _worker(self):
+        """Pull a parent, evaluate its mutant, insert it; repeat until the budget is spent."""
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            candidate = self._evaluate_individual(job)
+            with self._lock:
+                self._place_candidate(candidate)
+                self.completed += 1
+                if self._progress is not None:
+                    self._progress.update(1)
+                if self.completed % self.log_interval == 0:
+                    summary = self._generation_summary(self.completed // self.log_interval, evaluations=self.completed)
+                    if summary is not None:
+                        self._writes.append(self._writer.submit(self._write_generation_summary, summary))
+                if self.completed % self.snapshot_interval == 0:
+                    self._writes.append(self._writer.submit(
+                        self._write_archive, f"map_elites_archive_eval_{self.completed}.json", self._archive_snapshot()))
+
+    def run(self):
+        """Executes the steady-state MAP-Elites loop."""
+        print(f"--- Starting Steady-State MAP-Elites Run ({self.num_workers} workers, {self.total_evaluations} evaluations) ---")
+
+        # Clear previous log files
+        open(os.path.join(config.RESULTS_DIR, "map_elites_evaluated_prompts.jsonl"), "w").close()
+        open(os.path.join(config.RESULTS_DIR, "map_elites_evolution_log.jsonl"), "w").close()
+
+        self._progress = tqdm(total=self.total_evaluations, desc="Evaluations")
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="steady-state-writer") as self._writer:
+            with ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="steady-state") as executor:
+                futures = [executor.submit(self._worker) for _ in range(self.num_workers)]
+                for future in futures:
+                    future.result()  # Re-raise worker errors
+        for write in self._writes:
+            write.result()  # Re-raise write errors
+        self._writer = None
+        self._writes = []
+        self._progress.close()
+        self._progress = None
+
+        # Flush the last partial log interval.
+        if self.completed % self.log_interval != 0:
+            self._log_generation_summary(self.completed // self.log_interval + 1, evaluations=self.completed)
+
+        print("--- Steady-State MAP-Elites Run Finished ---")
+        print(f"Fitness memo: {self.fitness_memo.stats()}")
+        self.save_archive("map_elites_final_archive.json")
+        return self.archive
@@ -31,7 +31,10 @@ def load_mapelites_data():
         raise RuntimeError("No MAP-Elites experiment results found!")
     df = pd.concat(all_dfs, ignore_index=True)
     df[['raw_divergent', 'raw_convergent']] = pd.DataFrame(df['scores'].tolist(), index=df.index)
-    df[['bd_dim1', 'bd_dim2']] = pd.DataFrame(df['bd_float_coords'].tolist(), index=df.index)
+    # One bd_dimN column per BD dimension; the 2D plots use the first two.
+    bd = pd.DataFrame(df['bd_float_coords'].tolist(), index=df.index)
+    bd.columns = [f"bd_dim{i + 1}" for i in bd.columns]
+    df[list(bd.columns)] = bd
     df = df[df['solution_text'].notnull() & (df['solution_text'].str.strip() != "")]
     return df
 
@@ -0,0 +1,131 @@
+# analysis_utils.py
+# Hypervolume utilities shared by the algorithms and the post-experiment analysis.
+# Both objectives (divergent, convergent) are maximised, so the hypervolume is the area
+# dominated by the points and bounded below by the reference point.
+
+import os
+import json
+from bisect import bisect_left, bisect_right
+import numpy as np
+from typing import Dict, List, Sequence, Union
+
+import config
+
+Points = Union[np.ndarray, Sequence[Sequence[float]]]
+
+def _as_points(points: Points, reference_point: Sequence[float]) -> np.ndarray:
+    """(n, 2) float array of the points that strictly dominate the reference point."""
+    pts = np.asarray(points, dtype=float).reshape(-1, 2)
+    ref = np.asarray(reference_point, dtype=float)
+    return pts[np.all(pts > ref, axis=1)]
+
+def compute_hypervolume(points: Points, reference_point: Sequence[float]) -> float:
+    """
+    Exact 2D hypervolume (maximisation) in O(n log n): sweep the points by the first
+    objective descending and add the strip each one raises above the best second objective.
+    Points that do not strictly dominate the reference point contribute nothing.
+    """
+    pts = _as_points(points, reference_point)
+    if pts.shape[0] == 0:
+        return 0.0
+    ref_x, ref_y = float(reference_point[0]), float(reference_point[1])
+    order = np.lexsort((-pts[:, 1], -pts[:, 0]))
+    xs, ys = pts[order, 0], pts[order, 1]
+    # Running max of the second objective before each point (ref_y for the first one).
+    best_before = np.maximum.accumulate(np.concatenate(([ref_y], ys[:-1])))
+    gains = np.clip(ys - best_before, 0.0, None)
+    return float(np.sum((xs - ref_x) * gains))
+
+
+class IncrementalHypervolume2D:
+    """
+    Hypervolume of a mutually non-dominated point set, updated in O(log n) search time as
+    points enter or leave. Adding a point drops the members it dominates, as a Pareto front
+    does; exact duplicates are kept. Points not strictly dominating the reference are ignored.
+    Each point's exclusive contribution only depends on its two neighbours on the front.
+    """
+    def __init__(self, reference_point: Sequence[float]):
+        self.reference_point = (float(reference_point[0]), float(reference_point[1]))
+        self._xs: List[float] = []      # ascending
+        self._neg_ys: List[float] = []  # ascending, i.e. y descending
+        self.value = 0.0
+
+    def __len__(self) -> int:
+        return len(self._xs)
+
+    def points(self) -> np.ndarray:
+        return np.column_stack([self._xs, [-v for v in self._neg_ys]]) if self._xs else np.empty((0, 2))
+
+    def _contribution(self, i: int) -> float:
+        """Area dominated only by member i."""
+        ref_x, ref_y = self.reference_point
+        x_prev = self._xs[i - 1] if i > 0 else ref_x
+        y_next = -self._neg_ys[i + 1] if i + 1 < len(self._xs) else ref_y
+        return (self._xs[i] - x_prev) * (-self._neg_ys[i] - y_next)
+
+    def _remove_at(self, i: int) -> float:
+        delta = self._contribution(i)
+        del self._xs[i]
+        del self._neg_ys[i]
+        self.value -= delta
+        return -delta
+
+    def add(self, point: Sequence[float]) -> float:
+        """Adds a point and returns the change in hypervolume."""
+        x, y = float(point[0]), float(point[1])
+        ref_x, ref_y = self.reference_point
+        if not (x > ref_x and y > ref_y):
+            return 0.0
+        k = bisect_left(self._xs, x)
+        if k < len(self._xs):
+            yk = -self._neg_ys[k]
+            if yk > y or (yk == y and self._xs[k] > x):
+                return 0.0
+        delta = 0.0
+        # Members dominated by the point are a contiguous run; drop them from the right.
+        i = bisect_right(self._xs, x) - 1
+        while i >= 0 and -self._neg_ys[i] <= y:
+            if not (self._xs[i] == x and -self._neg_ys[i] == y):
+                delta += self._remove_at(i)
+            i -= 1
+        pos = bisect_right(self._xs, x)
+        self._xs.insert(pos, x)
+        self._neg_ys.insert(pos, -y)
+        gain = self._contribution(pos)
+        self.value += gain
+        return delta + gain
+
+    def remove(self, point: Sequence[float]) -> float:
+        """Removes one member equal to point (if present) and returns the change in hypervolume."""
+        x, y = float(point[0]), float(point[1])
+        i = bisect_left(self._xs, x)
+        while i < len(self._xs) and self._xs[i] == x:
+            if -self._neg_ys[i] == y:
+                return self._remove_at(i)
+            i += 1
+        return 0.0
+
+
+def mome_qd_score(cell_hypervolumes: Union[Dict, Sequence[float]]) -> float:
+    """MOME QD-score: the sum of the hypervolumes of every cell's Pareto front."""
+    values = cell_hypervolumes.values() if isinstance(cell_hypervolumes, dict) else cell_hypervolumes
+    return float(sum(values))
+
+def summarize_hypervolume_logs(results_dir: str = config.RESULTS_DIR):
+    """Prints the final hypervolume (and QD-score, if logged) of every run under results_dir."""
+    for root, _, files in sorted(os.walk(results_dir)):
+        for name in sorted(files):
+            if not name.endswith("_hypervolume_log.jsonl"):
+                continue
+            with open(os.path.join(root, name)) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if not entries:
+                continue
+            last = entries[-1]
+            line = f"{os.path.join(root, name)}: generation {last['generation']}, hypervolume {last['hypervolume']:.4f}"
+            if "qd_score" in last:
+                line += f", QD-score {last['qd_score']:.4f}"
+            print(line)
+
+if __name__ == "__main__":
+    summarize_hypervolume_logs()
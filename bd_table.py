@@ -0,0 +1,185 @@
+# bd_table.py
+# Precomputes the behavior descriptor (BD) of every reachable prompt style.
+# The BD of an individual depends only on its style genes, and the grammar is finite,
+# so every style combination can be embedded and projected through UMAP once, offline.
+# At runtime a BD becomes an O(1) lookup into a memory-mapped table.
+
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import config
+from umap_artifacts import atomic_save_npy, compute_bounds, file_sha256, load_umap_artifacts
+
+if TYPE_CHECKING:
+    from cfg_generator import CFGPromptGenerator
+    from llm_services import LLM_API_Handler
+
+# Genes that make up the style string embedded for the BD, in string order.
+STYLE_GENES = ("role_instruction", "format_instruction", "creativity_instruction")
+
+def style_string(genotype: Dict[str, str]) -> str:
+    """Builds the style-only string (no problem text) that is embedded for the BD."""
+    return " ".join(genotype.get(gene, '') for gene in STYLE_GENES).strip()
+
+def bin_coords_batch(bd_float_coords: np.ndarray, umap_min: Sequence[float], umap_max: Sequence[float],
+                     grid_shape: Sequence[int]) -> np.ndarray:
+    """Vectorized version of MAPElitesAlgorithm._get_bin_coords for an (n, d) array of BD coordinates."""
+    coords = np.asarray(bd_float_coords, dtype=float)
+    lo = np.asarray(umap_min, dtype=float)
+    hi = np.asarray(umap_max, dtype=float)
+    shape = np.asarray(grid_shape)
+    scaled = np.clip((coords - lo) / (hi - lo) * shape, 0, shape - 1)
+    return scaled.astype(np.int64)
+
+def _rules_hash(gene_rules: List[List[str]]) -> str:
+    return hashlib.sha256(json.dumps(gene_rules).encode('utf-8')).hexdigest()
+
+
+class BehaviorDescriptorTable:
+    """
+    A read-only table of BD float coordinates and bin indices for every style combination.
+    Rows are addressed by the mixed-radix index of the style genes' rule indices.
+    """
+    def __init__(self, directory: str, gene_rules: List[List[str]], coords: np.ndarray,
+                 bins: np.ndarray, meta: Dict):
+        self.directory = directory
+        self.gene_rules = gene_rules
+        self.coords = coords
+        self.bins = bins
+        self.meta = meta
+        self._rule_index = [{rule: i for i, rule in enumerate(rules)} for rules in gene_rules]
+        self._radices = [len(rules) for rules in gene_rules]
+
+    @classmethod
+    def load(cls, directory: str = config.BD_TABLE_DIR,
+             cfg_generator: Optional['CFGPromptGenerator'] = None) -> Optional['BehaviorDescriptorTable']:
+        """
+        Memory-maps a table built by build_bd_table. Returns None (with a warning) if it is
+        missing or stale, i.e. built from a different grammar or UMAP model, or if the UMAP
+        model it was built from is no longer there to check against.
+        """
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        gene_rules = meta['gene_rules']
+        if cfg_generator is not None:
+            current_rules = [cfg_generator.rules.get(gene, []) for gene in STYLE_GENES]
+            if _rules_hash(current_rules) != meta['rules_hash']:
+                print(f"Warning: BD table in {directory} was built from a different grammar. Ignoring it.")
+                return None
+        # A table built from a model can only be trusted while that exact model file is present.
+        if meta['umap_model_hash'] is not None:
+            model_hash = file_sha256(config.UMAP_MODEL_PATH)
+            if model_hash is None:
+                print(f"Warning: UMAP model {config.UMAP_MODEL_PATH} is missing; cannot validate the BD table in {directory}. Ignoring it.")
+                return None
+            if model_hash != meta['umap_model_hash']:
+                print(f"Warning: BD table in {directory} was built with a different UMAP model. Ignoring it.")
+                return None
+        coords = np.load(os.path.join(directory, "coords.npy"), mmap_mode='r')
+        bins = np.load(os.path.join(directory, "bins.npy"), mmap_mode='r')
+        return cls(directory, gene_rules, coords, bins, meta)
+
+    def __len__(self) -> int:
+        return self.coords.shape[0]
+
+    def row_index(self, genotype: Dict[str, str]) -> Optional[int]:
+        """Flat row of a genotype's style combination, or None if a style gene is not in the grammar."""
+        row = 0
+        for gene, rule_index, radix in zip(STYLE_GENES, self._rule_index, self._radices):
+            i = rule_index.get(genotype.get(gene, ''))
+            if i is None:
+                return None
+            row = row * radix + i
+        return row
+
+    def lookup(self, genotype: Dict[str, str]) -> Optional[Tuple[np.ndarray, Tuple[int, ...]]]:
+        """Returns (bd_float_coords, bd_bin_coords) for a genotype, or None if it is not tabulated."""
+        row = self.row_index(genotype)
+        if row is None:
+            return None
+        return np.asarray(self.coords[row], dtype=float), tuple(int(b) for b in self.bins[row])
+
+    def ensure_bins(self, umap_min: Sequence[float], umap_max: Sequence[float], grid_shape: Sequence[int]):
+        """Re-bins the table in memory if it was built for different bounds or grid resolution."""
+        same = (np.allclose(self.meta['umap_min'], umap_min) and np.allclose(self.meta['umap_max'], umap_max)
+                and list(self.meta['grid_shape']) == list(grid_shape))
+        if not same:
+            self.bins = bin_coords_batch(self.coords, umap_min, umap_max, grid_shape)
+            self.meta = dict(self.meta, umap_min=list(umap_min), umap_max=list(umap_max), grid_shape=list(grid_shape))
+
+
+def build_bd_table(cfg_generator: 'CFGPromptGenerator', llm_handler: 'LLM_API_Handler', umap_model,
+                   directory: str = config.BD_TABLE_DIR,
+                   umap_min: Optional[Sequence[float]] = None, umap_max: Optional[Sequence[float]] = None,
+                   grid_shape: Sequence[int] = config.GRID_SHAPE) -> BehaviorDescriptorTable:
+    """
+    Enumerates every style combination of the grammar, embeds them in bulk, projects them
+    through the UMAP model and writes coords.npy, bins.npy and meta.json to `directory`.
+    If no bounds are given, the persisted UMAP bounds are used when available, else the
+    table's own extent padded by 10%; the algorithm re-bins on load when its bounds differ.
+    """
+    gene_rules = [cfg_generator.rules[gene] for gene in STYLE_GENES]
+    for gene, rules in zip(STYLE_GENES, gene_rules):
+        if any('<' in rule for rule in rules):
+            raise ValueError(f"Gene '{gene}' has non-terminal productions; its styles cannot be enumerated.")
+
+    combos = list(itertools.product(*gene_rules))
+    styles = [style_string(dict(zip(STYLE_GENES, combo))) for combo in combos]
+    print(f"Embedding {len(styles)} style combinations...")
+
+    batches = llm_handler.get_embeddings_batch(styles, config.EMBEDDING_BATCH_SIZE)
+    if any(batch is None for batch in batches):
+        raise ValueError("Failed to embed every style combination; not writing a partial BD table.")
+    embeddings = np.vstack(batches)
+
+    print("Projecting styles through UMAP...")
+    coords = np.asarray(umap_model.transform(embeddings), dtype=np.float32)
+    if umap_min is None or umap_max is None:
+        artifacts = load_umap_artifacts()
+        if artifacts is not None:
+            umap_min, umap_max = artifacts['umap_min'], artifacts['umap_max']
+    if umap_min is None or umap_max is None:
+        umap_min, umap_max = compute_bounds(coords)
+    bins = bin_coords_batch(coords, umap_min, umap_max, grid_shape).astype(np.int32)
+
+    os.makedirs(directory, exist_ok=True)
+    meta = {
+        "style_genes": list(STYLE_GENES),
+        "gene_rules": gene_rules,
+        "rules_hash": _rules_hash(gene_rules),
+        "umap_model_hash": file_sha256(config.UMAP_MODEL_PATH),
+        "umap_min": list(umap_min),
+        "umap_max": list(umap_max),
+        "grid_shape": list(grid_shape),
+        "num_rows": len(combos),
+    }
+    # meta.json marks the table as complete: drop the old one before touching the arrays of a
+    # previous build, and write the new one last, so load() never pairs it with other arrays.
+    meta_path = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    atomic_save_npy(os.path.join(directory, "coords.npy"), coords)
+    atomic_save_npy(os.path.join(directory, "bins.npy"), bins)
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+    print(f"✅ BD table with {len(combos)} rows saved to {directory}")
+    return BehaviorDescriptorTable.load(directory)
+
+
+if __name__ == "__main__":
+    from cfg_generator import CFGPromptGenerator
+    from llm_services import LLM_API_Handler
+
+    with open(config.UMAP_MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    build_bd_table(CFGPromptGenerator(config.CFG_RULES_PATH), LLM_API_Handler(config.HF_API_KEY), model)
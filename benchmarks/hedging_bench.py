@@ -0,0 +1,80 @@
+# benchmarks/hedging_bench.py
+# Latency of LLM calls with and without hedged requests against a simulated endpoint whose
+# responses usually take BASE_SECONDS but, with probability TAIL_PROBABILITY, TAIL_SECONDS.
+# No network is used: the handler's session.post is replaced by the simulation.
+# Run from the repository root: python benchmarks/hedging_bench.py
+
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from llm_services import LLM_API_Handler
+
+BASE_SECONDS = 0.05
+TAIL_SECONDS = 2.0
+TAIL_PROBABILITY = 0.03
+CALLS = 400
+CONCURRENCY = 8
+
+class SimulatedEndpoint:
+    def __init__(self, seed: int = 0):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.posts = 0
+
+    def post(self, endpoint_url, json=None, timeout=None):
+        with self._lock:
+            self.posts += 1
+            slow = self._rng.random() < TAIL_PROBABILITY
+        time.sleep(TAIL_SECONDS if slow else BASE_SECONDS)
+        return SimulatedResponse()
+
+class SimulatedResponse:
+    status_code = 200
+    ok = True
+    headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return [{"generated_text": "Step 1: ..."}]
+
+def run(hedge: bool):
+    config.LLM_CACHE_ENABLED = False
+    config.LLM_SCHEDULER_ENABLED = False
+    handler = LLM_API_Handler("bench-key", max_workers=CONCURRENCY,
+                              endpoint_concurrency={config.GENERATOR_LLM_ENDPOINT: CONCURRENCY})
+    handler.hedge_enabled = hedge
+    endpoint = SimulatedEndpoint()
+    handler.session.post = endpoint.post
+
+    def timed_call(i):
+        start = time.perf_counter()
+        handler._post_with_retries(config.GENERATOR_LLM_ENDPOINT, {"inputs": f"prompt {i}"}, "generation")
+        return time.perf_counter() - start
+
+    latencies = np.array(handler._map(timed_call, range(CALLS)))
+    stats = handler.endpoint_stats()[config.GENERATOR_LLM_ENDPOINT]
+    handler.close()
+    return latencies, endpoint.posts, stats
+
+def bench():
+    print(f"{CALLS} calls, {CONCURRENCY} concurrent; {BASE_SECONDS}s responses with a "
+          f"{TAIL_PROBABILITY:.0%} {TAIL_SECONDS}s tail; HEDGE_BUDGET={config.HEDGE_BUDGET}")
+    print(f"{'hedging':>8} {'p50 (s)':>8} {'p99 (s)':>8} {'max (s)':>8} {'extra requests':>15} {'hedge wins':>11}")
+    for hedge in (False, True):
+        latencies, posts, stats = run(hedge)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{'on' if hedge else 'off':>8} {p50:>8.3f} {p99:>8.3f} {latencies.max():>8.3f} "
+              f"{(posts - CALLS) / CALLS:>14.1%} {stats['hedge_wins']:>11}")
+
+if __name__ == "__main__":
+    bench()
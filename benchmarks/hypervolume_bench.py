@@ -0,0 +1,69 @@
+# benchmarks/hypervolume_bench.py
+# Compares the hypervolume engine in analysis_utils with a naive implementation.
+# Run from the repository root: python benchmarks/hypervolume_bench.py
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_utils import compute_hypervolume, IncrementalHypervolume2D
+
+REFERENCE_POINT = (0.0, 0.0)
+
+def naive_hypervolume(points, reference_point):
+    """O(n^3): sums every cell of the grid spanned by the point coordinates that some point dominates."""
+    pts = [(x, y) for x, y in points if x > reference_point[0] and y > reference_point[1]]
+    xs = sorted({reference_point[0]} | {x for x, _ in pts})
+    ys = sorted({reference_point[1]} | {y for _, y in pts})
+    volume = 0.0
+    for i in range(len(xs) - 1):
+        for j in range(len(ys) - 1):
+            if any(x >= xs[i + 1] and y >= ys[j + 1] for x, y in pts):
+                volume += (xs[i + 1] - xs[i]) * (ys[j + 1] - ys[j])
+    return volume
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def bench_exact(sizes=(10, 50, 100, 200)):
+    rng = np.random.default_rng(0)
+    print(f"{'n':>6} {'naive (s)':>12} {'sweep (s)':>12} {'speedup':>9}")
+    for n in sizes:
+        points = rng.random((n, 2)) * [2.0, 5.0]
+        expected, t_naive = timed(naive_hypervolume, points.tolist(), REFERENCE_POINT, repeat=1)
+        result, t_fast = timed(compute_hypervolume, points, REFERENCE_POINT)
+        assert abs(result - expected) < 1e-9 * max(1.0, expected)
+        print(f"{n:>6} {t_naive:>12.5f} {t_fast:>12.6f} {t_naive / t_fast:>8.0f}x")
+
+def bench_incremental(n=5000):
+    """Hypervolume after every insertion: incremental updates vs recomputing with the sweep."""
+    rng = np.random.default_rng(1)
+    points = rng.random((n, 2))
+    # Points near the anti-diagonal, so the front keeps changing.
+    points[:, 1] = np.clip(1.0 - points[:, 0] + rng.normal(0, 0.02, n), 0.001, None)
+
+    start = time.perf_counter()
+    hv = IncrementalHypervolume2D(REFERENCE_POINT)
+    for p in points:
+        hv.add(p)
+    t_incremental = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, n, 50):
+        compute_hypervolume(points[:i + 1], REFERENCE_POINT)
+    t_recompute = (time.perf_counter() - start) * 50
+    assert abs(hv.value - compute_hypervolume(points, REFERENCE_POINT)) < 1e-9
+    print(f"\n{n} insertions: incremental {t_incremental:.4f}s, "
+          f"recompute after each (extrapolated) {t_recompute:.4f}s, front size {len(hv)}")
+
+if __name__ == "__main__":
+    bench_exact()
+    bench_incremental()
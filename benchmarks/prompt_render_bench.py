@@ -0,0 +1,50 @@
+# benchmarks/prompt_render_bench.py
+# Compares the compiled prompt template with the original replace-based construct_full_prompt.
+# Run from the repository root: python benchmarks/prompt_render_bench.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from cfg_generator import CFGPromptGenerator
+from task_loader import TaskLoader
+
+def original_construct_full_prompt(start_symbol, genotype, problem_text):
+    """construct_full_prompt before templates: one replace pass per gene, then a split/join."""
+    prompt = start_symbol
+    for key, value in genotype.items():
+        value = value.replace("PROBLEM_PLACEHOLDER", problem_text)
+        prompt = prompt.replace(f"<{key}>", value)
+    prompt = prompt.replace("<macgyver_problem_text>", problem_text)
+    prompt = prompt.replace("<opening_salutation>", "")
+    return " ".join(prompt.split())
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def bench(sizes=(1500, 20000)):
+    random.seed(0)
+    cfg_generator = CFGPromptGenerator(config.CFG_RULES_PATH)
+    task_loader = TaskLoader(config.MACGYVER_DATASET_PATH)
+    print(f"{'n':>7} {'original (s)':>13} {'template (s)':>13} {'batch (s)':>11} {'speedup':>8}")
+    for n in sizes:
+        pairs = [(cfg_generator.generate_random_genotype(), task_loader.get_random_problem()['problem_text'])
+                 for _ in range(n)]
+        expected, t_original = timed(lambda: [original_construct_full_prompt(cfg_generator.start_symbol, g, p)
+                                              for g, p in pairs])
+        single, t_template = timed(lambda: [cfg_generator.construct_full_prompt(g, p) for g, p in pairs])
+        batch, t_batch = timed(lambda: cfg_generator.construct_full_prompts(pairs))
+        assert single == expected and batch == expected
+        print(f"{n:>7} {t_original:>13.4f} {t_template:>13.4f} {t_batch:>11.4f} {t_original / t_batch:>7.1f}x")
+
+if __name__ == "__main__":
+    bench()
@@ -3,8 +3,14 @@
 
 import yaml
 import random
-import re
-from typing import Dict, List, Tuple, Optional
+from functools import cached_property
+from typing import Dict, Iterable, List, Tuple, Optional, Sequence
+
+import numpy as np
+
+from compiled_grammar import CompiledGrammar, default_rng
+from genotype_parser import GenotypeParser
+from prompt_template import PromptTemplate
 
 class CFGPromptGenerator:
     """
@@ -16,6 +22,9 @@ class CFGPromptGenerator:
             self.rules: Dict[str, List[str]] = yaml.safe_load(f)
         self.start_symbol = self.rules['start'][0]
         self.non_terminals = [f"<{key}>" for key in self.rules.keys() if key != 'start']
+        gene_keys = [symbol.strip('<>') for symbol in self.start_symbol.split(' ') if symbol.strip('<>') in self.rules]
+        self.grammar = CompiledGrammar(self.rules, gene_keys)
+        self.template = PromptTemplate(self.start_symbol)
 
     def generate_random_genotype(self, baseline: bool = False) -> Dict[str, str]:
         """Generates a random dictionary representing a prompt's genetic makeup.
@@ -38,31 +47,21 @@ class CFGPromptGenerator:
         if key not in self.rules:
             return symbol # It's a terminal
 
-        # Choose a random production rule for this symbol
-        production_rule = random.choice(self.rules[key])
-        
-        # Find all non-terminals in the chosen rule and expand them
-        expanded_parts = []
-        parts = re.split('(<[^>]+>)', production_rule)
-        for part in parts:
-            if part.startswith('<') and part.endswith('>'):
-                expanded_parts.append(self._expand_symbol(part))
-            else:
-                expanded_parts.append(part)
-        
-        return "".join(expanded_parts)
+        # Choose a random production rule for this symbol (pre-tokenized by the compiled grammar)
+        return self._expand_tokens(random.choice(self.grammar.productions[self.grammar.symbol_index[key]]))
+
+    def _expand_tokens(self, tokens) -> str:
+        # Literals are kept; symbol indices are expanded recursively.
+        return "".join(token if isinstance(token, str) else self._expand_symbol(f"<{self.grammar.symbols[token]}>")
+                       for token in tokens)
 
     def construct_full_prompt(self, genotype: Dict[str, str], problem_text: str) -> str:
         """Constructs the final prompt string from a genotype and a problem."""
-        prompt = self.start_symbol
-        for key, value in genotype.items():
-            # Replace PROBLEM_PLACEHOLDER in gene values as well
-            value = value.replace("PROBLEM_PLACEHOLDER", problem_text)
-            prompt = prompt.replace(f"<{key}>", value)
-        # Replace the final placeholder with the actual problem text (for templates)
-        prompt = prompt.replace("<macgyver_problem_text>", problem_text)
-        prompt = prompt.replace("<opening_salutation>", "")
-        return " ".join(prompt.split()) # Normalize whitespace
+        return self.template.render(genotype, problem_text)
+
+    def construct_full_prompts(self, pairs: Iterable[Tuple[Dict[str, str], str]]) -> List[str]:
+        """Constructs the prompts for many (genotype, problem_text) pairs in one call."""
+        return self.template.render_batch(pairs)
 
     def mutate_genotype(self, genotype: Dict[str, str], mutation_rate: float) -> Dict[str, str]:
         """
@@ -89,33 +88,56 @@ class CFGPromptGenerator:
             
         return child1, child2
         
+    # --- Integer-coded genotypes (see compiled_grammar.py) ---
+
+    def generate_random_codes(self, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Generates n random genotypes at once as an (n, genes) array of integer codes."""
+        return self.grammar.random_codes(n, default_rng(rng))
+
+    def generate_random_genotypes(self, n: int, rng: Optional[np.random.Generator] = None) -> List[Dict[str, str]]:
+        """Generates n random dict genotypes with the vectorized integer-coded path."""
+        return self.grammar.decode_batch(self.generate_random_codes(n, rng))
+
+    def encode_genotype(self, genotype: Dict[str, str]) -> Tuple[int, ...]:
+        return self.grammar.encode(genotype)
+
+    def decode_genotype(self, codes: Sequence[int]) -> Dict[str, str]:
+        return self.grammar.decode(codes)
+
+    def mutate_codes(self, codes: np.ndarray, mutation_rate: float,
+                     rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """mutate_genotype for a batch of integer-coded genotypes."""
+        return self.grammar.mutate_codes(codes, mutation_rate, default_rng(rng))
+
+    def crossover_codes(self, parents1: np.ndarray, parents2: np.ndarray,
+                        rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """crossover_genotypes for paired batches of integer-coded genotypes."""
+        return self.grammar.crossover_codes(parents1, parents2, default_rng(rng))
+
+    def render_codes(self, codes: Sequence[int], problem_text: str) -> str:
+        """The full prompt text of an integer-coded genotype."""
+        return self.construct_full_prompt(self.grammar.decode(codes), problem_text)
+
+    @cached_property
+    def parser(self) -> GenotypeParser:
+        try:
+            gene_values = self.grammar.gene_expansions()
+        except ValueError:
+            # Recursive grammar: match the rules' literal text, as the original heuristic did.
+            gene_values = {key: self.rules[key] for key in self.rules if key != 'start'}
+        return GenotypeParser(gene_values)
+
     def prompt_text_to_genotype(self, prompt_text: str) -> Optional[Dict[str, str]]:
         """
-        A simplified heuristic to reconstruct a genotype from prompt text.
-        NOTE: This is non-trivial and may not be perfect if grammar rules overlap.
-        This function assumes that each rule choice is unique enough to be identified.
+        Reconstructs a genotype from prompt text with one pass of a multi-pattern automaton
+        over every value the genes can take; overlapping matches go to the longest, then
+        earliest, value.
         """
-        genotype = {}
-        for key, ruleset in self.rules.items():
-            if key in ['start', 'macgyver_problem_text']:
-                continue
-            
-            # Find which rule from the ruleset is present in the prompt text
-            found_rule = ""
-            for rule in ruleset:
-                # Clean the rule for matching (remove placeholders)
-                clean_rule = re.sub(r'<[^>]+>', '', rule).strip()
-                if clean_rule and clean_rule in prompt_text:
-                    found_rule = rule
-                    break
-            genotype[key] = found_rule
-            
-        # Check if all keys were found
-        expected_keys = [k.strip('<>') for k in self.start_symbol.split()]
-        if all(k in genotype for k in expected_keys):
-            return genotype
-        else:
+        genotype = self.parser.parse(prompt_text)
+        if genotype is None:
             print(f"Warning: Could not fully reconstruct genotype for prompt: {prompt_text[:100]}...")
-            return None
-
+        return genotype
 
+    def prompt_texts_to_genotypes(self, prompt_texts: Iterable[str]) -> List[Optional[Dict[str, str]]]:
+        """Batch version of prompt_text_to_genotype (None where a genotype could not be reconstructed)."""
+        return self.parser.parse_batch(prompt_texts)
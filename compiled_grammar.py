@@ -0,0 +1,156 @@
+# compiled_grammar.py
+# Compiled form of the prompt CFG. Every production is tokenized once into literals and
+# symbol indices, so expansion no longer re-splits production strings. For grammars whose
+# genes derive a finite set of strings (no recursion), each gene's derivations are also
+# enumerated into a table, and a genotype becomes a compact tuple of integer codes (one per
+# gene) that can be hashed, compared and stored cheaply and rendered back to text on demand.
+# Batches of coded genotypes are NumPy arrays (one row per genotype) for vectorized random
+# generation, mutation and crossover.
+
+import re
+from functools import cached_property
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# A compiled production: literal strings and indices into CompiledGrammar.symbols.
+Token = Union[str, int]
+CODE_DTYPE = np.int32
+# Upper bound on the derivations enumerated for one gene.
+MAX_GENE_EXPANSIONS = 100_000
+
+_SYMBOL_PATTERN = re.compile('(<[^>]+>)')
+
+class CompiledGrammar:
+    """
+    Tokenized productions of a grammar plus, per gene, the table of all its derivations.
+    Code i of a gene is the i-th derivation; codes are sampled with the same
+    distribution as recursively expanding the gene with a uniform choice at every step.
+    """
+    def __init__(self, rules: Dict[str, List[str]], gene_keys: Sequence[str]):
+        self.symbols: List[str] = list(rules.keys())
+        self.symbol_index: Dict[str, int] = {key: i for i, key in enumerate(self.symbols)}
+        self.productions: List[List[Tuple[Token, ...]]] = [
+            [self._tokenize(production) for production in rules[key]] for key in self.symbols
+        ]
+        self.gene_keys: Tuple[str, ...] = tuple(dict.fromkeys(gene_keys))
+        self._gene_symbols = [self.symbol_index[key] for key in self.gene_keys]
+
+    def _tokenize(self, production: str) -> Tuple[Token, ...]:
+        tokens: List[Token] = []
+        for part in _SYMBOL_PATTERN.split(production):
+            key = part.strip('<>') if part.startswith('<') and part.endswith('>') else None
+            if key in self.symbol_index:
+                tokens.append(self.symbol_index[key])
+            elif part:
+                # Unknown <...> parts are terminals; adjacent literals are merged.
+                if tokens and isinstance(tokens[-1], str):
+                    tokens[-1] += part
+                else:
+                    tokens.append(part)
+        return tuple(tokens)
+
+    # --- Derivation tables ---
+
+    @cached_property
+    def _tables(self) -> Tuple[List[List[str]], List[np.ndarray], List[Dict[str, int]]]:
+        memo: Dict[int, List[Tuple[str, float]]] = {}
+
+        def derive(symbol: int, stack: Tuple[int, ...]) -> List[Tuple[str, float]]:
+            if symbol in stack:
+                raise ValueError(f"Grammar symbol <{self.symbols[symbol]}> is recursive; genotypes cannot be integer-coded.")
+            if symbol in memo:
+                return memo[symbol]
+            choice_p = 1.0 / len(self.productions[symbol])
+            derivations: List[Tuple[str, float]] = []
+            for tokens in self.productions[symbol]:
+                partial = [("", choice_p)]
+                for token in tokens:
+                    if isinstance(token, str):
+                        partial = [(text + token, p) for text, p in partial]
+                    else:
+                        partial = [(text + sub, p * sub_p) for text, p in partial
+                                   for sub, sub_p in derive(token, stack + (symbol,))]
+                    if len(partial) > MAX_GENE_EXPANSIONS:
+                        raise ValueError(f"Grammar symbol <{self.symbols[symbol]}> derives more than "
+                                         f"{MAX_GENE_EXPANSIONS} strings; genotypes cannot be integer-coded.")
+                derivations.extend(partial)
+            memo[symbol] = derivations
+            return derivations
+
+        expansions, weights, codes = [], [], []
+        for symbol in self._gene_symbols:
+            derivations = derive(symbol, ())
+            expansions.append([text for text, _ in derivations])
+            p = np.array([p for _, p in derivations])
+            # None marks a uniform gene, which samples with integers() instead of choice().
+            weights.append(None if np.allclose(p, p[0]) else p / p.sum())
+            gene_codes: Dict[str, int] = {}
+            for code, text in enumerate(expansions[-1]):
+                gene_codes.setdefault(text, code)
+            codes.append(gene_codes)
+        return expansions, weights, codes
+
+    @property
+    def gene_sizes(self) -> Tuple[int, ...]:
+        """Number of codes per gene."""
+        return tuple(len(table) for table in self._tables[0])
+
+    def gene_expansions(self) -> Dict[str, List[str]]:
+        """Every string each gene derives, in code order."""
+        return dict(zip(self.gene_keys, self._tables[0]))
+
+    # --- Conversion ---
+
+    def encode(self, genotype: Dict[str, str]) -> Tuple[int, ...]:
+        """Integer codes of a dict genotype; ValueError if a gene is missing or not derivable."""
+        codes = []
+        for key, gene_codes in zip(self.gene_keys, self._tables[2]):
+            try:
+                codes.append(gene_codes[genotype[key]])
+            except KeyError:
+                raise ValueError(f"Gene '{key}' of the genotype is not derivable from the grammar.") from None
+        return tuple(codes)
+
+    def decode(self, codes: Sequence[int]) -> Dict[str, str]:
+        """The dict genotype for a tuple (or array row) of codes."""
+        return {key: table[code] for key, table, code in zip(self.gene_keys, self._tables[0], codes)}
+
+    def decode_batch(self, codes: np.ndarray) -> List[Dict[str, str]]:
+        return [self.decode(row) for row in np.asarray(codes).tolist()]
+
+    # --- Vectorized operators ---
+
+    def random_codes(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """An (n, genes) array of random genotypes."""
+        columns = []
+        for size, p in zip(self.gene_sizes, self._tables[1]):
+            columns.append(rng.integers(0, size, n) if p is None else rng.choice(size, n, p=p))
+        return np.stack(columns, axis=1).astype(CODE_DTYPE) if columns else np.zeros((n, 0), CODE_DTYPE)
+
+    def baseline_codes(self, n: int = 1) -> np.ndarray:
+        """Genotypes made of every gene's first derivation (the empty/default choice)."""
+        return np.zeros((n, len(self.gene_keys)), CODE_DTYPE)
+
+    def mutate_codes(self, codes: np.ndarray, mutation_rate: float, rng: np.random.Generator) -> np.ndarray:
+        """Redraws each gene of each row with probability `mutation_rate`."""
+        codes = np.atleast_2d(np.asarray(codes, dtype=CODE_DTYPE))
+        mask = rng.random(codes.shape) < mutation_rate
+        return np.where(mask, self.random_codes(len(codes), rng), codes)
+
+    def crossover_codes(self, parents1: np.ndarray, parents2: np.ndarray,
+                        rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """Single-point crossover of paired rows: genes from a random point onward are swapped."""
+        parents1 = np.atleast_2d(np.asarray(parents1, dtype=CODE_DTYPE))
+        parents2 = np.atleast_2d(np.asarray(parents2, dtype=CODE_DTYPE))
+        n, genes = parents1.shape
+        if genes < 2:
+            return parents1.copy(), parents2.copy()
+        points = rng.integers(1, genes, n)
+        swap = np.arange(genes) >= points[:, None]
+        return np.where(swap, parents2, parents1), np.where(swap, parents1, parents2)
+
+
+def default_rng(rng: Optional[np.random.Generator] = None) -> np.random.Generator:
+    """`rng`, or a Generator seeded from NumPy's global state so seeded runs stay reproducible."""
+    return rng if rng is not None else np.random.default_rng(np.random.randint(0, 2 ** 31 - 1))
@@ -25,6 +25,56 @@ EMBEDDING_LLM_ENDPOINT = "https://o3jty2wadjfqgs48.us-east-1.aws.endpoints.huggi
 NLI_MODEL_ENDPOINT = "https://o61g3q0p0o7796bl.us-east-1.aws.endpoints.huggingface.cloud"
 
 
+# --- Request Concurrency ---
+# Worker threads used by the LLM handler for batched and awaitable calls.
+LLM_MAX_WORKERS = 16
+# Max number of simultaneous in-flight requests per endpoint.
+# Endpoints not listed here fall back to DEFAULT_ENDPOINT_CONCURRENCY.
+DEFAULT_ENDPOINT_CONCURRENCY = 4
+ENDPOINT_CONCURRENCY = {
+    GENERATOR_LLM_ENDPOINT: 4,
+    EVALUATOR_LLM_ENDPOINT: 4,
+    EMBEDDING_LLM_ENDPOINT: 8,
+    NLI_MODEL_ENDPOINT: 8,
+}
+# Adaptive (AIMD) concurrency per endpoint (llm_control.py): the limits above are the starting
+# windows. A window grows by AIMD_ADDITIVE_INCREASE per window's worth of healthy responses and
+# is multiplied by AIMD_DECREASE_FACTOR on 429/503 responses and timeouts.
+AIMD_ENABLED = True
+AIMD_MIN_CONCURRENCY = 1
+AIMD_MAX_CONCURRENCY = 16
+AIMD_ADDITIVE_INCREASE = 1.0
+AIMD_DECREASE_FACTOR = 0.5
+# Responses slower than this multiple of the endpoint's p50 latency do not grow the window.
+AIMD_LATENCY_TOLERANCE = 2.0
+# Recent latencies kept per endpoint for the p50/p95 estimates.
+LATENCY_WINDOW_SIZE = 200
+# Retry delays: uniform in [0, min(max, base * 2**attempt)], and at least any Retry-After.
+LLM_BACKOFF_BASE_SECONDS = 2.0
+LLM_BACKOFF_MAX_SECONDS = 60.0
+# Request timeouts follow each endpoint's latency: ADAPTIVE_TIMEOUT_MULTIPLIER x its
+# ADAPTIVE_TIMEOUT_PERCENTILE latency, clamped to [ADAPTIVE_TIMEOUT_MIN_SECONDS,
+# LLM_REQUEST_TIMEOUT_SECONDS]. The maximum applies until LATENCY_MIN_SAMPLES responses are in.
+LLM_REQUEST_TIMEOUT_SECONDS = 300
+ADAPTIVE_TIMEOUTS = True
+ADAPTIVE_TIMEOUT_PERCENTILE = 99
+ADAPTIVE_TIMEOUT_MULTIPLIER = 3.0
+ADAPTIVE_TIMEOUT_MIN_SECONDS = 30
+LATENCY_MIN_SAMPLES = 20
+# Hedged requests: if a call of one of HEDGE_CLASSES (see LLM_SCHEDULER_PRIORITIES) has not
+# answered after its endpoint's p95 latency, a duplicate is sent and the first response wins.
+# Hedges are capped at HEDGE_BUDGET times the endpoint's other requests.
+HEDGE_ENABLED = False
+HEDGE_CLASSES = ("generation", "evaluation")
+HEDGE_BUDGET = 0.05
+# Batch size for embedding requests (reduce if the endpoint returns 413 errors).
+EMBEDDING_BATCH_SIZE = 32
+# Multi-problem sweeps (sweep.py): experiments run in parallel processes and share
+# one global cap on in-flight LLM requests across all of them.
+SWEEP_PROCESSES = 4
+SWEEP_MAX_LLM_REQUESTS = 16
+
+
 # --- File and Directory Paths ---
 DATA_DIR = "data"
 RESULTS_DIR = "results"
@@ -41,6 +91,54 @@ MACGYVER_DATASET_PATH = os.path.join(DATA_DIR, "macgyver_dataset.json")
 # Output files from UMAP preparation
 UMAP_MODEL_PATH = os.path.join(RESULTS_DIR, "trained_umap_model.pkl")
 UMAP_PROMPT_DATASET_PATH = os.path.join(RESULTS_DIR, "umap_prompt_dataset.jsonl")
+# Training embeddings, their projection and the BD bounds (see umap_artifacts.py)
+UMAP_EMBEDDINGS_PATH = os.path.join(RESULTS_DIR, "umap_training_embeddings.npy")
+UMAP_COORDS_PATH = os.path.join(RESULTS_DIR, "umap_training_coords.npy")
+UMAP_BOUNDS_PATH = os.path.join(RESULTS_DIR, "umap_bounds.json")
+UMAP_ARTIFACTS_VERSION = 1
+# Precomputed behavior descriptors for every style combination (see bd_table.py)
+BD_TABLE_DIR = os.path.join(RESULTS_DIR, "bd_table")
+# Cached centroids of the CVT archive backend
+CVT_CENTROIDS_PATH = os.path.join(RESULTS_DIR, "cvt_centroids.npz")
+# Exported kNN approximation of the UMAP transform (see projection.py)
+KNN_PROJECTOR_PATH = os.path.join(RESULTS_DIR, "knn_projector.npz")
+
+
+# --- LLM Response Cache ---
+# Deterministic calls (embeddings, NLI, greedy decoding) are served from disk across runs.
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(RESULTS_DIR, "llm_cache.sqlite")
+# Bump this tag to invalidate every cached response (e.g. after redeploying a model).
+LLM_CACHE_VERSION = "v1"
+# If True, sampled generations are cached too, keyed by (replay seed, occurrence slot),
+# so re-running with the same seed replays the same responses in the same order.
+# MAP-Elites numbers the slots per individual (generation, position in the generation),
+# so replay does not depend on how concurrent evaluations interleave.
+LLM_CACHE_SAMPLED = False
+LLM_CACHE_REPLAY_SEED = 0
+# Eviction limits: entries older than the max age are dropped first, then the
+# least recently used ones until the cache fits in the size budget.
+LLM_CACHE_MAX_BYTES = 2 * 1024 ** 3
+LLM_CACHE_MAX_AGE_DAYS = 30
+LLM_CACHE_EVICT_EVERY = 500
+# Identical deterministic requests issued while one is already in flight wait for its
+# response instead of sending their own (single-flight).
+LLM_COALESCE_REQUESTS = True
+
+# --- Cross-Experiment LLM Scheduler (llm_scheduler.py) ---
+# When enabled, every LLM_API_Handler routes its HTTP requests through the scheduler
+# daemon (`python llm_scheduler.py`), which enforces the endpoint concurrency above across
+# all processes. Handlers send requests directly if the daemon is not running.
+LLM_SCHEDULER_ENABLED = False
+LLM_SCHEDULER_ADDRESS = os.path.join(RESULTS_DIR, "llm_scheduler.sock")
+LLM_SCHEDULER_AUTHKEY = b"llm-scheduler"
+# Optional cap on in-flight requests across all endpoints (None = only per-endpoint limits).
+LLM_SCHEDULER_MAX_IN_FLIGHT = None
+# Token-bucket rate limits per endpoint URL: (requests per second, burst size).
+LLM_SCHEDULER_RATE_LIMITS = {}
+# Lower classes are served first, so individuals already being evaluated finish before
+# new generations start. Within a class, the experiment with the fewest in-flight requests goes next.
+LLM_SCHEDULER_PRIORITIES = {"nli": 0, "evaluation": 0, "embedding": 1, "generation": 2}
 
 
 # --- Semantic Entropy Calculation ---
@@ -48,6 +146,8 @@ UMAP_PROMPT_DATASET_PATH = os.path.join(RESULTS_DIR, "umap_prompt_dataset.jsonl"
 NUM_SOLUTION_VARIATIONS = 5
 # NLI entailment threshold for clustering. A higher value means stricter clustering.
 NLI_ENTAILMENT_THRESHOLD = 0.6
+# Max number of (premise, hypothesis) pairs scored by one batched NLI request.
+NLI_BATCH_SIZE = 64
 
 
 # --- UMAP Configuration (for Behavior Descriptors) ---
@@ -56,6 +156,10 @@ UMAP_TRAINING_PROMPTS = 1500
 UMAP_N_NEIGHBORS = 15  # Default is 15. Controls local vs. global structure.
 UMAP_MIN_DIST = 0.1   # Default is 0.1. Controls how tightly points are packed.
 UMAP_N_COMPONENTS = 2 # 2 for 2D visualization.
+# BD projector used by MAP-Elites: "umap" (the trained model) or "knn" (a kNN interpolation
+# exported by prepare_umap.py that loads without importing umap; falls back to "umap").
+PROJECTOR = "umap"
+KNN_PROJECTOR_K = 10 # Neighbours interpolated by the kNN projector.
 
 
 # --- Evolutionary Algorithm Hyperparameters ---
@@ -64,13 +168,45 @@ UMAP_N_COMPONENTS = 2 # 2 for 2D visualization.
 # weights like W_DIVERGENT are not needed. The algorithms will find the
 # optimal trade-off front between the two objectives automatically.
 
+# Hypervolume reference point (divergent, convergent). Both objectives are maximised,
+# so only scores strictly above it count towards hypervolumes and the MOME QD-score.
+HYPERVOLUME_REFERENCE_POINT = (0.0, 0.0)
+
 # General settings
 NUM_GENERATIONS =  20 # Number of generations to run the main loop.
 NUM_INITIAL_POPULATION = 8 # Number of initial random individuals.
 
 # MAP-Elites specific settings
-GRID_SHAPE = (10, 10) # The resolution of the MAP-Elites grid.
+GRID_SHAPE = (10, 10) # The resolution of the MAP-Elites grid, one entry per UMAP component.
+# Archive storage: "grid" preallocates every cell of GRID_SHAPE; "sparse" only stores
+# occupied cells (hashed by flat grid index), e.g. for 3D/4D grids such as (20, 20, 20);
+# "cvt" ignores GRID_SHAPE and uses CVT_NUM_CENTROIDS Voronoi cells (CVT-MAP-Elites).
+ARCHIVE_BACKEND = "grid"
+# CVT centroids: k-means on the UMAP training projections, cached in CVT_CENTROIDS_PATH.
+CVT_NUM_CENTROIDS = 100
 CELL_CAPACITY_LIMIT = 5 # Max number of elites on a cell's Pareto front.
+# Number of individuals evaluated concurrently (opt-in). With more than one worker (or with
+# PIPELINED_EVALUATION), each generation selects and mutates all parents up front from the
+# archive as it stood at the start of the generation, evaluates the offspring in parallel and
+# inserts them in submission order. This changes the search dynamics: within a generation,
+# parents no longer see the offspring inserted before them. 1 keeps the sequential loop.
+EVALUATION_WORKERS = 1
+# Pipelined evaluation (evaluation.PipelinedSolutionEvaluator): instead of evaluating whole
+# individuals in parallel, each stage (generate, score, variations, entropy) gets its own
+# workers and a bounded input queue of PIPELINE_QUEUE_SIZE, so the endpoints work concurrently.
+PIPELINED_EVALUATION = False
+PIPELINE_STAGE_WORKERS = {"generate": 4, "score": 4, "variations": 4, "entropy": 4}
+PIPELINE_QUEUE_SIZE = 8
+# Write a crash-safe checkpoint (results/<CHECKPOINT_FILENAME>) every N generations.
+# Resume with: python main.py map_elites --resume
+CHECKPOINT_INTERVAL = 1
+CHECKPOINT_FILENAME = "map_elites_checkpoint.pkl"
+# Fitness memoization (fitness_memo.py), keyed by (genes, problem id), used by MAP-Elites and the GA:
+# "skip" evaluates each duplicate genotype once and reuses its result; "cap" allows up to
+# FITNESS_MEMO_MAX_EVALUATIONS evaluations per key (noisy fitness) and then reuses them in turn;
+# "off" evaluates every individual.
+FITNESS_MEMO_POLICY = "skip"
+FITNESS_MEMO_MAX_EVALUATIONS = 3
 
 # Genetic Algorithm (NSGA-II) specific settings
 POPULATION_SIZE = 5
@@ -78,3 +214,12 @@ POPULATION_SIZE = 5
 MUTATION_RATE = 0.5
 # The probability of performing crossover between two parents.
 CROSSOVER_RATE = 0.5
+
+# Steady-state MAP-Elites specific settings (no generation barrier)
+# Number of workers that each keep selecting, evaluating and inserting individuals.
+STEADY_STATE_WORKERS = 5
+# Total evaluation budget; defaults to the same budget as a generational run.
+STEADY_STATE_TOTAL_EVALUATIONS = NUM_INITIAL_POPULATION + NUM_GENERATIONS * POPULATION_SIZE
+# Log a summary every N completed evaluations and snapshot the archive every M.
+STEADY_STATE_LOG_INTERVAL = POPULATION_SIZE
+STEADY_STATE_SNAPSHOT_INTERVAL = 5 * POPULATION_SIZE
@@ -2,8 +2,12 @@
 # Contains the core logic for evaluating prompts and solutions.
 
 import math
-from typing import List, Dict, Any
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
+from llm_cache import replay_scope
 from llm_services import LLM_API_Handler
 import config
 
@@ -52,26 +56,50 @@ class SemanticEntropyCalculator:
         if not solution_variations or len(solution_variations) < 2:
             return 0.0
 
+        # Score the full bidirectional entailment matrix in one batch, then cluster locally.
+        texts = list(dict.fromkeys(solution_variations))
+        index = {text: i for i, text in enumerate(texts)}
+        pairs = [(premise, hypothesis) for premise in texts for hypothesis in texts]
+        scores = self.llm_handler.check_nli_entailment_batch(pairs)
+        n = len(texts)
+        entailment = [scores[i * n:(i + 1) * n] for i in range(n)]
+
+        clusters = self.cluster_by_entailment(solution_variations, entailment, index)
+        
+        total_variations = len(solution_variations)
+        probabilities = [len(cluster) / total_variations for cluster in clusters]
+        entropy = -sum(p * math.log2(p) for p in probabilities if p > 0)
+        return entropy
+
+    @staticmethod
+    def cluster_by_entailment(solution_variations: List[str], entailment: List[List[float]],
+                              index: Dict[str, int]) -> List[List[str]]:
+        """
+        Greedy bidirectional-entailment clustering: each variation joins the first cluster
+        whose representative (first member) entails it and is entailed by it.
+        entailment[i][j] is the NLI score for premise i, hypothesis j.
+        """
         clusters: List[List[str]] = []
         for variation in solution_variations:
+            v = index[variation]
             placed = False
             for cluster in clusters:
-                score1 = self.llm_handler.check_nli_entailment(premise=cluster[0], hypothesis=variation)
-                score2 = self.llm_handler.check_nli_entailment(premise=variation, hypothesis=cluster[0])
+                r = index[cluster[0]]
+                score1 = entailment[r][v]
+                score2 = entailment[v][r]
                 if score1 > config.NLI_ENTAILMENT_THRESHOLD and score2 > config.NLI_ENTAILMENT_THRESHOLD:
                     cluster.append(variation)
                     placed = True
                     break
             if not placed:
                 clusters.append([variation])
-        
-        total_variations = len(solution_variations)
-        probabilities = [len(cluster) / total_variations for cluster in clusters]
-        entropy = -sum(p * math.log2(p) for p in probabilities if p > 0)
-        return entropy
+        return clusters
 
 class SolutionEvaluator:
     """Orchestrates the full evaluation pipeline for a single prompt."""
+    # Stage order; each stage is a _stage_<name>(job) method (see evaluate_prompt).
+    STAGES = ("generate", "score", "variations", "entropy")
+
     def __init__(self, llm_handler: LLM_API_Handler):
         self.llm_handler = llm_handler
         self.entropy_calculator = SemanticEntropyCalculator(llm_handler)
@@ -80,57 +108,186 @@ class SolutionEvaluator:
         """
         Takes a prompt, generates a full solution, evaluates it, and calculates entropy on its first step.
         """
-        # --- NEW, ROBUST WORKFLOW ---
-        
+        job = {"prompt": full_prompt_text, "problem_text": problem_text}
+        for stage in self.STAGES:
+            if not getattr(self, f"_stage_{stage}")(job):
+                break
+        return job["result"]
+
+    @staticmethod
+    def _failed_result(solution_text: str) -> Dict[str, Any]:
+        return {
+            "raw_divergent": 0.0,  # Renamed from semantic_entropy
+            # "msttr": 0.0,  # Commented out lexical diversity
+            "raw_convergent": 0.0,
+            "safety": 0.0,
+            "feasibility": 0.0,
+            "effectiveness": 0.0,
+            "solution_text": solution_text
+        }
+
+    # --- Stages: each fills in its part of the job and returns False once job["result"] is final ---
+
+    def _stage_generate(self, job: Dict[str, Any]) -> bool:
         # 1. Generate ONE high-quality solution first.
-        main_solution = self.llm_handler.generate_solution(full_prompt_text)
-        if not main_solution:
+        job["solution"] = self.llm_handler.generate_solution(job["prompt"])
+        if not job["solution"]:
             print("  - FAILED: Generator did not produce a solution.")
-            return {
-                "raw_divergent": 0.0,  # Renamed from semantic_entropy
-                # "msttr": 0.0,  # Commented out lexical diversity
-                "raw_convergent": 0.0,
-                "safety": 0.0,
-                "feasibility": 0.0,
-                "effectiveness": 0.0,
-                "solution_text": ""
-            }
+            job["result"] = self._failed_result("")
+            return False
+        return True
 
+    def _stage_score(self, job: Dict[str, Any]) -> bool:
         # 2. Evaluate the complete solution for Convergent Creativity.
-        scores = self.llm_handler.evaluate_solution_with_scores(problem_text, main_solution)
-        if not scores:
+        job["scores"] = self.llm_handler.evaluate_solution_with_scores(job["problem_text"], job["solution"])
+        if not job["scores"]:
             print("  - FAILED: Evaluator did not produce valid scores.")
-            return {
-                "raw_divergent": 0.0,  # Renamed from semantic_entropy
-                # "msttr": 0.0,  # Commented out lexical diversity
-                "raw_convergent": 0.0,
-                "safety": 0.0,
-                "feasibility": 0.0,
-                "effectiveness": 0.0,
-                "solution_text": main_solution
-            }
+            job["result"] = self._failed_result(job["solution"])
+            return False
+        return True
 
+    def _stage_variations(self, job: Dict[str, Any]) -> bool:
         # 3. Generate variations of the FIRST STEP of the good solution for Divergent Creativity.
-        variations = self.llm_handler.generate_variations_for_step(main_solution)
-        raw_divergent = self.entropy_calculator.calculate_entropy(variations)  # Renamed from semantic_entropy
+        job["variations"] = self.llm_handler.generate_variations_for_step(job["solution"])
+        return True
+
+    def _stage_entropy(self, job: Dict[str, Any]) -> bool:
+        raw_divergent = self.entropy_calculator.calculate_entropy(job["variations"])  # Renamed from semantic_entropy
 
         # Calculate MSTTR for lexical diversity (now commented out)
         # lex_div_calc = LexicalDiversityCalculator(segment_length=50)
         # msttr = lex_div_calc.msttr(variations)
 
         # 4. Combine convergent scores using geometric mean.
+        scores = job["scores"]
         s = scores.get("safety", 0.0)
         f = scores.get("feasibility", 0.0)
         e = scores.get("effectiveness", 0.0)
         raw_convergent = (s * f * e) ** (1/3) if all(v > 0 for v in [s, f, e]) else 0.0
 
-        return {
+        job["result"] = {
             "raw_divergent": raw_divergent,  # Renamed from semantic_entropy
             # "msttr": msttr,  # Commented out lexical diversity
             "raw_convergent": raw_convergent,
             "safety": s,
             "feasibility": f,
             "effectiveness": e,
-            "solution_text": main_solution,
+            "solution_text": job["solution"],
             "scores": [s, f, e]  # <-- Add this line
         }
+        return False
+
+
+_STOP = object()
+
+class PipelinedSolutionEvaluator(SolutionEvaluator):
+    """
+    Evaluates many prompts with the stages overlapped across individuals. Each stage has its
+    own worker threads and a bounded input queue, so while individual A is being scored, B is
+    being generated and C's variations are clustered with NLI. Results are identical to
+    evaluate_prompt; stage_stats() shows which stage (i.e. which endpoint) is the bottleneck.
+    """
+    def __init__(self, llm_handler: LLM_API_Handler, stage_workers: Optional[Dict[str, int]] = None,
+                 queue_size: int = config.PIPELINE_QUEUE_SIZE):
+        super().__init__(llm_handler)
+        stage_workers = config.PIPELINE_STAGE_WORKERS if stage_workers is None else stage_workers
+        self.stage_workers = {stage: max(1, stage_workers.get(stage, 1)) for stage in self.STAGES}
+        self.queue_size = queue_size
+        self._stats_lock = threading.Lock()
+        self._busy_seconds = {stage: 0.0 for stage in self.STAGES}
+        self._processed = {stage: 0 for stage in self.STAGES}
+        self._wall_seconds = 0.0
+
+    def iter_evaluations(self, items: Sequence[Tuple[str, str]],
+                         replay_scopes: Optional[Sequence[Optional[str]]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Streams the evaluation of (full_prompt_text, problem_text) pairs, yielding
+        (input index, result) as individuals finish. Closing the iterator early lets the
+        individuals in flight drain without further LLM calls. Every stage of item i runs in
+        llm_cache.replay_scope(replay_scopes[i]), whichever worker thread picks it up.
+        """
+        items = list(items)
+        replay_scopes = list(replay_scopes) if replay_scopes is not None else [None] * len(items)
+        if not items:
+            return
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.STAGES]
+        finished: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+        fed = [0]
+
+        def feed():
+            for index, (prompt, problem_text) in enumerate(items):
+                if cancelled.is_set():
+                    break
+                queues[0].put({"index": index, "prompt": prompt, "problem_text": problem_text,
+                               "replay_scope": replay_scopes[index]})
+                fed[0] += 1
+
+        def work(position: int, stage: str):
+            run_stage = getattr(self, f"_stage_{stage}")
+            while True:
+                job = queues[position].get()
+                if job is _STOP:
+                    return
+                proceed = False
+                if not cancelled.is_set():
+                    start = time.perf_counter()
+                    try:
+                        with replay_scope(job["replay_scope"]):
+                            proceed = run_stage(job)
+                    except Exception as e:
+                        job["error"] = e
+                    with self._stats_lock:
+                        self._busy_seconds[stage] += time.perf_counter() - start
+                        self._processed[stage] += 1
+                # Bounded queues: a full next stage blocks this one (backpressure).
+                (queues[position + 1] if proceed else finished).put(job)
+
+        threads = [threading.Thread(target=work, args=(position, stage), name=f"pipeline-{stage}", daemon=True)
+                   for position, stage in enumerate(self.STAGES) for _ in range(self.stage_workers[stage])]
+        threads.append(threading.Thread(target=feed, name="pipeline-feed", daemon=True))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        received = 0
+        try:
+            while received < len(items):
+                job = finished.get()
+                received += 1
+                if "error" in job:
+                    raise job["error"]
+                yield job["index"], job["result"]
+        finally:
+            cancelled.set()
+            threads[-1].join()
+            while received < fed[0]:
+                finished.get()
+                received += 1
+            for position, stage in enumerate(self.STAGES):
+                for _ in range(self.stage_workers[stage]):
+                    queues[position].put(_STOP)
+            for thread in threads:
+                thread.join()
+            with self._stats_lock:
+                self._wall_seconds += time.perf_counter() - started
+
+    def evaluate_prompts(self, items: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Evaluates (full_prompt_text, problem_text) pairs through the pipeline; results in input order."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        for index, result in self.iter_evaluations(items):
+            results[index] = result
+        return results
+
+    def stage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: workers, jobs processed, mean seconds per job and utilisation (busy share of worker time)."""
+        with self._stats_lock:
+            wall = self._wall_seconds
+            return {
+                stage: {
+                    "workers": self.stage_workers[stage],
+                    "processed": self._processed[stage],
+                    "mean_seconds": round(self._busy_seconds[stage] / self._processed[stage], 3) if self._processed[stage] else None,
+                    "utilisation": round(self._busy_seconds[stage] / (self.stage_workers[stage] * wall), 3) if wall else None,
+                }
+                for stage in self.STAGES
+            }
@@ -0,0 +1,126 @@
+# fitness_memo.py
+# Memoizes prompt evaluations by (genotype, problem), so duplicate individuals, such as
+# offspring that mutation left identical to their parent, do not pay for another round of
+# generation, scoring, variations and NLI. Identical individuals evaluated concurrently
+# share the first one's evaluation instead of racing.
+
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+
+# Genotype entries that are not genes: the grammar's start rule and the problem text
+# (the problem is part of the key through its id).
+NON_GENE_KEYS = ("start", "macgyver_problem_text")
+# LLM requests behind one evaluation: solution, scores, step variations and one batched NLI request.
+LLM_CALLS_PER_EVALUATION = 4
+MEMO_POLICIES = ("off", "skip", "cap")
+
+def genotype_key(genotype: Dict[str, str], problem_id: str) -> str:
+    """Canonical hash of an individual: its genes (order-independent) and the problem id."""
+    genes = {key: value for key, value in genotype.items() if key not in NON_GENE_KEYS}
+    blob = json.dumps({"genes": genes, "problem_id": problem_id}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class FitnessMemo:
+    """
+    Evaluation results per genotype key, with a reuse policy:
+      "skip": evaluate each key once and reuse that result for exact duplicates;
+      "cap":  evaluate a key up to `max_evaluations` times (noisy fitness), then reuse the
+              stored results in turn;
+      "off":  evaluate every individual.
+    """
+    def __init__(self, policy: str = config.FITNESS_MEMO_POLICY,
+                 max_evaluations: int = config.FITNESS_MEMO_MAX_EVALUATIONS):
+        if policy not in MEMO_POLICIES:
+            raise ValueError(f"Unknown fitness memo policy '{policy}'. Choose one of {MEMO_POLICIES}.")
+        self.policy = policy
+        self.max_evaluations = 1 if policy == "skip" else max(1, max_evaluations)
+        self._lock = threading.Lock()
+        self._results: Dict[str, list] = {}
+        self._reuses: Dict[str, int] = {}
+        self._in_flight: Dict[str, list] = {}
+        self.evaluations = 0
+        self.reused = 0
+
+    def __getstate__(self):
+        # Checkpoints keep the stored results; locks and in-flight evaluations are not picklable.
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_in_flight'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Tuple[bool, Future]:
+        """
+        Decides how to obtain the result for `key`. Returns (True, future) if the caller must
+        evaluate it and pass the outcome to resolve(key, future, ...), or (False, future) if the
+        result is reused: future is done, or completes when the evaluation in flight does.
+        """
+        future: Future = Future()
+        if self.policy == "off":
+            return True, future
+        with self._lock:
+            results = self._results.get(key, [])
+            in_flight = self._in_flight.get(key, [])
+            if len(results) + len(in_flight) < self.max_evaluations:
+                self._in_flight.setdefault(key, []).append(future)
+                return True, future
+            self.reused += 1
+            if results:
+                reuse = self._reuses.get(key, 0)
+                self._reuses[key] = reuse + 1
+                future.set_result(results[reuse % len(results)])
+                return False, future
+            return False, in_flight[0]
+
+    def resolve(self, key: str, future: Future, result: Optional[Dict[str, Any]] = None,
+                error: Optional[BaseException] = None):
+        """Completes an evaluation claimed with claim(). Failed generations are shared but not stored."""
+        with self._lock:
+            if self.policy != "off":
+                self._in_flight[key].remove(future)
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+            if error is None:
+                self.evaluations += 1
+                if self.policy != "off" and result is not None and "scores" in result:
+                    self._results.setdefault(key, []).append(result)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def get_or_evaluate(self, key: str, evaluate: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Returns a reused result for `key`, or runs `evaluate()` and stores its result."""
+        return self.lookup_or_evaluate(key, evaluate)[0]
+
+    def lookup_or_evaluate(self, key: str, evaluate: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Like get_or_evaluate, and also tells whether the result was reused (True) or evaluated now."""
+        leader, future = self.claim(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = evaluate()
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, result)
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Evaluations run, results reused, and the LLM requests that reuse avoided."""
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "evaluations": self.evaluations,
+                "reused": self.reused,
+                "llm_calls_avoided": self.reused * LLM_CALLS_PER_EVALUATION,
+            }
@@ -0,0 +1,162 @@
+# genotype_parser.py
+# Reverse parsing of prompt text into genotypes. The cleaned text of every grammar rule is
+# tokenized (words and punctuation) and compiled once into an Aho-Corasick automaton over
+# tokens, so a prompt is scanned for all rules in one linear pass instead of one substring
+# search per rule. Rules therefore match on token boundaries only. Overlapping matches are
+# resolved greedily by longest match, then earliest position; e.g. a rule that is a prefix
+# of a longer rule only counts where the longer one does not match.
+# Run as a script to reconstruct the genotypes of every record under RESULTS_DIR.
+
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import config
+
+# Grammar entries that are not reconstructed from the prompt text.
+NON_GENE_KEYS = ("start", "macgyver_problem_text")
+
+_TOKEN_PATTERN = re.compile(r"\w+|\S")
+
+class AhoCorasick:
+    """
+    Multi-pattern exact matcher over sequences of symbols (characters, tokens): finds every
+    occurrence of every pattern in one pass. The automaton is stored as a full transition
+    table, with the failure links folded in.
+    """
+    def __init__(self, patterns: Sequence[Sequence[Hashable]]):
+        self.lengths = [len(pattern) for pattern in patterns]
+        goto: List[Dict[Hashable, int]] = [{}]
+        self._out: List[Tuple[int, ...]] = [()]
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for symbol in pattern:
+                child = goto[node].get(symbol)
+                if child is None:
+                    child = len(goto)
+                    goto[node][symbol] = child
+                    goto.append({})
+                    self._out.append(())
+                node = child
+            self._out[node] += (pattern_id,)
+
+        # Breadth-first: each node's transitions are its failure node's, overridden by its own
+        # children, and it also reports the patterns of its failure node (its longest suffix).
+        self._delta: List[Dict[Hashable, int]] = [dict(children) for children in goto]
+        fail = [0] * len(goto)
+        pending = deque([0])
+        while pending:
+            node = pending.popleft()
+            for symbol, child in goto[node].items():
+                fail[child] = self._delta[fail[node]].get(symbol, 0) if node else 0
+                self._delta[child] = {**self._delta[fail[child]], **goto[child]}
+                self._out[child] += self._out[fail[child]]
+                pending.append(child)
+
+    def find_all(self, sequence: Sequence[Hashable]) -> List[Tuple[int, int, int]]:
+        """(start, end, pattern_id) of every occurrence, ordered by end position."""
+        delta, out, lengths = self._delta, self._out, self.lengths
+        node = 0
+        found: List[Tuple[int, int, int]] = []
+        for end, symbol in enumerate(sequence, 1):
+            node = delta[node].get(symbol, 0)
+            if out[node]:
+                found.extend((end - lengths[pattern_id], end, pattern_id) for pattern_id in out[node])
+        return found
+
+
+class GenotypeParser:
+    """
+    Recovers the value of each gene from a prompt built by construct_full_prompt, given the
+    values each gene can take (the grammar's derivations, or its rules).
+    """
+    def __init__(self, gene_values: Dict[str, Sequence[str]]):
+        self.gene_keys = [key for key in gene_values if key not in NON_GENE_KEYS]
+        # Genes with an empty value decode to it when none of their other values is in the prompt.
+        self._defaults = {key: next((value for value in gene_values[key] if not self._clean(value)), None)
+                          for key in self.gene_keys}
+        texts: Dict[str, int] = {}
+        self._owners: List[List[Tuple[str, str]]] = []
+        for key in self.gene_keys:
+            for value in gene_values[key]:
+                text = self._clean(value)
+                if not text:
+                    continue
+                if text not in texts:
+                    texts[text] = len(self._owners)
+                    self._owners.append([])
+                owners = self._owners[texts[text]]
+                if all(owner != key for owner, _ in owners):  # the first value of a gene wins
+                    owners.append((key, value))
+        self._text_lengths = [len(text) for text in texts]
+        self.automaton = AhoCorasick([_TOKEN_PATTERN.findall(text) for text in texts])
+
+    @staticmethod
+    def _clean(value: str) -> str:
+        # Placeholders removed and whitespace normalised, as construct_full_prompt does.
+        return " ".join(re.sub(r'<[^>]+>', '', value).split())
+
+    def parse(self, prompt_text: str) -> Optional[Dict[str, str]]:
+        """The genotype of a prompt, or None if some gene matches no value and has no empty value."""
+        lengths = self._text_lengths
+        matches = sorted(self.automaton.find_all(_TOKEN_PATTERN.findall(prompt_text)),
+                         key=lambda m: (-lengths[m[2]], m[0]))
+        starts: List[int] = []
+        ends: List[int] = []
+        genotype: Dict[str, str] = {}
+        for start, end, pattern_id in matches:
+            # Skip matches overlapping a longer (or equally long, earlier) match already taken.
+            i = bisect_left(starts, start)
+            if (i < len(starts) and starts[i] < end) or (i and ends[i - 1] > start):
+                continue
+            starts.insert(i, start)
+            ends.insert(i, end)
+            for key, rule in self._owners[pattern_id]:
+                genotype.setdefault(key, rule)
+            if len(genotype) == len(self.gene_keys):
+                break
+        for key in self.gene_keys:
+            if key not in genotype:
+                if self._defaults[key] is None:
+                    return None
+                genotype[key] = self._defaults[key]
+        return {key: genotype[key] for key in self.gene_keys}
+
+    def parse_batch(self, prompt_texts: Iterable[str]) -> List[Optional[Dict[str, str]]]:
+        """Parses many prompts; entries are None where a genotype could not be reconstructed."""
+        parse = self.parse
+        return [parse(text) for text in prompt_texts]
+
+
+def reconstruct_results_genotypes(parser: GenotypeParser, results_dir: str = config.RESULTS_DIR
+                                  ) -> Dict[str, List[Optional[Dict[str, str]]]]:
+    """
+    Reconstructs the genotype of every record with a "prompt_text" in the .jsonl files
+    under results_dir (e.g. random-prompt baselines, which store no genotype).
+    Returns {file path: genotypes in record order}.
+    """
+    reconstructed = {}
+    for root, _, files in sorted(os.walk(results_dir)):
+        for name in sorted(files):
+            if not name.endswith(".jsonl"):
+                continue
+            path = os.path.join(root, name)
+            with open(path) as f:
+                prompt_texts = [record["prompt_text"] for record in map(json.loads, filter(str.strip, f))
+                                if "prompt_text" in record]
+            if prompt_texts:
+                reconstructed[path] = parser.parse_batch(prompt_texts)
+    return reconstructed
+
+if __name__ == "__main__":
+    from cfg_generator import CFGPromptGenerator
+    parser = CFGPromptGenerator(config.CFG_RULES_PATH).parser
+    started = time.perf_counter()
+    results = reconstruct_results_genotypes(parser)
+    for path, genotypes in results.items():
+        print(f"{path}: {sum(g is not None for g in genotypes)}/{len(genotypes)} genotypes reconstructed")
+    print(f"Done in {time.perf_counter() - started:.2f}s")
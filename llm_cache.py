@@ -0,0 +1,152 @@
+# llm_cache.py
+# Persistent, content-addressed cache for LLM endpoint responses.
+# Responses are stored in SQLite, keyed by a hash of (endpoint, payload, cache version, slot),
+# so deterministic calls (embeddings, NLI, greedy decoding) are only paid for once across runs.
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+
+_replay = threading.local()
+
+
+def request_key(endpoint_url: str, payload: Dict[str, Any], version: str = config.LLM_CACHE_VERSION,
+                slot: Optional[Any] = None) -> str:
+    """sha256 over endpoint, canonical payload, version and slot."""
+    blob = json.dumps(
+        {"endpoint": endpoint_url, "payload": payload, "version": version, "slot": slot},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@contextlib.contextmanager
+def replay_scope(scope: Optional[str]):
+    """
+    Numbers the sampled requests made on this thread inside `scope` (e.g. one individual's
+    evaluation) separately, so their replay slots do not depend on the order in which
+    concurrent threads reach the cache.
+    """
+    previous = getattr(_replay, "scope", None)
+    _replay.scope = scope
+    try:
+        yield
+    finally:
+        _replay.scope = previous
+
+
+def current_replay_scope() -> Optional[str]:
+    return getattr(_replay, "scope", None)
+
+
+class ResponseCache:
+    """
+    A disk-backed response cache with size- and age-based eviction.
+    Safe to share between threads; several processes may open the same file.
+    """
+    def __init__(self, path: str, version: str = config.LLM_CACHE_VERSION,
+                 max_bytes: int = config.LLM_CACHE_MAX_BYTES,
+                 max_age_days: float = config.LLM_CACHE_MAX_AGE_DAYS,
+                 evict_every: int = config.LLM_CACHE_EVICT_EVERY):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.evict_every = evict_every
+
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, endpoint TEXT, response TEXT,"
+            " size INTEGER, created REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self.evict()
+
+    def make_key(self, endpoint_url: str, payload: Dict[str, Any], slot: Optional[Any] = None) -> str:
+        """Content address of a request: sha256 over endpoint, canonical payload, version and slot."""
+        return request_key(endpoint_url, payload, self.version, slot)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached response for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age_seconds and time.time() - row[1] > self.max_age_seconds):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, endpoint_url: str, response: Any):
+        """Stores a response. Triggers eviction every `evict_every` writes."""
+        blob = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, response, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint_url, blob, len(blob), now, now)
+            )
+            self.puts += 1
+            due = self.evict_every and self.puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drops expired entries, then least-recently-used ones until the cache fits max_bytes."""
+        removed = 0
+        with self._lock:
+            if self.max_age_seconds:
+                cur = self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_seconds,))
+                removed += cur.rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                to_free = total - self.max_bytes
+                freed = 0
+                victims = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+                    victims.append((key,))
+                    freed += size
+                    if freed >= to_free:
+                        break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                removed += len(victims)
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus current entry count and size on disk."""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "puts": self.puts,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,192 @@
+# llm_control.py
+# Adaptive per-endpoint flow control for LLM_API_Handler.
+# EndpointController bounds the in-flight requests to one endpoint with an AIMD window:
+# it grows additively while responses are healthy and is cut multiplicatively on
+# 429/503 responses and timeouts (at most once per round of requests in flight).
+# A Retry-After header pauses the whole endpoint. The controller's latency window also
+# sets percentile-based request timeouts and the delay after which a request is hedged.
+# Backoff computes jittered exponential retry delays from a private RNG, so retries never
+# perturb the seeded global `random`.
+
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+import config
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Backoff:
+    """Full-jitter exponential backoff: delay ~ U(0, min(cap, base * 2**attempt)), at least Retry-After."""
+    def __init__(self, base: float = config.LLM_BACKOFF_BASE_SECONDS, cap: float = config.LLM_BACKOFF_MAX_SECONDS,
+                 rng: Optional[random.Random] = None):
+        self.base = base
+        self.cap = cap
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        with self._lock:
+            jittered = self._rng.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        return jittered if retry_after is None else max(retry_after, jittered)
+
+
+class EndpointController:
+    """AIMD concurrency window and latency statistics for one endpoint."""
+    def __init__(self, initial_window: float, min_window: float = config.AIMD_MIN_CONCURRENCY,
+                 max_window: float = config.AIMD_MAX_CONCURRENCY, increase: float = config.AIMD_ADDITIVE_INCREASE,
+                 decrease_factor: float = config.AIMD_DECREASE_FACTOR,
+                 latency_tolerance: float = config.AIMD_LATENCY_TOLERANCE,
+                 latency_window: int = config.LATENCY_WINDOW_SIZE, adaptive: bool = config.AIMD_ENABLED,
+                 hedge_budget: float = config.HEDGE_BUDGET):
+        self.min_window = float(min_window)
+        self.max_window = float(max(max_window, initial_window))
+        self.window = float(max(min_window, initial_window))
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.adaptive = adaptive
+        self.hedge_budget = hedge_budget
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = float("-inf")
+        self._latencies: deque = deque(maxlen=latency_window)
+        self.requests = 0
+        self.successes = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.window))
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Holds one of the window's slots, waiting out any Retry-After pause first."""
+        with self._cond:
+            while True:
+                pause = self._blocked_until - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self._in_flight < self.limit:
+                    break
+                else:
+                    self._cond.wait()
+            self._in_flight += 1
+            self.requests += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _percentiles(self) -> Optional[Tuple[float, float]]:
+        if not self._latencies:
+            return None
+        p50, p95 = np.percentile(np.fromiter(self._latencies, dtype=float), [50, 95])
+        return float(p50), float(p95)
+
+    def latency_percentiles(self) -> Optional[Tuple[float, float]]:
+        """(p50, p95) of the recent response latencies in seconds, or None before the first response."""
+        with self._cond:
+            return self._percentiles()
+
+    def timeout(self, percentile: float = config.ADAPTIVE_TIMEOUT_PERCENTILE,
+                multiplier: float = config.ADAPTIVE_TIMEOUT_MULTIPLIER,
+                min_timeout: float = config.ADAPTIVE_TIMEOUT_MIN_SECONDS,
+                max_timeout: float = config.LLM_REQUEST_TIMEOUT_SECONDS,
+                min_samples: int = config.LATENCY_MIN_SAMPLES) -> float:
+        """Request timeout: `multiplier` x the latency percentile, clamped; the maximum until enough samples."""
+        with self._cond:
+            if len(self._latencies) < min_samples:
+                return max_timeout
+            latency = float(np.percentile(np.fromiter(self._latencies, dtype=float), percentile))
+        return min(max_timeout, max(min_timeout, multiplier * latency))
+
+    def hedge_delay(self, min_samples: int = config.LATENCY_MIN_SAMPLES) -> Optional[float]:
+        """Seconds to wait before hedging a request (the p95 latency), or None until enough samples."""
+        with self._cond:
+            if len(self._latencies) < min_samples:
+                return None
+            return self._percentiles()[1]
+
+    def try_hedge(self) -> bool:
+        """Reserves a hedge if they stay within `hedge_budget` of the other requests."""
+        with self._cond:
+            if self.hedges + 1 > self.hedge_budget * (self.requests - self.hedges):
+                return False
+            self.hedges += 1
+            return True
+
+    def record_hedge_win(self):
+        with self._cond:
+            self.hedge_wins += 1
+
+    def record_response(self, latency: float, ok: bool = True):
+        """A response arrived. Healthy ones (ok and not much slower than the p50) grow the window."""
+        with self._cond:
+            percentiles = self._percentiles()
+            self._latencies.append(latency)
+            if not ok:
+                return
+            self.successes += 1
+            healthy = percentiles is None or latency <= self.latency_tolerance * percentiles[0]
+            if self.adaptive and healthy:
+                # +increase per window's worth of healthy responses, i.e. per round trip.
+                self.window = min(self.max_window, self.window + self.increase / self.window)
+                self._cond.notify_all()
+
+    def record_congestion(self, sent_at: float, retry_after: Optional[float] = None, timeout: bool = False):
+        """
+        A 429/503 or a timeout for a request sent at `sent_at` (time.monotonic()). Requests sent
+        before the last cut were already in flight under the old window, so they do not cut it again.
+        """
+        with self._cond:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.throttled += 1
+            now = time.monotonic()
+            if self.adaptive and sent_at >= self._last_decrease:
+                self.window = max(self.min_window, self.window * self.decrease_factor)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            percentiles = self._percentiles()
+            return {
+                "window": round(self.window, 2),
+                "in_flight": self._in_flight,
+                "p50_latency": None if percentiles is None else round(percentiles[0], 3),
+                "p95_latency": None if percentiles is None else round(percentiles[1], 3),
+                "successes": self.successes,
+                "throttled": self.throttled,
+                "timeouts": self.timeouts,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
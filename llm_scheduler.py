@@ -0,0 +1,228 @@
+# llm_scheduler.py
+# A local scheduler daemon that every LLM_API_Handler can route its HTTP requests through,
+# so concurrent experiments (separate processes) share the endpoints instead of each
+# hammering them independently. The scheduler runs in a multiprocessing manager server
+# listening on a Unix socket and grants request slots with:
+#   - per-endpoint concurrency limits and an optional global in-flight cap,
+#   - per-endpoint token-bucket rate limits,
+#   - priority classes (NLI and evaluation ahead of new generations, so in-flight
+#     individuals finish first), and
+#   - fair share between experiments within a class (fewest in-flight requests first).
+#
+# Usage:
+#   python llm_scheduler.py            # serve on config.LLM_SCHEDULER_ADDRESS
+#   set LLM_SCHEDULER_ENABLED = True   # in config.py, so every handler connects to it
+
+import os
+import time
+import threading
+import itertools
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`."""
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill()
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1.0
+
+
+class LLMScheduler:
+    """
+    Server-side scheduler state. acquire() blocks until the request may start and returns
+    a ticket that must be passed to release() when the HTTP call is done.
+    Among the waiting requests whose endpoint has a free slot and a token, the one with the
+    lowest (priority, experiment in-flight count, experiment requests served, arrival) goes next.
+    """
+    def __init__(self, endpoint_concurrency: Optional[Dict[str, int]] = None,
+                 default_concurrency: int = config.DEFAULT_ENDPOINT_CONCURRENCY,
+                 rate_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_in_flight: Optional[int] = None,
+                 priorities: Optional[Dict[str, int]] = None):
+        self.endpoint_concurrency = dict(config.ENDPOINT_CONCURRENCY if endpoint_concurrency is None else endpoint_concurrency)
+        self.default_concurrency = default_concurrency
+        self.max_in_flight = max_in_flight
+        self.priorities = dict(config.LLM_SCHEDULER_PRIORITIES if priorities is None else priorities)
+        self._buckets = {endpoint: TokenBucket(rate, burst) for endpoint, (rate, burst)
+                         in (config.LLM_SCHEDULER_RATE_LIMITS if rate_limits is None else rate_limits).items()}
+
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[Dict[str, Any]] = []
+        self._tickets: Dict[int, Tuple[str, str]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._in_flight_by_experiment: Dict[str, int] = {}
+        self._served: Dict[str, int] = {}
+        self._total_in_flight = 0
+        self._granted_by_priority: Dict[str, int] = {}
+
+    def _limit(self, endpoint: str) -> int:
+        return max(1, self.endpoint_concurrency.get(endpoint, self.default_concurrency))
+
+    def _has_slot(self, endpoint: str) -> bool:
+        if self.max_in_flight is not None and self._total_in_flight >= self.max_in_flight:
+            return False
+        return self._in_flight.get(endpoint, 0) < self._limit(endpoint)
+
+    def _token_wait(self, endpoint: str) -> float:
+        bucket = self._buckets.get(endpoint)
+        return bucket.wait_time() if bucket is not None else 0.0
+
+    def _rank(self, waiter: Dict[str, Any]) -> Tuple:
+        experiment = waiter['experiment']
+        return (waiter['rank'], self._in_flight_by_experiment.get(experiment, 0),
+                self._served.get(experiment, 0), waiter['seq'])
+
+    def acquire(self, endpoint: str, experiment: str = "default", priority: str = "generation",
+                timeout: Optional[float] = None) -> Optional[int]:
+        """Blocks until the request may start. Returns a ticket, or None on timeout."""
+        waiter = {"endpoint": endpoint, "experiment": experiment, "priority": priority,
+                  "rank": self.priorities.get(priority, max(self.priorities.values(), default=0) + 1),
+                  "seq": next(self._seq)}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting.append(waiter)
+            try:
+                while True:
+                    ready = [w for w in self._waiting
+                             if self._has_slot(w['endpoint']) and self._token_wait(w['endpoint']) == 0.0]
+                    if ready and min(ready, key=self._rank) is waiter:
+                        return self._grant(waiter)
+                    wait = None
+                    if self._has_slot(endpoint):
+                        wait = self._token_wait(endpoint) or None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return None
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+                self._cond.notify_all()
+
+    def _grant(self, waiter: Dict[str, Any]) -> int:
+        endpoint, experiment = waiter['endpoint'], waiter['experiment']
+        self._waiting.remove(waiter)
+        bucket = self._buckets.get(endpoint)
+        if bucket is not None:
+            bucket.take()
+        self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+        self._in_flight_by_experiment[experiment] = self._in_flight_by_experiment.get(experiment, 0) + 1
+        self._served[experiment] = self._served.get(experiment, 0) + 1
+        self._granted_by_priority[waiter['priority']] = self._granted_by_priority.get(waiter['priority'], 0) + 1
+        self._total_in_flight += 1
+        self._tickets[waiter['seq']] = (endpoint, experiment)
+        return waiter['seq']
+
+    def release(self, ticket: int):
+        with self._cond:
+            endpoint, experiment = self._tickets.pop(ticket)
+            self._in_flight[endpoint] -= 1
+            self._in_flight_by_experiment[experiment] -= 1
+            self._total_in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": dict(self._in_flight),
+                "in_flight_by_experiment": dict(self._in_flight_by_experiment),
+                "served_by_experiment": dict(self._served),
+                "granted_by_priority": dict(self._granted_by_priority),
+                "waiting": len(self._waiting),
+            }
+
+
+# --- Manager server and client ---
+
+_scheduler: Optional[LLMScheduler] = None
+
+def _init_server(kwargs: Dict[str, Any]):
+    global _scheduler
+    _scheduler = LLMScheduler(**kwargs)
+
+def _get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(max_in_flight=config.LLM_SCHEDULER_MAX_IN_FLIGHT)
+    return _scheduler
+
+class SchedulerManager(BaseManager):
+    pass
+
+SchedulerManager.register("get_scheduler", callable=_get_scheduler)
+
+def serve(address: str = config.LLM_SCHEDULER_ADDRESS, authkey: bytes = config.LLM_SCHEDULER_AUTHKEY):
+    """Runs the scheduler daemon in the foreground until interrupted."""
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # stale socket from a previous daemon
+    manager = SchedulerManager(address=address, authkey=authkey)
+    server = manager.get_server()
+    print(f"LLM scheduler listening on {address}")
+    server.serve_forever()
+
+def start_scheduler(address: str = config.LLM_SCHEDULER_ADDRESS, authkey: bytes = config.LLM_SCHEDULER_AUTHKEY,
+                    **kwargs: Any) -> SchedulerManager:
+    """Starts the scheduler daemon in a child process; call .shutdown() on the result to stop it."""
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)
+    manager = SchedulerManager(address=address, authkey=authkey)
+    manager.start(_init_server, (kwargs,))
+    return manager
+
+
+class SchedulerClient:
+    """Per-process connection to the scheduler daemon, used by LLM_API_Handler."""
+    def __init__(self, address: str = config.LLM_SCHEDULER_ADDRESS, authkey: bytes = config.LLM_SCHEDULER_AUTHKEY,
+                 experiment: Optional[str] = None):
+        manager = SchedulerManager(address=address, authkey=authkey)
+        manager.connect()
+        self._scheduler = manager.get_scheduler()
+        self.experiment = experiment or os.path.basename(os.path.normpath(config.RESULTS_DIR))
+
+    @contextmanager
+    def slot(self, endpoint: str, priority: str = "generation") -> Iterator[None]:
+        """Holds a scheduler slot for the duration of one HTTP request."""
+        ticket = self._scheduler.acquire(endpoint, self.experiment, priority)
+        try:
+            yield
+        finally:
+            self._scheduler.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._scheduler.stats()
+
+def connect_from_config() -> Optional[SchedulerClient]:
+    """Connects to the daemon if config.LLM_SCHEDULER_ENABLED; returns None (with a warning) if it is unreachable."""
+    if not config.LLM_SCHEDULER_ENABLED:
+        return None
+    try:
+        return SchedulerClient(config.LLM_SCHEDULER_ADDRESS, config.LLM_SCHEDULER_AUTHKEY)
+    except (OSError, EOFError) as e:
+        print(f"Warning: LLM scheduler at {config.LLM_SCHEDULER_ADDRESS} is unreachable ({e}); sending requests directly.")
+        return None
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,57 +1,279 @@
 # llm_services.py
 # Handles all API calls to Hugging Face Inference Endpoints.
 # Includes robust error handling, retries, and rate limit management.
+# Requests share one pooled keep-alive session and can be fanned out
+# concurrently (thread pool) with an adaptive per-endpoint concurrency limit.
 
+import asyncio
+import contextlib
 import requests
 import json
+import threading
 import time
 import numpy as np
 import re
-from typing import Any, Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import config
+from llm_cache import ResponseCache, current_replay_scope, request_key
+import llm_scheduler
+from llm_control import Backoff, EndpointController, parse_retry_after
+
+# Optional process-wide cap on in-flight HTTP requests, shared by every handler in the
+# process. sweep.py installs a multiprocessing.Manager semaphore here so that concurrent
+# experiments in a process pool respect one global limit.
+_request_limiter = None
+
+def set_request_limiter(limiter):
+    """Installs a limiter (any context manager, e.g. a semaphore) around every HTTP request."""
+    global _request_limiter
+    _request_limiter = limiter
 
 class LLM_API_Handler:
     """A centralized handler for making calls to various HF Inference Endpoints."""
 
-    def __init__(self, api_key: str, max_retries: int = 5, retry_delay: int = 10):
+    def __init__(self, api_key: str, max_retries: int = 5, retry_delay: Optional[float] = None,
+                 max_workers: Optional[int] = None,
+                 endpoint_concurrency: Optional[Dict[str, int]] = None,
+                 cache: Optional[ResponseCache] = None,
+                 limiter=None,
+                 scheduler: Optional[llm_scheduler.SchedulerClient] = None):
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
         self.max_retries = max_retries
-        self.retry_delay = retry_delay
+        # Jittered exponential backoff; `retry_delay` overrides the base delay.
+        self.backoff = Backoff(config.LLM_BACKOFF_BASE_SECONDS if retry_delay is None else retry_delay)
+
+        # --- Concurrency: pooled session, worker pool and per-endpoint AIMD controllers ---
+        self.max_workers = max_workers or config.LLM_MAX_WORKERS
+        self.endpoint_concurrency = dict(config.ENDPOINT_CONCURRENCY)
+        if endpoint_concurrency:
+            self.endpoint_concurrency.update(endpoint_concurrency)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=len(self.endpoint_concurrency) or 1,
+                              pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+        # Hedged calls run their attempts on a separate pool, so they never wait on the worker pool.
+        self.hedge_enabled = config.HEDGE_ENABLED
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self.max_workers, thread_name_prefix="llm-hedge")
+        self._controllers: Dict[str, EndpointController] = {}
+        self._slots_lock = threading.Lock()
+        self.limiter = limiter if limiter is not None else _request_limiter
+        # Cross-process scheduler daemon (llm_scheduler.py), if enabled and running.
+        self.scheduler = scheduler if scheduler is not None else llm_scheduler.connect_from_config()
+
+        # --- Persistent response cache ---
+        if cache is None and config.LLM_CACHE_ENABLED:
+            cache = ResponseCache(config.LLM_CACHE_PATH)
+        self.cache = cache
+        self.cache_sampled = config.LLM_CACHE_SAMPLED
+        self.replay_seed = config.LLM_CACHE_REPLAY_SEED
+        self._sample_slots: Dict[str, int] = {}
+
+        # --- Single-flight: identical deterministic requests in flight share one HTTP call ---
+        self.coalesce_enabled = config.LLM_COALESCE_REQUESTS
+        self._flights: Dict[str, Future] = {}
+        self._flights_lock = threading.Lock()
+        self.flights_started = 0
+        self.flights_coalesced = 0
+
+    def _controller(self, endpoint_url: str) -> EndpointController:
+        """Returns the controller bounding in-flight requests to one endpoint."""
+        with self._slots_lock:
+            if endpoint_url not in self._controllers:
+                limit = self.endpoint_concurrency.get(endpoint_url, config.DEFAULT_ENDPOINT_CONCURRENCY)
+                self._controllers[endpoint_url] = EndpointController(limit)
+            return self._controllers[endpoint_url]
+
+    def endpoint_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Current concurrency window and p50/p95 latency of every endpoint used so far."""
+        with self._slots_lock:
+            controllers = dict(self._controllers)
+        return {url: controller.stats() for url, controller in controllers.items()}
+
+    def _global_slot(self, endpoint_url: str, priority: str):
+        """The cross-process slot for one request: the scheduler daemon, the shared limiter, or none."""
+        if self.scheduler is not None:
+            return self.scheduler.slot(endpoint_url, priority)
+        return self.limiter or contextlib.nullcontext()
+
+    @staticmethod
+    def _is_deterministic(payload: Dict[str, Any]) -> bool:
+        """True if the endpoint's answer depends only on the payload (no sampling)."""
+        params = payload.get("parameters", {})
+        if params.get("do_sample"):
+            return False
+        return not params.get("temperature")
+
+    def _cache_key(self, endpoint_url: str, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the cache key for a request, or None if it must not be cached.
+        Sampled requests are keyed by (replay seed, replay scope, n-th occurrence of this
+        payload in the scope), so a re-run with the same seed replays the same responses.
+        Outside a replay_scope occurrences are counted in arrival order, which is only
+        reproducible when the requests are made sequentially.
+        """
+        if self.cache is None:
+            return None
+        if self._is_deterministic(payload):
+            return self.cache.make_key(endpoint_url, payload)
+        if not self.cache_sampled:
+            return None
+        base = self.cache.make_key(endpoint_url, payload)
+        scope = current_replay_scope()
+        counter = base if scope is None else f"{scope}/{base}"
+        with self._slots_lock:
+            occurrence = self._sample_slots.get(counter, 0)
+            self._sample_slots[counter] = occurrence + 1
+        slot = [self.replay_seed, occurrence] if scope is None else [self.replay_seed, scope, occurrence]
+        return self.cache.make_key(endpoint_url, payload, slot=slot)
+
+    def _make_request(self, endpoint_url: str, payload: Dict[str, Any], priority: str = "generation") -> Any:
+        """
+        Makes a request, serving it from the response cache when possible. `priority` is the
+        scheduler class of the call (see config.LLM_SCHEDULER_PRIORITIES).
+        """
+        key = self._cache_key(endpoint_url, payload)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        if not (self.coalesce_enabled and self._is_deterministic(payload)):
+            return self._fetch(key, endpoint_url, payload, priority)
 
-    def _make_request(self, endpoint_url: str, payload: Dict[str, Any]) -> Any:
+        # Single-flight: the first caller (the leader) sends the request; callers that arrive
+        # with the same payload while it is in flight wait for its response instead.
+        flight_key = key if key is not None else request_key(endpoint_url, payload)
+        with self._flights_lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = Future()
+                self.flights_started += 1
+            else:
+                self.flights_coalesced += 1
+        if not leader:
+            return flight.result()  # shared with the leader: callers only read responses
+        try:
+            response_data = self._fetch(key, endpoint_url, payload, priority)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            # The response is already cached, so later callers hit the cache instead.
+            with self._flights_lock:
+                del self._flights[flight_key]
+        flight.set_result(response_data)
+        return response_data
+
+    def _fetch(self, key: Optional[str], endpoint_url: str, payload: Dict[str, Any], priority: str) -> Any:
+        """Sends the request and stores the response in the cache under `key`."""
+        response_data = self._post_with_retries(endpoint_url, payload, priority)
+        if key is not None and response_data is not None:
+            self.cache.put(key, endpoint_url, response_data)
+        return response_data
+
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Deterministic requests sent vs. identical ones that joined an in-flight call (HTTP calls saved)."""
+        with self._flights_lock:
+            return {"sent": self.flights_started, "coalesced": self.flights_coalesced}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the response cache (empty if caching is disabled)."""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _send(self, controller: EndpointController, endpoint_url: str, payload: Dict[str, Any],
+              priority: str, timeout_seconds: float) -> requests.Response:
+        """One HTTP attempt. Only the call holds an endpoint slot (and a global slot); retry sleeps do not."""
+        with controller.slot(), self._global_slot(endpoint_url, priority):
+            sent_at = time.monotonic()
+            try:
+                response = self.session.post(endpoint_url, json=payload, timeout=timeout_seconds)
+            except requests.exceptions.Timeout:
+                controller.record_congestion(sent_at, timeout=True)
+                raise
+        if response.status_code in [429, 503]:
+            controller.record_congestion(sent_at, parse_retry_after(response.headers.get("Retry-After")))
+        else:
+            controller.record_response(time.monotonic() - sent_at, ok=response.ok)
+        return response
+
+    def _send_hedged(self, controller: EndpointController, endpoint_url: str, payload: Dict[str, Any],
+                     priority: str, timeout_seconds: float) -> requests.Response:
+        """
+        Sends the request and, if it has not answered after the endpoint's p95 latency (and the
+        hedge budget allows), a duplicate; the first usable response wins. The loser is cancelled
+        if it has not started yet; otherwise its response is discarded when it arrives.
+        """
+        hedge_after = controller.hedge_delay()
+        if hedge_after is None:
+            return self._send(controller, endpoint_url, payload, priority, timeout_seconds)
+        primary = self._hedge_executor.submit(self._send, controller, endpoint_url, payload, priority, timeout_seconds)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not controller.try_hedge():
+            return primary.result()
+        hedge = self._hedge_executor.submit(self._send, controller, endpoint_url, payload, priority, timeout_seconds)
+        # The winner cancels the loser from its own worker thread, before that thread can pick the loser up.
+        for winner, loser in ((primary, hedge), (hedge, primary)):
+            winner.add_done_callback(lambda future, loser=loser: self._usable(future) and loser.cancel())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if self._usable(future):
+                    if future is hedge:
+                        controller.record_hedge_win()
+                    return future.result()
+        return primary.result()
+
+    @staticmethod
+    def _usable(future: Future) -> bool:
+        """True if a finished attempt returned a response other than 429/503."""
+        return not future.cancelled() and future.exception() is None and future.result().status_code not in [429, 503]
+
+    def _post_with_retries(self, endpoint_url: str, payload: Dict[str, Any], priority: str = "generation") -> Any:
         """Internal method to make a POST request with retry logic."""
-        timeout_seconds = 300
+        controller = self._controller(endpoint_url)
+        send = self._send_hedged if self.hedge_enabled and priority in config.HEDGE_CLASSES else self._send
         for attempt in range(self.max_retries):
+            timeout_seconds = controller.timeout() if config.ADAPTIVE_TIMEOUTS else config.LLM_REQUEST_TIMEOUT_SECONDS
+            retry_after = None
             try:
-                response = requests.post(endpoint_url, headers=self.headers, json=payload, timeout=timeout_seconds)
+                response = send(controller, endpoint_url, payload, priority, timeout_seconds)
                 if response.status_code in [429, 503]:
-                    wait_time = self.retry_delay * (attempt + 1)
-                    print(f"  - Model loading or rate limited. Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                response.raise_for_status()
-                return response.json()
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    print(f"  - Model loading or rate limited ({response.status_code}) at {endpoint_url}.")
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except requests.exceptions.Timeout as e:
+                print(f"  - Request timed out after {timeout_seconds:.0f}s for {endpoint_url}: {e}")
             except requests.exceptions.RequestException as e:
                 print(f"  - Request failed for {endpoint_url}: {e}")
             if attempt < self.max_retries - 1:
-                time.sleep(self.retry_delay)
+                wait_time = self.backoff.delay(attempt, retry_after)
+                print(f"  - Retrying in {wait_time:.1f}s...")
+                time.sleep(wait_time)
         print(f"  - FAILED to get a valid response from {endpoint_url} after {self.max_retries} attempts.")
         return None
 
     def get_embeddings(self, texts: List[str]) -> Optional[np.ndarray]:
         """Gets sentence embeddings for a list of texts."""
         payload = {"inputs": texts, "options": {"wait_for_model": True}}
-        response_data = self._make_request(config.EMBEDDING_LLM_ENDPOINT, payload)
+        response_data = self._make_request(config.EMBEDDING_LLM_ENDPOINT, payload, "embedding")
         return np.array(response_data) if response_data and isinstance(response_data, list) else None
 
     def check_nli_entailment(self, premise: str, hypothesis: str) -> float:
         """Checks the NLI entailment score between two texts."""
         payload = {"inputs": [premise], "parameters": {"candidate_labels": [hypothesis]}}
-        response_data = self._make_request(config.NLI_MODEL_ENDPOINT, payload)
+        response_data = self._make_request(config.NLI_MODEL_ENDPOINT, payload, "nli")
         if response_data and isinstance(response_data, list):
             result = response_data[0]
             if 'scores' in result and result['scores']:
@@ -59,6 +281,46 @@ class LLM_API_Handler:
         print("  - WARNING: Could not parse score from NLI response.")
         return 0.0
 
+    def check_nli_entailment_batch(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        Scores many (premise, hypothesis) pairs in as few requests as possible.
+        Premises are sent together as `inputs` and the hypotheses as shared candidate
+        labels with multi_label=True, so each label is scored independently
+        (the same score check_nli_entailment returns for a single label).
+        Requests are chunked to at most config.NLI_BATCH_SIZE pairs and sent concurrently.
+        """
+        if not pairs:
+            return []
+        premises = list(dict.fromkeys(p for p, _ in pairs))
+        hypotheses = list(dict.fromkeys(h for _, h in pairs))
+
+        limit = max(1, config.NLI_BATCH_SIZE)
+        label_chunks = [hypotheses[i:i + limit] for i in range(0, len(hypotheses), limit)]
+        chunks = []
+        for labels in label_chunks:
+            step = max(1, limit // len(labels))
+            chunks.extend((premises[i:i + step], labels) for i in range(0, len(premises), step))
+
+        def score_chunk(chunk: Tuple[List[str], List[str]]) -> Dict[Tuple[str, str], float]:
+            chunk_premises, labels = chunk
+            payload = {"inputs": chunk_premises, "parameters": {"candidate_labels": labels, "multi_label": True}}
+            response_data = self._make_request(config.NLI_MODEL_ENDPOINT, payload, "nli")
+            if isinstance(response_data, dict):
+                response_data = [response_data]
+            if not (response_data and isinstance(response_data, list) and len(response_data) == len(chunk_premises)):
+                print("  - WARNING: Could not parse scores from batched NLI response.")
+                return {}
+            scores = {}
+            for premise, result in zip(chunk_premises, response_data):
+                for label, score in zip(result.get('labels', []), result.get('scores', [])):
+                    scores[(premise, label)] = score
+            return scores
+
+        all_scores: Dict[Tuple[str, str], float] = {}
+        for chunk_scores in self._map(score_chunk, chunks):
+            all_scores.update(chunk_scores)
+        return [all_scores.get(pair, 0.0) for pair in pairs]
+
     def generate_solution(self, prompt: str) -> Optional[str]:
         """Generates ONE complete, multi-step solution using only the evolved prompt."""
         # Do NOT add a system prompt; just use the evolved prompt as user input
@@ -68,7 +330,7 @@ class LLM_API_Handler:
             "parameters": {"max_new_tokens": 512, "temperature": 0.9, "do_sample": True, "top_p": 0.95},
             "options": {"wait_for_model": True}
         }
-        response_data = self._make_request(config.GENERATOR_LLM_ENDPOINT, payload)
+        response_data = self._make_request(config.GENERATOR_LLM_ENDPOINT, payload, "generation")
         if response_data and isinstance(response_data, list):
             return response_data[0]['generated_text'].strip()
         return None
@@ -101,7 +363,9 @@ class LLM_API_Handler:
             "parameters": {"max_new_tokens": 1024, "temperature": 1.0, "do_sample": True, "top_p": 0.95},
             "options": {"wait_for_model": True}
         }
-        response_data = self._make_request(config.GENERATOR_LLM_ENDPOINT, payload)
+        # Generator endpoint, but ranked with evaluation on purpose: variations belong to an individual
+        # already in flight, which should finish before new solutions are generated.
+        response_data = self._make_request(config.GENERATOR_LLM_ENDPOINT, payload, "evaluation")
         if response_data and isinstance(response_data, list):
             variations_text = response_data[0]['generated_text']
             return [line.strip() for line in re.split(r'\n\d+\.\s*|\n-\s*', variations_text) if line.strip()]
@@ -133,7 +397,7 @@ Output only the JSON object. [/INST]
             },
             "options": {"wait_for_model": True}
         }
-        response_data = self._make_request(config.EVALUATOR_LLM_ENDPOINT, payload)
+        response_data = self._make_request(config.EVALUATOR_LLM_ENDPOINT, payload, "evaluation")
         
         if response_data and isinstance(response_data, list):
             generated_text = response_data[0]['generated_text']
@@ -156,3 +420,67 @@ Output only the JSON object. [/INST]
                 print(f"  {generated_text.strip()}")
                 print("  -------------------------------------------")
         return None
+
+
+    # --- Concurrent / batched interface ---
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Schedules a handler call on the worker pool and returns its Future."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def _map(self, fn: Callable[..., Any], *iterables: Sequence[Any]) -> List[Any]:
+        """Runs fn over the inputs concurrently, preserving input order."""
+        return list(self._executor.map(fn, *iterables))
+
+    def generate_solutions(self, prompts: List[str]) -> List[Optional[str]]:
+        """Batched version of generate_solution."""
+        return self._map(self.generate_solution, prompts)
+
+    def evaluate_solutions_with_scores(self, pairs: List[Tuple[str, str]]) -> List[Optional[Dict[str, float]]]:
+        """Batched version of evaluate_solution_with_scores over (problem_text, solution_text) pairs."""
+        return self._map(self.evaluate_solution_with_scores, [p for p, _ in pairs], [s for _, s in pairs])
+
+    def generate_variations_for_steps(self, solution_texts: List[str]) -> List[List[str]]:
+        """Batched version of generate_variations_for_step."""
+        return self._map(self.generate_variations_for_step, solution_texts)
+
+    def check_nli_entailments(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Batched version of check_nli_entailment over (premise, hypothesis) pairs."""
+        return self._map(self.check_nli_entailment, [p for p, _ in pairs], [h for _, h in pairs])
+
+    def get_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """
+        Splits texts into chunks of batch_size and embeds all chunks concurrently.
+        Returns one array (or None on failure) per chunk, in input order.
+        """
+        batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        return self._map(self.get_embeddings, batches)
+
+    # --- Awaitable interface (runs on the same worker pool) ---
+
+    async def _run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    async def agenerate_solution(self, prompt: str) -> Optional[str]:
+        return await self._run_async(self.generate_solution, prompt)
+
+    async def aevaluate_solution_with_scores(self, problem_text: str, solution_text: str) -> Optional[Dict[str, float]]:
+        return await self._run_async(self.evaluate_solution_with_scores, problem_text, solution_text)
+
+    async def agenerate_variations_for_step(self, solution_text: str) -> List[str]:
+        return await self._run_async(self.generate_variations_for_step, solution_text)
+
+    async def acheck_nli_entailment(self, premise: str, hypothesis: str) -> float:
+        return await self._run_async(self.check_nli_entailment, premise, hypothesis)
+
+    async def aget_embeddings(self, texts: List[str]) -> Optional[np.ndarray]:
+        return await self._run_async(self.get_embeddings, texts)
+
+    def close(self):
+        """Shuts down the worker pool and releases pooled connections."""
+        self._executor.shutdown(wait=True)
+        self._hedge_executor.shutdown(wait=True)
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -2,7 +2,6 @@
 # Main script to run the evolutionary experiments for the thesis.
 
 import os
-import pickle
 import argparse
 import sys
 from algorithm.baseline_no_prompt import run_baseline_no_prompt
@@ -15,16 +14,64 @@ import config
 from llm_services import LLM_API_Handler
 from cfg_generator import CFGPromptGenerator
 from task_loader import TaskLoader
-from evaluation import SolutionEvaluator
+from evaluation import PipelinedSolutionEvaluator, SolutionEvaluator
 from algorithm.map_elites import MAPElitesAlgorithm
+from algorithm.steady_state_map_elites import SteadyStateMAPElites
 from algorithm.genetic_algorithm import GeneticAlgorithm
+from bd_table import BehaviorDescriptorTable
+from projection import load_projector
+
+SEARCH_ALGORITHMS = ("map_elites", "map_elites_steady", "ga")
+
+def build_components():
+    """Creates the LLM handler, grammar, task loader and evaluator shared by every algorithm."""
+    llm_handler = LLM_API_Handler(config.HF_API_KEY)
+    cfg_generator = CFGPromptGenerator(config.CFG_RULES_PATH)
+    task_loader = TaskLoader(config.MACGYVER_DATASET_PATH)
+    evaluator_class = PipelinedSolutionEvaluator if config.PIPELINED_EVALUATION else SolutionEvaluator
+    solution_evaluator = evaluator_class(llm_handler)
+    return llm_handler, cfg_generator, task_loader, solution_evaluator
+
+def run_search(algorithm_name: str, llm_handler, cfg_generator, task_loader, solution_evaluator,
+               problem_id=None, resume: bool = False):
+    """Runs one MAP-Elites (generational or steady-state) or GA experiment into config.RESULTS_DIR."""
+    if algorithm_name in ("map_elites", "map_elites_steady"):
+        # Batch projector; with PROJECTOR = "knn" the UMAP model is never unpickled.
+        umap_model = load_projector(config.PROJECTOR)
+        
+        algorithm_class = SteadyStateMAPElites if algorithm_name == "map_elites_steady" else MAPElitesAlgorithm
+        algorithm = algorithm_class(
+            cfg_generator=cfg_generator,
+            task_loader=task_loader,
+            solution_evaluator=solution_evaluator,
+            llm_handler=llm_handler,
+            umap_model=umap_model,
+            bd_table=BehaviorDescriptorTable.load(config.BD_TABLE_DIR, cfg_generator)
+        )
+        if problem_id:
+            algorithm.fixed_problem_id = problem_id
+        if resume:
+            return algorithm.run(resume=True)
+        return algorithm.run()
+
+    if algorithm_name == "ga":
+        algorithm = GeneticAlgorithm(
+            cfg_generator=cfg_generator,
+            task_loader=task_loader,
+            solution_evaluator=solution_evaluator
+        )
+        if problem_id:
+            algorithm.fixed_problem_id = problem_id
+        return algorithm.run()
+
+    raise ValueError(f"Unknown search algorithm '{algorithm_name}'.")
 
 def main():
     parser = argparse.ArgumentParser(description="Run evolutionary prompt engineering experiments.")
     parser.add_argument(
         "algorithm", 
-        choices=["map_elites", "ga", "baseline_no_prompt", "baseline_random_prompt"],
-        help="The algorithm to run: 'map_elites', 'ga', 'baseline_no_prompt', or 'baseline_random_prompt'."
+        choices=["map_elites", "map_elites_steady", "ga", "baseline_no_prompt", "baseline_random_prompt"],
+        help="The algorithm to run: 'map_elites', 'map_elites_steady', 'ga', 'baseline_no_prompt', or 'baseline_random_prompt'."
     )
     parser.add_argument(
         "--problem-id", 
@@ -32,7 +79,14 @@ def main():
         default=None, 
         help="Run with a fixed problem id"
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a MAP-Elites run from its last checkpoint in the results directory"
+    )
     args = parser.parse_args()
+    if args.resume and args.algorithm != "map_elites":
+        parser.error("--resume is only supported for the 'map_elites' algorithm.")
 
     # --- 1. Initialization & Prerequisite Checks (with loud failures) ---
     print("--- Initializing Framework Components ---")
@@ -44,43 +98,18 @@ def main():
         raise ValueError("Prerequisite Check FAILED: Please set your real Hugging Face API key in config.py")
     
     # Check for UMAP model (required by MAP-Elites)
-    if args.algorithm == "map_elites" and not os.path.exists(config.UMAP_MODEL_PATH):
+    if args.algorithm in ("map_elites", "map_elites_steady") and not os.path.exists(config.UMAP_MODEL_PATH):
         # Raise an error instead of exiting silently
         raise FileNotFoundError(f"Prerequisite Check FAILED: UMAP model not found at {config.UMAP_MODEL_PATH}. Please run 'python run_experiment.py prepare-umap' first.")
 
     # Load components
-    llm_handler = LLM_API_Handler(config.HF_API_KEY)
-    cfg_generator = CFGPromptGenerator(config.CFG_RULES_PATH)
-    task_loader = TaskLoader(config.MACGYVER_DATASET_PATH)
-    solution_evaluator = SolutionEvaluator(llm_handler)
-    
+    llm_handler, cfg_generator, task_loader, solution_evaluator = build_components()
     print("Components initialized successfully.")
 
     # --- 2. Run Selected Algorithm ---
-    if args.algorithm == "map_elites":
-        with open(config.UMAP_MODEL_PATH, 'rb') as f:
-            umap_model = pickle.load(f)
-        
-        algorithm = MAPElitesAlgorithm(
-            cfg_generator=cfg_generator,
-            task_loader=task_loader,
-            solution_evaluator=solution_evaluator,
-            llm_handler=llm_handler,
-            umap_model=umap_model
-        )
-        if args.problem_id:
-            algorithm.fixed_problem_id = args.problem_id
-        algorithm.run()
-
-    elif args.algorithm == "ga":
-        algorithm = GeneticAlgorithm(
-            cfg_generator=cfg_generator,
-            task_loader=task_loader,
-            solution_evaluator=solution_evaluator
-        )
-        if args.problem_id:
-            algorithm.fixed_problem_id = args.problem_id
-        algorithm.run()
+    if args.algorithm in SEARCH_ALGORITHMS:
+        run_search(args.algorithm, llm_handler, cfg_generator, task_loader, solution_evaluator,
+                   problem_id=args.problem_id, resume=args.resume)
 
     elif args.algorithm == "baseline_no_prompt":
         print("Running Baseline: No Prompt")
@@ -94,6 +123,12 @@ def main():
 
     print("\n--- Experiment Finished ---")
     print(f"Results have been saved to the '{config.RESULTS_DIR}' directory.")
+    if llm_handler.cache is not None:
+        print(f"LLM response cache: {llm_handler.cache_stats()}")
+    print(f"LLM endpoints: {llm_handler.endpoint_stats()}")
+    print(f"Coalesced LLM requests: {llm_handler.coalescing_stats()}")
+    if isinstance(solution_evaluator, PipelinedSolutionEvaluator):
+        print(f"Evaluation pipeline stages: {solution_evaluator.stage_stats()}")
     print("You can now run 'python analysis.py' to generate plots.")
 
     # Run Baseline Experiments
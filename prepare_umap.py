@@ -13,6 +13,8 @@ import config
 from cfg_generator import CFGPromptGenerator
 from task_loader import TaskLoader
 from llm_services import LLM_API_Handler
+from umap_artifacts import save_umap_artifacts
+from projection import export_knn_projector
 
 def batch_list(data: List, batch_size: int) -> List[List]:
     """Splits a list into smaller chunks of a specified size."""
@@ -32,12 +34,12 @@ def prepare_umap_model():
 
     # 2. Generate a large, diverse dataset of sample prompts
     print(f"Generating {config.UMAP_TRAINING_PROMPTS} sample prompts...")
-    prompts_data = []
-    for _ in tqdm(range(config.UMAP_TRAINING_PROMPTS), desc="Generating Prompts"):
-        genotype = cfg_generator.generate_random_genotype()
-        problem = task_loader.get_random_problem()
-        prompt_text = cfg_generator.construct_full_prompt(genotype, problem['problem_text'])
-        prompts_data.append({"genotype": genotype, "prompt_text": prompt_text})
+    genotypes = cfg_generator.generate_random_genotypes(config.UMAP_TRAINING_PROMPTS)
+    problems = [task_loader.get_random_problem() for _ in tqdm(genotypes, desc="Generating Prompts")]
+    prompt_texts = cfg_generator.construct_full_prompts(
+        (genotype, problem['problem_text']) for genotype, problem in zip(genotypes, problems))
+    prompts_data = [{"genotype": genotype, "prompt_text": prompt_text}
+                    for genotype, prompt_text in zip(genotypes, prompt_texts)]
 
     # Save the generated prompts for inspection
     with open(config.UMAP_PROMPT_DATASET_PATH, 'w') as f:
@@ -50,11 +52,12 @@ def prepare_umap_model():
     prompt_texts = [item['prompt_text'] for item in prompts_data]
     
     # --- FIXED: Batching logic to handle API limits ---
-    batch_size = 32  # Set your model's batch size limit here
+    # Batches are sent concurrently; results come back in input order.
+    batch_size = config.EMBEDDING_BATCH_SIZE
     all_embeddings = []
     
-    for batch in tqdm(batch_list(prompt_texts, batch_size), desc="Embedding Batches"):
-        batch_embeddings = llm_handler.get_embeddings(batch)
+    batches = batch_list(prompt_texts, batch_size)
+    for batch, batch_embeddings in zip(batches, llm_handler.get_embeddings_batch(prompt_texts, batch_size)):
         if batch_embeddings is not None and batch_embeddings.size > 0:
             all_embeddings.append(batch_embeddings)
         else:
@@ -83,6 +86,17 @@ def prepare_umap_model():
     with open(config.UMAP_MODEL_PATH, 'wb') as f:
         pickle.dump(umap_model, f)
     print(f"✅ UMAP model saved to {config.UMAP_MODEL_PATH}")
+
+    # 6. Project the training prompts once and persist embeddings, coordinates and bounds,
+    # so MAP-Elites can load its BD bounds instead of re-embedding this dataset on startup.
+    print("Projecting training prompts to compute BD bounds...")
+    transformed_coords = umap_model.transform(embeddings)
+    save_umap_artifacts(embeddings, transformed_coords)
+
+    # 7. Export the kNN projector, a umap-free approximation of the transform, and report its fidelity.
+    export_knn_projector()
+    if llm_handler.cache is not None:
+        print(f"LLM response cache: {llm_handler.cache_stats()}")
     print("--- UMAP Preparation Finished ---")
 
 if __name__ == "__main__":
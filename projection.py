@@ -0,0 +1,163 @@
+# projection.py
+# Projectors map style embeddings to behavior descriptor (BD) coordinates in batches.
+# UMAPProjector wraps the trained UMAP model; KNNProjector is an exported approximation
+# (inverse-distance-weighted k-nearest-neighbour interpolation over the stored training
+# pairs) that loads from a single .npz file without importing umap or numba.
+
+import os
+import pickle
+import threading
+import numpy as np
+from typing import Any, Dict, Optional, Sequence
+
+import config
+from umap_artifacts import file_sha256, load_umap_artifacts
+
+class UMAPProjector:
+    """Batch projector backed by the trained UMAP model, unpickled on first use."""
+    def __init__(self, model: Any = None, path: str = config.UMAP_MODEL_PATH):
+        self.path = path
+        self._model = model
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        with self._lock:
+            if self._model is None:
+                with open(self.path, 'rb') as f:
+                    self._model = pickle.load(f)
+            return self._model
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """Projects an (n, dim) batch of embeddings to (n, n_components) BD coordinates."""
+        model = self.model
+        with self._lock:  # UMAP's transform is not thread-safe
+            return np.asarray(model.transform(np.atleast_2d(embeddings)))
+
+
+class KNNProjector:
+    """
+    Approximates the UMAP transform by interpolating the projections of the k nearest
+    training embeddings (Euclidean, as UMAP's default metric), weighted by inverse distance.
+    """
+    def __init__(self, embeddings: np.ndarray, coords: np.ndarray, k: int = config.KNN_PROJECTOR_K,
+                 meta: Optional[Dict[str, Any]] = None):
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.k = min(k, self.embeddings.shape[0])
+        self.meta = meta or {}
+        self._sq_norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings)
+
+    def _neighbours(self, embeddings: np.ndarray, exclude_self: bool = False):
+        queries = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        sq_dist = (np.einsum('ij,ij->i', queries, queries)[:, None] - 2.0 * queries @ self.embeddings.T
+                   + self._sq_norms[None, :])
+        if exclude_self:
+            np.fill_diagonal(sq_dist, np.inf)
+        k = min(self.k, self.embeddings.shape[0] - int(exclude_self))
+        idx = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+        # The expanded form above loses precision near zero; recompute the k distances directly.
+        diff = self.embeddings[idx].astype(np.float64) - queries[:, None, :].astype(np.float64)
+        return idx, np.sqrt(np.einsum('nkd,nkd->nk', diff, diff))
+
+    def _interpolate(self, idx: np.ndarray, dist: np.ndarray) -> np.ndarray:
+        weights = 1.0 / np.maximum(dist, 1e-12)
+        # An exact match takes the training projection as is.
+        exact = dist <= 1e-12
+        weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), weights)
+        weights /= weights.sum(axis=1, keepdims=True)
+        return np.einsum('nk,nkd->nd', weights, self.coords[idx])
+
+    def transform(self, embeddings: np.ndarray, batch_size: int = 1024) -> np.ndarray:
+        """Projects an (n, dim) batch of embeddings to (n, n_components) BD coordinates."""
+        queries = np.atleast_2d(embeddings)
+        out = [self._interpolate(*self._neighbours(queries[i:i + batch_size]))
+               for i in range(0, queries.shape[0], batch_size)]
+        return np.vstack(out) if out else np.empty((0, self.coords.shape[1]))
+
+    def leave_one_out(self) -> np.ndarray:
+        """Projection of every training embedding from its k nearest *other* training embeddings."""
+        return self._interpolate(*self._neighbours(self.embeddings, exclude_self=True))
+
+    def save(self, path: str = config.KNN_PROJECTOR_PATH):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, embeddings=self.embeddings, coords=self.coords, k=self.k,
+                 umap_model_hash=str(self.meta.get("umap_model_hash")),
+                 prompt_dataset_hash=str(self.meta.get("prompt_dataset_hash")))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = config.KNN_PROJECTOR_PATH) -> Optional['KNNProjector']:
+        """Loads an exported projector, or returns None if it is missing or the UMAP model changed."""
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        meta = {"umap_model_hash": str(data['umap_model_hash']),
+                "prompt_dataset_hash": str(data['prompt_dataset_hash'])}
+        model_hash = file_sha256(config.UMAP_MODEL_PATH)
+        if model_hash is not None and model_hash != meta["umap_model_hash"]:
+            print(f"kNN projector in {path} was fitted for a different UMAP model. Ignoring it.")
+            return None
+        return cls(data['embeddings'], data['coords'], int(data['k']), meta)
+
+
+def fit_knn_projector(k: int = config.KNN_PROJECTOR_K) -> Optional[KNNProjector]:
+    """Fits a KNNProjector on the training embeddings/projections saved by prepare_umap.py."""
+    artifacts = load_umap_artifacts(mmap=False)
+    if artifacts is None:
+        return None
+    meta = {key: artifacts[key] for key in ("umap_model_hash", "prompt_dataset_hash")}
+    return KNNProjector(artifacts['embeddings'], artifacts['coords'], k, meta)
+
+def projection_fidelity(predicted: np.ndarray, reference: np.ndarray, umap_min: Sequence[float],
+                        umap_max: Sequence[float], grid_shape: Sequence[int] = config.GRID_SHAPE) -> Dict[str, float]:
+    """
+    Compares approximate BD coordinates with the real UMAP ones: mean and 95th percentile
+    Euclidean error, the same relative to the BD bounds' diagonal, and how often both land
+    in the same grid bin.
+    """
+    from bd_table import bin_coords_batch
+    predicted = np.asarray(predicted, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    errors = np.linalg.norm(predicted - reference, axis=1)
+    diagonal = float(np.linalg.norm(np.asarray(umap_max, dtype=float) - np.asarray(umap_min, dtype=float)))
+    same_bin = np.all(bin_coords_batch(predicted, umap_min, umap_max, grid_shape)
+                      == bin_coords_batch(reference, umap_min, umap_max, grid_shape), axis=1)
+    return {
+        "mean_error": float(errors.mean()),
+        "p95_error": float(np.percentile(errors, 95)),
+        "mean_relative_error": float(errors.mean() / diagonal),
+        "bin_agreement": float(same_bin.mean()),
+    }
+
+def export_knn_projector(k: int = config.KNN_PROJECTOR_K, path: str = config.KNN_PROJECTOR_PATH) -> Optional[Dict[str, float]]:
+    """Fits, saves and reports the leave-one-out fidelity of the kNN projector."""
+    projector = fit_knn_projector(k)
+    if projector is None:
+        print("No UMAP artifacts found; run prepare_umap.py first.")
+        return None
+    artifacts = load_umap_artifacts()
+    fidelity = projection_fidelity(projector.leave_one_out(), projector.coords,
+                                   artifacts['umap_min'], artifacts['umap_max'])
+    projector.save(path)
+    print(f"✅ kNN projector (k={projector.k}, {projector.embeddings.shape[0]} training pairs) saved to {path}")
+    print(f"Leave-one-out fidelity vs UMAP: {fidelity}")
+    return fidelity
+
+def load_projector(kind: str = config.PROJECTOR):
+    """
+    Returns the projector selected by config.PROJECTOR: "umap" (the trained model, unpickled
+    lazily) or "knn" (the exported approximation; falls back to UMAP if it is unavailable).
+    """
+    if kind == "knn":
+        projector = KNNProjector.load()
+        if projector is not None:
+            return projector
+        print("kNN projector unavailable; falling back to the UMAP model.")
+    elif kind != "umap":
+        raise ValueError(f"Unknown projector '{kind}'. Choose 'umap' or 'knn'.")
+    return UMAPProjector()
+
+
+if __name__ == "__main__":
+    export_knn_projector()
@@ -0,0 +1,107 @@
+# prompt_template.py
+# Slot-indexed prompt templates. A `start` production is compiled once into literal pieces
+# and placeholder slots, so rendering a prompt is a single pass over the pieces instead of
+# one str.replace over the whole prompt per gene followed by a split/join of the result.
+# Whitespace is normalised per piece (cached, since gene values and problem texts repeat)
+# and the pieces are joined with single spaces where the original text had whitespace.
+# render() returns exactly what CFGPromptGenerator.construct_full_prompt always returned.
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+PROBLEM_PLACEHOLDER = "PROBLEM_PLACEHOLDER"
+PROBLEM_SLOT = "macgyver_problem_text"
+# Slots that render as these values when the genotype does not fill them.
+DEFAULT_SLOTS = {"opening_salutation": ""}
+
+_SLOT_PATTERN = re.compile('(<[^>]+>)')
+
+@lru_cache(maxsize=4096)
+def _normalize(text: str) -> Tuple[str, bool, bool, bool]:
+    """(text with whitespace runs collapsed and stripped, leading ws, trailing ws, contains < or >)."""
+    return (" ".join(text.split()), text[:1].isspace(), text[-1:].isspace(),
+            '<' in text or '>' in text)
+
+
+class PromptTemplate:
+    """A compiled `start` production: alternating literal pieces and slot names."""
+    def __init__(self, source: str):
+        self.source = source
+        self.literals: List[str] = []
+        self.slots: List[str] = []
+        parts = _SLOT_PATTERN.split(source)
+        for position, part in enumerate(parts):
+            if position % 2:
+                self.slots.append(part[1:-1])
+            else:
+                self.literals.append(part)
+        # Literal angle brackets could combine with substituted text into new placeholders,
+        # which the sequential replaces of the reference would then fill; such templates
+        # always take the reference path.
+        self.compiled = not any(_normalize(literal)[3] for literal in self.literals) and \
+            not any('<' in slot for slot in self.slots)
+
+    def _pieces(self, genotype: Dict[str, str], problem_text: str) -> List[str]:
+        pieces = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = genotype.get(slot)
+            if value is None:
+                # Unfilled slots: the problem text, a default, or left as written.
+                value = problem_text if slot == PROBLEM_SLOT else DEFAULT_SLOTS.get(slot, f"<{slot}>")
+                pieces.append(value)
+            elif PROBLEM_PLACEHOLDER in value:
+                fragments = value.split(PROBLEM_PLACEHOLDER)
+                for fragment in fragments[:-1]:
+                    pieces.append(fragment)
+                    pieces.append(problem_text)
+                pieces.append(fragments[-1])
+            else:
+                pieces.append(value)
+            pieces.append(literal)
+        return pieces
+
+    @staticmethod
+    def _inert(piece: str, genotype: Dict[str, str]) -> bool:
+        # A lone placeholder that no replace fills, e.g. an unfilled slot left as written.
+        name = piece[1:-1]
+        return (piece.startswith('<') and piece.endswith('>') and '<' not in name and '>' not in name
+                and name not in genotype and name != PROBLEM_SLOT and name not in DEFAULT_SLOTS)
+
+    def render(self, genotype: Dict[str, str], problem_text: str) -> str:
+        """The full prompt for a genotype and a problem, with whitespace normalised."""
+        if not self.compiled or _normalize(problem_text)[3]:
+            return self.render_reference(genotype, problem_text)
+        out: List[str] = []
+        space = False
+        for piece in self._pieces(genotype, problem_text):
+            core, leading, trailing, angled = _normalize(piece)
+            if angled and not self._inert(piece, genotype):
+                # Substituted text with angle brackets: the reference's replaces may act on it.
+                return self.render_reference(genotype, problem_text)
+            if not core:
+                space = space or leading
+                continue
+            if out and (space or leading):
+                out.append(" ")
+            out.append(core)
+            space = trailing
+        return "".join(out)
+
+    def render_batch(self, pairs: Iterable[Tuple[Dict[str, str], str]]) -> List[str]:
+        """Renders N prompts for N (genotype, problem_text) pairs."""
+        render = self.render
+        return [render(genotype, problem_text) for genotype, problem_text in pairs]
+
+    def render_reference(self, genotype: Dict[str, str], problem_text: str) -> str:
+        """The original replace-based construction, used when substituted text contains < or >."""
+        prompt = self.source
+        for key, value in genotype.items():
+            # Replace PROBLEM_PLACEHOLDER in gene values as well
+            value = value.replace(PROBLEM_PLACEHOLDER, problem_text)
+            prompt = prompt.replace(f"<{key}>", value)
+        # Replace the final placeholder with the actual problem text (for templates)
+        prompt = prompt.replace(f"<{PROBLEM_SLOT}>", problem_text)
+        for slot, default in DEFAULT_SLOTS.items():
+            prompt = prompt.replace(f"<{slot}>", default)
+        return " ".join(prompt.split()) # Normalize whitespace
@@ -32,13 +32,14 @@ def main():
     )
     parser.add_argument(
         "stage",
-        choices=["prepare-umap", "run-ga", "run-me", "analyze", "all"],
+        choices=["prepare-umap", "prepare-bd-table", "run-ga", "run-me", "analyze", "all"],
         help="""The stage of the experiment to run:
   - prepare-umap: Generates prompt dataset and trains the UMAP model.
+  - prepare-bd-table: Precomputes the behavior descriptor of every prompt style.
   - run-ga:       Runs the NSGA-II genetic algorithm experiment.
   - run-me:       Runs the MAP-Elites experiment.
   - analyze:      Runs the post-experiment analysis and generates plots.
-  - all:          Runs all stages sequentially (prepare, run-ga, run-me, analyze).
+  - all:          Runs all stages sequentially (prepare, bd table, run-ga, run-me, analyze).
 """
     )
     parser.add_argument(
@@ -54,6 +55,9 @@ def main():
     if stage == "prepare-umap" or stage == "all":
         run_command(["prepare_umap.py"], "UMAP Preparation")
 
+    if stage == "prepare-bd-table" or stage == "all":
+        run_command(["bd_table.py"], "Behavior Descriptor Table Preparation")
+
     if stage == "run-ga" or stage == "all":
         run_command(["main.py", "ga"], "Genetic Algorithm (NSGA-II) Run")
 
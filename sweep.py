@@ -0,0 +1,182 @@
+# sweep.py
+# Runs one experiment per MacGyver problem across a process pool.
+# Each run writes to its own directory, results/<algorithm>_<problem_id>/ (the layout of the
+# shipped map_elites_macgyver_* results), and all runs share one global cap on in-flight
+# LLM requests through a multiprocessing.Manager semaphore, or, with --scheduler, through the
+# LLM scheduler daemon (llm_scheduler.py), which adds per-endpoint limits, priorities and fair share.
+#
+# Usage:
+#   python sweep.py map_elites --all
+#   python sweep.py map_elites --problem-ids macgyver_351 macgyver_358 --processes 2
+#   python sweep.py ga --categories Outdoors --max-llm-requests 8
+#   python sweep.py map_elites --all --scheduler
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import traceback
+import contextlib
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence
+
+# Ensure the script can find other modules in the project
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import llm_services
+import llm_scheduler
+
+DONE_MARKER = "sweep_done.json"
+
+def select_problems(problem_ids: Optional[Sequence[str]] = None, categories: Optional[Sequence[str]] = None,
+                    dataset_path: str = config.MACGYVER_DATASET_PATH) -> List[str]:
+    """Problem IDs to sweep, in dataset order: the given IDs, the problems of the given categories, or all."""
+    with open(dataset_path, 'r') as f:
+        problems = json.load(f)
+    known = {p['problem_id'] for p in problems}
+    unknown = [pid for pid in (problem_ids or []) if pid not in known]
+    if unknown:
+        raise ValueError(f"Unknown problem ids: {unknown}")
+    selected = []
+    for problem in problems:
+        if problem_ids and problem['problem_id'] in problem_ids:
+            selected.append(problem['problem_id'])
+        elif categories and problem['category'] in categories:
+            selected.append(problem['problem_id'])
+        elif not problem_ids and not categories:
+            selected.append(problem['problem_id'])
+    return selected
+
+def run_dir_for(results_root: str, algorithm: str, problem_id: str) -> str:
+    return os.path.join(results_root, f"{algorithm}_{problem_id}")
+
+def _init_worker(limiter, scheduler_address: Optional[str] = None):
+    """Process pool initializer: every LLM handler in this process goes through the shared limiter or scheduler."""
+    if scheduler_address is not None:
+        config.LLM_SCHEDULER_ENABLED = True
+        config.LLM_SCHEDULER_ADDRESS = scheduler_address
+    else:
+        llm_services.set_request_limiter(limiter)
+
+def run_one(algorithm: str, problem_id: str, results_root: str, seed: Optional[int] = None,
+            resume: bool = False) -> Dict[str, Any]:
+    """
+    Runs a single experiment in the current (worker) process with config.RESULTS_DIR pointed
+    at its own directory. Output goes to <run dir>/run.log. Errors are reported, not raised,
+    so one failing problem does not stop the sweep.
+    """
+    from main import build_components, run_search
+
+    run_dir = run_dir_for(results_root, algorithm, problem_id)
+    os.makedirs(run_dir, exist_ok=True)
+    # Only outputs follow RESULTS_DIR; the UMAP model, BD table and LLM cache paths were
+    # resolved against the shared results directory when config was imported.
+    config.RESULTS_DIR = run_dir
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    start = time.time()
+    summary = {"problem_id": problem_id, "run_dir": run_dir, "status": "ok", "error": None}
+    with open(os.path.join(run_dir, "run.log"), 'a') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        llm_handler = None
+        try:
+            llm_handler, cfg_generator, task_loader, solution_evaluator = build_components()
+            run_search(algorithm, llm_handler, cfg_generator, task_loader, solution_evaluator,
+                       problem_id=problem_id, resume=resume)
+        except Exception as e:
+            traceback.print_exc()
+            summary.update(status="failed", error=f"{type(e).__name__}: {e}")
+        finally:
+            if llm_handler is not None:
+                llm_handler.close()
+    summary["seconds"] = round(time.time() - start, 1)
+    if summary["status"] == "ok":
+        with open(os.path.join(run_dir, DONE_MARKER), 'w') as f:
+            json.dump(dict(summary, algorithm=algorithm, seed=seed), f, indent=2)
+    return summary
+
+def sweep(algorithm: str, problem_ids: Sequence[str], processes: int = config.SWEEP_PROCESSES,
+          max_llm_requests: int = config.SWEEP_MAX_LLM_REQUESTS, results_root: str = config.RESULTS_DIR,
+          seed: Optional[int] = None, resume: bool = False, rerun: bool = False,
+          use_scheduler: bool = False) -> List[Dict[str, Any]]:
+    """
+    Runs `algorithm` once per problem on `processes` worker processes, with at most
+    `max_llm_requests` HTTP requests in flight across all of them. With `use_scheduler`,
+    requests go through an LLM scheduler daemon started for the sweep instead of a plain
+    semaphore. Problems whose run directory already holds a completion marker are skipped
+    unless `rerun` is set.
+    """
+    todo = [pid for pid in problem_ids
+            if rerun or not os.path.exists(os.path.join(run_dir_for(results_root, algorithm, pid), DONE_MARKER))]
+    skipped = len(problem_ids) - len(todo)
+    print(f"--- Sweeping {algorithm} over {len(todo)} problems ({skipped} already done) "
+          f"on {processes} processes, max {max_llm_requests} concurrent LLM requests ---")
+
+    summaries = []
+    scheduler = scheduler_address = None
+    if use_scheduler:
+        scheduler_address = os.path.join(results_root, "llm_scheduler.sock")
+        scheduler = llm_scheduler.start_scheduler(scheduler_address, max_in_flight=max_llm_requests)
+    with multiprocessing.Manager() as manager:
+        limiter = manager.BoundedSemaphore(max_llm_requests)
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(limiter, scheduler_address)) as executor:
+            futures = {
+                executor.submit(run_one, algorithm, pid, results_root,
+                                None if seed is None else seed + i, resume): pid
+                for i, pid in enumerate(todo)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                summary = future.result()
+                summaries.append(summary)
+                status = "OK" if summary["status"] == "ok" else f"FAILED ({summary['error']})"
+                print(f"[{done}/{len(todo)}] {summary['problem_id']}: {status} in {summary['seconds']}s -> {summary['run_dir']}")
+    if scheduler is not None:
+        print(f"LLM scheduler: {scheduler.get_scheduler().stats()}")
+        scheduler.shutdown()
+
+    with open(os.path.join(results_root, f"sweep_{algorithm}_summary.json"), 'w') as f:
+        json.dump(summaries, f, indent=2)
+    failed = [s['problem_id'] for s in summaries if s['status'] != "ok"]
+    print(f"--- Sweep finished: {len(summaries) - len(failed)} succeeded, {len(failed)} failed ---")
+    if failed:
+        print(f"Failed problems: {failed}")
+    return summaries
+
+def main():
+    from main import SEARCH_ALGORITHMS
+
+    parser = argparse.ArgumentParser(description="Run one experiment per problem across a process pool.")
+    parser.add_argument("algorithm", choices=SEARCH_ALGORITHMS, help="Algorithm to run for every problem.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--problem-ids", nargs="+", help="Problem ids, e.g. macgyver_351")
+    target.add_argument("--categories", nargs="+", help="Dataset categories, e.g. Outdoors Neutral")
+    target.add_argument("--all", action="store_true", help="Every problem in the dataset")
+    parser.add_argument("--processes", type=int, default=config.SWEEP_PROCESSES, help="Concurrent experiments")
+    parser.add_argument("--max-llm-requests", type=int, default=config.SWEEP_MAX_LLM_REQUESTS,
+                        help="Global cap on in-flight LLM requests across all experiments")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="Route requests through an LLM scheduler daemon (priorities, fair share, rate limits)")
+    parser.add_argument("--seed", type=int, default=None, help="Base seed; run i uses seed + i")
+    parser.add_argument("--resume", action="store_true", help="Continue MAP-Elites runs from their checkpoints")
+    parser.add_argument("--rerun", action="store_true", help="Also rerun problems that already completed")
+    args = parser.parse_args()
+    if args.resume and args.algorithm != "map_elites":
+        parser.error("--resume is only supported for the 'map_elites' algorithm.")
+
+    problem_ids = select_problems(args.problem_ids, args.categories)
+    if not problem_ids:
+        parser.error("No problems match the selection.")
+    sweep(args.algorithm, problem_ids, args.processes, args.max_llm_requests,
+          seed=args.seed, resume=args.resume, rerun=args.rerun,
+          use_scheduler=args.scheduler)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# test_analysis_utils.py
+# Checks the exact and incremental hypervolume against a brute-force grid computation.
+
+import random
+import unittest
+
+import numpy as np
+
+from analysis_utils import compute_hypervolume, IncrementalHypervolume2D
+from algorithm.pareto_front import ParetoFront
+
+def brute_force_hypervolume(points, reference_point):
+    pts = [(x, y) for x, y in points if x > reference_point[0] and y > reference_point[1]]
+    xs = sorted({reference_point[0]} | {x for x, _ in pts})
+    ys = sorted({reference_point[1]} | {y for _, y in pts})
+    return sum((xs[i + 1] - xs[i]) * (ys[j + 1] - ys[j])
+               for i in range(len(xs) - 1) for j in range(len(ys) - 1)
+               if any(x >= xs[i + 1] and y >= ys[j + 1] for x, y in pts))
+
+class TestHypervolume(unittest.TestCase):
+    def test_exact_matches_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            points = [(rng.randint(-2, 6) / 2, rng.randint(-2, 6) / 2) for _ in range(rng.randint(0, 25))]
+            reference = (rng.choice([-1.0, 0.0, 0.5]), rng.choice([-1.0, 0.0, 0.5]))
+            expected = brute_force_hypervolume(points, reference)
+            self.assertAlmostEqual(compute_hypervolume(points, reference), expected)
+            self.assertAlmostEqual(compute_hypervolume(np.array(points).reshape(-1, 2), reference), expected)
+
+    def test_incremental_tracks_exact(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            hv, members = IncrementalHypervolume2D((0.0, 0.0)), []
+            for _ in range(rng.randint(1, 40)):
+                if members and rng.random() < 0.3:
+                    hv.remove(members.pop(rng.randrange(len(members))))
+                else:
+                    point = (rng.randint(-1, 8) / 2, rng.randint(-1, 8) / 2)
+                    hv.add(point)
+                    members = [tuple(p) for p in hv.points()]
+                self.assertAlmostEqual(hv.value, compute_hypervolume(hv.points(), (0.0, 0.0)))
+
+    def test_pareto_front_hypervolume_under_truncation(self):
+        rng = random.Random(2)
+        front = ParetoFront(capacity=4, reference_point=(0.0, 0.0))
+        for i in range(300):
+            front.insert({"id": i, "scores": [rng.random() * 2, rng.random() * 5]})
+            self.assertAlmostEqual(front.hypervolume, compute_hypervolume(front.scores(), (0.0, 0.0)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# test_archive.py
+# Checks the array-backed GridArchive against a plain dict of Pareto-front lists.
+
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from algorithm.archive import (CVTArchive, GridArchive, SparseGridArchive, load_archive, load_or_build_cvt_centroids,
+                               make_archive)
+
+try:
+    import scipy  # noqa: F401
+    import sklearn  # noqa: F401
+    HAS_CVT_DEPS = True
+except ImportError:
+    HAS_CVT_DEPS = False
+from algorithm.pareto_front import ParetoFront
+
+def random_elite(rng: random.Random, i: int):
+    cell = (rng.randrange(3), rng.randrange(3))
+    return {
+        "prompt_text": f"prompt {rng.randrange(20)}",
+        "parent_prompt_text": rng.choice([None, f"prompt {rng.randrange(20)}"]),
+        "solution_text": f"solution {i}",
+        "scores": [rng.random() * 2, rng.random() * 5],
+        "bd_float_coords": [rng.random(), rng.random()],
+        "bd_bin_coords": cell,
+    }
+
+class TestGridArchive(unittest.TestCase):
+    def test_matches_dict_of_fronts(self):
+        rng = random.Random(0)
+        archive = GridArchive((3, 3), capacity=3, reference_point=(0.0, 0.0))
+        reference = {}
+        for i in range(300):
+            elite = random_elite(rng, i)
+            archive.add(elite)
+            reference.setdefault(elite['bd_bin_coords'], ParetoFront(capacity=3)).insert(elite)
+
+        self.assertEqual(list(archive.keys()), list(reference.keys()))
+        self.assertEqual([archive[cell] for cell in archive], [list(front) for front in reference.values()])
+        flat = [elite for front in reference.values() for elite in front]
+        np.testing.assert_array_equal(archive.elite_scores(), [e['scores'] for e in flat])
+        self.assertEqual(archive.elite_field('solution_text'), [e['solution_text'] for e in flat])
+        self.assertEqual(archive.num_elites, len(flat))
+        self.assertAlmostEqual(archive.coverage, len(reference) / 9)
+
+        # Only texts still referenced by an elite are kept.
+        live = {e[f] for e in flat for f in GridArchive.TEXT_FIELDS if e[f] is not None}
+        self.assertEqual(len(archive.texts), len(live))
+
+    def test_sparse_matches_dense_in_3d(self):
+        rng = random.Random(1)
+        shape = (4, 5, 6)
+        dense = GridArchive(shape, capacity=2, bd_dim=3, reference_point=(0.0, 0.0))
+        sparse = SparseGridArchive(shape, capacity=2, bd_dim=3, reference_point=(0.0, 0.0))
+        for i in range(60):
+            elite = random_elite(rng, i)
+            elite['bd_bin_coords'] = tuple(rng.randrange(n) for n in shape)
+            elite['bd_float_coords'] = [rng.random() for _ in shape]
+            dense.add(elite)
+            sparse.add(elite)
+        self.assertEqual(list(sparse.items()), list(dense.items()))
+        np.testing.assert_array_equal(sparse.elite_scores(), dense.elite_scores())
+        self.assertAlmostEqual(sparse.qd_score, dense.qd_score)
+        self.assertAlmostEqual(sparse.coverage, dense.coverage)
+        self.assertEqual([tuple(c) for c in sparse.occupied_cells()], list(dense.keys()))
+        self.assertLess(sparse.scores.shape[0], np.prod(shape))
+
+    def test_load_round_trip(self):
+        rng = random.Random(2)
+        archive = SparseGridArchive((20, 20, 20), capacity=3)
+        for i in range(100):
+            elite = random_elite(rng, i)
+            elite['bd_bin_coords'] = tuple(rng.randrange(20) for _ in range(3))
+            elite['bd_float_coords'] = [rng.random() for _ in range(3)]
+            archive.add(elite)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "archive.json")
+            with open(path, 'w') as f:
+                json.dump({str(k): v for k, v in archive.items()}, f)
+            loaded = load_archive(path, grid_shape=(20, 20, 20), capacity=3)
+        self.assertIsInstance(loaded, SparseGridArchive)
+        self.assertEqual(list(loaded.keys()), list(archive.keys()))
+        self.assertEqual(loaded.num_elites, archive.num_elites)
+
+    @unittest.skipUnless(HAS_CVT_DEPS, "CVT archive needs scipy and scikit-learn")
+    def test_cvt_assignment_and_centroid_cache(self):
+        rng = np.random.default_rng(3)
+        samples = rng.normal(size=(500, 3))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "centroids.npz")
+            centroids = load_or_build_cvt_centroids(path, 20, samples)
+            np.testing.assert_array_equal(load_or_build_cvt_centroids(path, 20, samples), centroids)
+        archive = CVTArchive(centroids, capacity=2)
+        queries = rng.normal(size=(200, 3))
+        expected = np.argmin(((queries[:, None, :] - centroids[None]) ** 2).sum(-1), axis=1)
+        np.testing.assert_array_equal(archive.assign_batch(queries), expected)
+        self.assertEqual(archive.grid_shape, (20,))
+
+    @unittest.skipUnless(HAS_CVT_DEPS, "CVT archive needs scipy and scikit-learn")
+    def test_cvt_backend_and_load_round_trip(self):
+        rng = random.Random(4)
+        samples = np.random.default_rng(4).normal(size=(300, 2))
+        with tempfile.TemporaryDirectory() as tmp:
+            centroids_path = os.path.join(tmp, "centroids.npz")
+            centroids = load_or_build_cvt_centroids(centroids_path, 12, samples)
+            archive = make_archive("cvt", None, 2, centroids_path=centroids_path)
+            self.assertIsInstance(archive, CVTArchive)
+            np.testing.assert_array_equal(archive.centroids, centroids)
+            for i in range(80):
+                elite = random_elite(rng, i)
+                elite['bd_bin_coords'] = (int(archive.assign_batch(elite['bd_float_coords'])[0]),)
+                archive.add(elite)
+            path = os.path.join(tmp, "archive.json")
+            with open(path, 'w') as f:
+                json.dump({str(k): v for k, v in archive.items()}, f)
+
+            loaded = load_archive(path, backend="cvt", centroids_path=centroids_path)
+            self.assertIsInstance(loaded, CVTArchive)
+            self.assertEqual(loaded.grid_shape, (12,))
+            self.assertEqual(list(loaded.items()), list(archive.items()))
+            with self.assertRaisesRegex(ValueError, "No CVT centroids"):
+                load_archive(path, backend="cvt", centroids_path=os.path.join(tmp, "missing.npz"))
+            with self.assertRaisesRegex(ValueError, "outside"):
+                load_archive(path, backend="cvt", centroids=centroids[:2])
+            with self.assertRaisesRegex(ValueError, "does not match"):
+                make_archive("cvt", (5,), 2, centroids=centroids)
+
+if __name__ == '__main__':
+    unittest.main()
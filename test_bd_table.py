@@ -0,0 +1,128 @@
+# test_bd_table.py
+# Checks that the precomputed BD table agrees with embedding and projecting each style directly,
+# that unknown styles fall back to the slow path, re-binning for new bounds, and that stale or
+# half-rebuilt tables are refused. The grammar, embeddings and UMAP model are stubbed.
+
+import itertools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import config
+from bd_table import STYLE_GENES, BehaviorDescriptorTable, bin_coords_batch, build_bd_table, style_string
+
+RULES = {
+    "role_instruction": ["You are an engineer.", "You are a chemist.", ""],
+    "format_instruction": ["Answer in steps.", "Answer in one paragraph."],
+    "creativity_instruction": ["Be bold.", "Be careful."],
+}
+GRID_SHAPE = (4, 5)
+
+class StubGenerator:
+    def __init__(self, rules):
+        self.rules = rules
+
+class StubHandler:
+    def get_embeddings(self, texts):
+        return np.array([[len(text) / 10, text.count("e") / 3, text.count(" ") / 4] for text in texts])
+
+    def get_embeddings_batch(self, texts, batch_size=32):
+        return [self.get_embeddings(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+
+class StubUMAP:
+    def transform(self, embeddings):
+        embeddings = np.asarray(embeddings)
+        return np.stack([embeddings[:, 0] - embeddings[:, 2], embeddings[:, 1] * 2], axis=1)
+
+class TestBDTable(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, "bd_table")
+        self.model_path = os.path.join(tmp.name, "umap_model.pkl")
+        with open(self.model_path, "wb") as f:
+            f.write(b"model v1")
+        missing = os.path.join(tmp.name, "missing")
+        patcher = mock.patch.multiple(config, UMAP_MODEL_PATH=self.model_path, UMAP_BOUNDS_PATH=missing)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generator = StubGenerator(RULES)
+        self.handler = StubHandler()
+        self.umap_min, self.umap_max = [-1.0, 0.0], [3.0, 4.0]
+
+    def build(self, **kwargs):
+        return build_bd_table(self.generator, self.handler, StubUMAP(), self.directory,
+                              umap_min=self.umap_min, umap_max=self.umap_max, grid_shape=GRID_SHAPE, **kwargs)
+
+    def genotypes(self):
+        for combo in itertools.product(*(RULES[gene] for gene in STYLE_GENES)):
+            yield dict(zip(STYLE_GENES, combo), macgyver_problem_text="Open a jar.")
+
+    def test_lookup_matches_embed_and_project(self):
+        table = self.build()
+        self.assertEqual(len(table), 12)
+        rows = []
+        for genotype in self.genotypes():
+            rows.append(table.row_index(genotype))
+            coords, bins = table.lookup(genotype)
+            expected = StubUMAP().transform(self.handler.get_embeddings([style_string(genotype)]))
+            np.testing.assert_allclose(coords, expected[0], rtol=1e-6)
+            self.assertEqual(bins, tuple(bin_coords_batch(expected, self.umap_min, self.umap_max, GRID_SHAPE)[0]))
+        self.assertEqual(sorted(rows), list(range(12)))
+
+    def test_styles_outside_the_grammar_are_not_tabulated(self):
+        table = self.build()
+        genotype = next(self.genotypes())
+        for changed in (dict(genotype, role_instruction="You are a pirate."),
+                        {gene: value for gene, value in genotype.items() if gene != "format_instruction"}):
+            self.assertIsNone(table.row_index(changed))
+            self.assertIsNone(table.lookup(changed))
+
+    def test_ensure_bins_rebins_for_new_bounds(self):
+        table = self.build()
+        bins = table.bins
+        table.ensure_bins(self.umap_min, self.umap_max, GRID_SHAPE)
+        self.assertIs(table.bins, bins)
+
+        table.ensure_bins([0.0, 1.0], [2.0, 2.0], (3, 3))
+        np.testing.assert_array_equal(table.bins, bin_coords_batch(table.coords, [0.0, 1.0], [2.0, 2.0], (3, 3)))
+        self.assertFalse(np.array_equal(table.bins, bins))
+        self.assertEqual((table.meta["umap_min"], table.meta["umap_max"], table.meta["grid_shape"]),
+                         ([0.0, 1.0], [2.0, 2.0], [3, 3]))
+        genotype = next(self.genotypes())
+        self.assertEqual(table.lookup(genotype)[1], tuple(table.bins[table.row_index(genotype)]))
+
+    def test_build_rejects_non_terminal_styles(self):
+        generator = StubGenerator(dict(RULES, format_instruction=["Answer in <format>."]))
+        with self.assertRaises(ValueError):
+            build_bd_table(generator, self.handler, StubUMAP(), self.directory)
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_load_refuses_stale_tables(self):
+        self.build()
+        self.assertIsNotNone(BehaviorDescriptorTable.load(self.directory, self.generator))
+        self.assertIsNone(BehaviorDescriptorTable.load(
+            self.directory, StubGenerator(dict(RULES, creativity_instruction=["Be bold."]))))
+
+        os.rename(self.model_path, self.model_path + ".bak")
+        self.assertIsNone(BehaviorDescriptorTable.load(self.directory, self.generator))
+        os.rename(self.model_path + ".bak", self.model_path)
+        with open(self.model_path, "wb") as f:
+            f.write(b"model v2")
+        self.assertIsNone(BehaviorDescriptorTable.load(self.directory, self.generator))
+
+    def test_interrupted_rebuild_is_not_loaded(self):
+        self.build()
+        self.umap_min, self.umap_max = [0.0, 0.0], [1.0, 1.0]
+        with mock.patch("umap_artifacts.np.save", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.build()
+        # The old meta.json no longer describes the arrays on disk, so the table must not load.
+        self.assertIsNone(BehaviorDescriptorTable.load(self.directory, self.generator))
+        self.assertEqual(len(self.build()), 12)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# test_compiled_grammar.py
+# Checks the compiled grammar: integer codes round-trip, the vectorized operators, and that
+# the dict genotype path still draws from `random` exactly as before.
+
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+import yaml
+
+from cfg_generator import CFGPromptGenerator
+from compiled_grammar import CompiledGrammar
+
+RULES = {
+    "start": ["<tone> <task> Problem: <macgyver_problem_text>"],
+    "tone": ["", "Be bold.", "Be <adverb> careful."],
+    "adverb": ["very", "extremely"],
+    "task": ["List steps.", "Write <unknown> prose."],
+    "macgyver_problem_text": ["PROBLEM_PLACEHOLDER"],
+}
+
+class TestCompiledGrammar(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".yaml")
+        with os.fdopen(handle, "w") as f:
+            yaml.safe_dump(RULES, f)
+        self.generator = CFGPromptGenerator(self.path)
+        self.grammar = self.generator.grammar
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_tables_and_round_trip(self):
+        self.assertEqual(self.grammar.gene_keys, ("tone", "task", "macgyver_problem_text"))
+        self.assertEqual(self.grammar.gene_sizes, (4, 2, 1))
+        codes = self.generator.generate_random_codes(500, np.random.default_rng(0))
+        self.assertEqual(codes.shape, (500, 3))
+        for row in codes[:50]:
+            genotype = self.generator.decode_genotype(row)
+            self.assertEqual(self.generator.encode_genotype(genotype), tuple(row))
+        self.assertIn("Write <unknown> prose.", self.grammar._tables[0][1])  # undefined symbols are terminals
+        with self.assertRaises(ValueError):
+            self.grammar.encode({"tone": "Be loud.", "task": "List steps.", "macgyver_problem_text": "PROBLEM_PLACEHOLDER"})
+
+    def test_sampling_matches_recursive_expansion(self):
+        # "Be very careful." is one choice of three, then one of two: probability 1/6.
+        codes = self.generator.generate_random_codes(60000, np.random.default_rng(1))
+        genotypes = self.generator.generate_random_genotypes(60000, np.random.default_rng(1))
+        self.assertEqual(genotypes[:10], self.generator.grammar.decode_batch(codes[:10]))
+        very = self.grammar.encode({"tone": "Be very careful.", "task": "List steps.",
+                                    "macgyver_problem_text": "PROBLEM_PLACEHOLDER"})[0]
+        self.assertAlmostEqual(np.mean(codes[:, 0] == very), 1 / 6, delta=0.01)
+        self.assertAlmostEqual(np.mean(codes[:, 0] == 0), 1 / 3, delta=0.01)
+
+    def test_mutation_and_crossover(self):
+        rng = np.random.default_rng(2)
+        parents = self.grammar.baseline_codes(1000)
+        self.assertTrue(np.array_equal(self.generator.mutate_codes(parents, 0.0, rng), parents))
+        mutated = self.generator.mutate_codes(parents, 1.0, rng)
+        self.assertGreater(np.mean(mutated[:, 0] != 0), 0.5)
+
+        ones = np.ones_like(parents)
+        child1, child2 = self.generator.crossover_codes(parents, ones, rng)
+        self.assertTrue(np.all(child1 + child2 == 1))
+        self.assertTrue(np.all(child1[:, 0] == 0))  # the crossover point is never before the first gene
+        self.assertTrue(np.all(np.diff(child1, axis=1) >= 0))  # one point: a prefix of parent1, then parent2
+
+    def test_recursive_grammar_only_disables_codes(self):
+        grammar = CompiledGrammar({"start": ["<a>"], "a": ["x", "<a>x"]}, ["a"])
+        with self.assertRaises(ValueError):
+            grammar.gene_sizes
+
+    def test_dict_path_random_sequence(self):
+        random.seed(7)
+        genotype = self.generator.generate_random_genotype()
+        mutated = self.generator.mutate_genotype(genotype, 0.5)
+        after = random.random()
+
+        # Reference: the original re.split-based expansion with random.choice on the rule strings.
+        def expand(key):
+            production = random.choice(RULES[key])
+            return production.replace("<adverb>", expand("adverb")) if "<adverb>" in production else production
+        random.seed(7)
+        expected = {key: expand(key) for key in ("tone", "task", "macgyver_problem_text")}
+        expected_mutated = dict(expected)
+        for key in expected_mutated:
+            if random.random() < 0.5:
+                expected_mutated[key] = expand(key)
+        self.assertEqual(genotype, expected)
+        self.assertEqual(mutated, expected_mutated)
+        self.assertEqual(random.random(), after)
+
+if __name__ == "__main__":
+    unittest.main()
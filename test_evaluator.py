@@ -5,11 +5,13 @@
 import unittest
 from unittest.mock import MagicMock
 import math
+import random
+import threading
 import time
 
 import config
 from llm_services import LLM_API_Handler
-from evaluation import SemanticEntropyCalculator, LexicalDiversityCalculator
+from evaluation import PipelinedSolutionEvaluator, SemanticEntropyCalculator, SolutionEvaluator, LexicalDiversityCalculator
 
 # --- Unit Test for Local Logic (No API Calls) ---
 
@@ -27,7 +29,7 @@ class TestSemanticEntropyLogic(unittest.TestCase):
         variations = ["Tie the rope.", "Scoop the water.", "Shine the light."]
         
         def mock_nli(premise, hypothesis): return 0.1 if premise != hypothesis else 1.0
-        self.mock_llm_handler.check_nli_entailment.side_effect = mock_nli
+        self.mock_llm_handler.check_nli_entailment_batch.side_effect = lambda pairs: [mock_nli(p, h) for p, h in pairs]
 
         calculator = SemanticEntropyCalculator(self.mock_llm_handler)
         entropy = calculator.calculate_entropy(variations)
@@ -44,7 +46,7 @@ class TestSemanticEntropyLogic(unittest.TestCase):
         def mock_nli(premise, hypothesis):
             similar = {"Attach the string.", "Tie the line."}
             return 0.95 if premise in similar and hypothesis in similar else 0.1
-        self.mock_llm_handler.check_nli_entailment.side_effect = mock_nli
+        self.mock_llm_handler.check_nli_entailment_batch.side_effect = lambda pairs: [mock_nli(p, h) for p, h in pairs]
 
         calculator = SemanticEntropyCalculator(self.mock_llm_handler)
         entropy = calculator.calculate_entropy(variations)
@@ -54,6 +56,87 @@ class TestSemanticEntropyLogic(unittest.TestCase):
         self.assertAlmostEqual(entropy, expected, places=4)
         print(f"✅ PASSED: Low diversity entropy is {entropy:.4f} (correct)")
 
+    def test_batched_clustering_matches_pairwise_greedy(self):
+        """Tests that clustering on the batched entailment matrix matches the pairwise greedy algorithm."""
+        print("\n--- Unit Test: Batched NLI Clustering ---")
+        rng = random.Random(0)
+        for _ in range(200):
+            variations = [f"v{rng.randint(0, 5)}" for _ in range(rng.randint(2, 7))]
+            table = {(p, h): rng.random() for p in variations for h in variations}
+            mock_nli = lambda premise, hypothesis: table[(premise, hypothesis)]
+
+            # Reference: the original greedy algorithm with one NLI call per direction.
+            expected_clusters = []
+            for variation in variations:
+                for cluster in expected_clusters:
+                    if (mock_nli(cluster[0], variation) > config.NLI_ENTAILMENT_THRESHOLD and
+                            mock_nli(variation, cluster[0]) > config.NLI_ENTAILMENT_THRESHOLD):
+                        cluster.append(variation)
+                        break
+                else:
+                    expected_clusters.append([variation])
+            probabilities = [len(c) / len(variations) for c in expected_clusters]
+            expected = -sum(p * math.log2(p) for p in probabilities)
+
+            self.mock_llm_handler.check_nli_entailment_batch.reset_mock()
+            self.mock_llm_handler.check_nli_entailment_batch.side_effect = lambda pairs: [mock_nli(p, h) for p, h in pairs]
+            calculator = SemanticEntropyCalculator(self.mock_llm_handler)
+            self.assertAlmostEqual(calculator.calculate_entropy(variations), expected, places=9)
+            self.assertEqual(self.mock_llm_handler.check_nli_entailment_batch.call_count, 1)
+        print("✅ PASSED: Batched clustering matches the pairwise greedy algorithm")
+
+class TestPipelinedEvaluator(unittest.TestCase):
+    """Checks that the pipelined evaluator matches evaluate_prompt and overlaps its stages."""
+    def setUp(self):
+        self.mock_llm_handler = MagicMock(spec=LLM_API_Handler)
+        # Stages currently inside a mocked call, and the most that were ever inside at once.
+        self.running = {stage: 0 for stage in SolutionEvaluator.STAGES}
+        self.max_concurrent_stages = 0
+        self.lock = threading.Lock()
+
+        def slow(stage, result):
+            def call(*args):
+                with self.lock:
+                    self.running[stage] += 1
+                    self.max_concurrent_stages = max(self.max_concurrent_stages,
+                                                     sum(count > 0 for count in self.running.values()))
+                time.sleep(0.05)
+                with self.lock:
+                    self.running[stage] -= 1
+                return result(*args)
+            return call
+        self.mock_llm_handler.generate_solution.side_effect = slow(
+            "generate", lambda prompt: None if prompt.endswith("fail") else f"Solution for {prompt}")
+        self.mock_llm_handler.evaluate_solution_with_scores.side_effect = slow(
+            "score", lambda problem, solution: {"safety": 4.0, "feasibility": 3.0, "effectiveness": len(solution) % 5 + 1.0})
+        self.mock_llm_handler.generate_variations_for_step.side_effect = slow(
+            "variations", lambda solution: [f"{solution} a", f"{solution} b", f"{solution} c"])
+        self.mock_llm_handler.check_nli_entailment_batch.side_effect = slow(
+            "entropy", lambda pairs: [1.0 if p == h else 0.1 for p, h in pairs])
+        self.items = [(f"prompt {i}" + (" fail" if i == 3 else ""), "problem") for i in range(8)]
+
+    def test_matches_sequential_evaluation(self):
+        expected = [SolutionEvaluator(self.mock_llm_handler).evaluate_prompt(*item) for item in self.items]
+        self.assertEqual(self.max_concurrent_stages, 1)
+        pipelined = PipelinedSolutionEvaluator(self.mock_llm_handler, stage_workers={stage: 2 for stage in SolutionEvaluator.STAGES})
+        self.assertEqual(pipelined.evaluate_prompts(self.items), expected)
+        # Different individuals were in different stages at the same time.
+        self.assertGreaterEqual(self.max_concurrent_stages, 3)
+        stats = pipelined.stage_stats()
+        self.assertEqual(stats["generate"]["processed"], 8)
+        self.assertEqual(stats["score"]["processed"], 7)  # the failed generation skips the rest
+        self.assertTrue(all(0 < stage["utilisation"] <= 1 for stage in stats.values()))
+
+    def test_streaming_and_early_close(self):
+        items = self.items * 3
+        pipelined = PipelinedSolutionEvaluator(self.mock_llm_handler, stage_workers={}, queue_size=1)
+        stream = pipelined.iter_evaluations(items)
+        index, result = next(stream)
+        self.assertEqual(result, SolutionEvaluator(self.mock_llm_handler).evaluate_prompt(*items[index]))
+        stream.close()  # drains the individuals in flight without further calls
+        # Bounded queues: generation cannot run far ahead of the slower downstream stages.
+        self.assertLess(pipelined.stage_stats()["generate"]["processed"], len(items) // 2)
+
 # --- Live Test for Evaluator LLM (Makes Real API Calls) ---
 
 def run_live_evaluator_test():
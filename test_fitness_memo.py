@@ -0,0 +1,129 @@
+# test_fitness_memo.py
+# Checks the canonical genotype key and the skip/cap/off reuse policies of the fitness memo,
+# and that MAP-Elites does not insert reused results into the archive again.
+
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import config
+from algorithm.map_elites import MAPElitesAlgorithm
+from cfg_generator import CFGPromptGenerator
+from fitness_memo import FitnessMemo, genotype_key
+from task_loader import TaskLoader
+
+class TestFitnessMemo(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def evaluate(self):
+        self.calls += 1
+        return {"scores": [self.calls, 1, 1], "solution_text": f"solution {self.calls}"}
+
+    def test_genotype_key_is_canonical(self):
+        a = {"role": "You are an engineer.", "strategy": "Think step by step.", "macgyver_problem_text": "x"}
+        b = {"strategy": "Think step by step.", "role": "You are an engineer.", "start": "<role> <strategy>"}
+        self.assertEqual(genotype_key(a, "macgyver_351"), genotype_key(b, "macgyver_351"))
+        self.assertNotEqual(genotype_key(a, "macgyver_351"), genotype_key(a, "macgyver_358"))
+
+    def test_skip_reuses_first_result(self):
+        memo = FitnessMemo("skip")
+        first = memo.get_or_evaluate("k", self.evaluate)
+        self.assertIs(memo.get_or_evaluate("k", self.evaluate), first)
+        memo.get_or_evaluate("other", self.evaluate)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(memo.stats(), {"policy": "skip", "evaluations": 2, "reused": 1, "llm_calls_avoided": 4})
+
+    def test_cap_evaluates_up_to_limit_then_cycles(self):
+        memo = FitnessMemo("cap", max_evaluations=2)
+        results = [memo.get_or_evaluate("k", self.evaluate)["solution_text"] for _ in range(5)]
+        self.assertEqual(results, ["solution 1", "solution 2", "solution 1", "solution 2", "solution 1"])
+
+    def test_off_always_evaluates(self):
+        memo = FitnessMemo("off")
+        for _ in range(3):
+            memo.get_or_evaluate("k", self.evaluate)
+        self.assertEqual(self.calls, 3)
+
+    def test_concurrent_duplicates_share_one_evaluation(self):
+        memo = FitnessMemo("skip")
+        def slow():
+            time.sleep(0.1)
+            return self.evaluate()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(memo.get_or_evaluate("k", slow))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(results), 4)
+
+    def test_failed_generations_are_not_stored(self):
+        memo = FitnessMemo("skip")
+        memo.get_or_evaluate("k", lambda: {"solution_text": ""})
+        memo.get_or_evaluate("k", self.evaluate)
+        self.assertEqual(self.calls, 1)
+
+    def test_survives_pickling(self):
+        memo = FitnessMemo("skip")
+        memo.get_or_evaluate("k", self.evaluate)
+        restored = pickle.loads(pickle.dumps(memo))
+        restored.get_or_evaluate("k", self.evaluate)
+        self.assertEqual(self.calls, 1)
+
+    def test_lookup_reports_reuse(self):
+        memo = FitnessMemo("skip")
+        first, reused = memo.lookup_or_evaluate("k", self.evaluate)
+        self.assertFalse(reused)
+        self.assertEqual(memo.lookup_or_evaluate("k", self.evaluate), (first, True))
+
+class StubEvaluator:
+    def __init__(self):
+        self.calls = 0
+
+    def evaluate_prompt(self, prompt_text, problem_text):
+        self.calls += 1
+        return {"raw_divergent": 1.0, "raw_convergent": 2.0, "scores": [2, 2, 2], "solution_text": "Step 1: x"}
+
+class StubHandler:
+    def get_embeddings(self, texts):
+        return np.array([[0.5, 0.5] for _ in texts])
+
+class StubUMAP:
+    def transform(self, embeddings):
+        return np.asarray(embeddings)[:, :2]
+
+class TestMAPElitesDuplicates(unittest.TestCase):
+    def test_repeated_genotype_does_not_grow_the_cell(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            missing = os.path.join(tmp, "missing")
+            with mock.patch.multiple(config, RESULTS_DIR=tmp, LLM_CACHE_ENABLED=False, ARCHIVE_BACKEND="grid",
+                                     FITNESS_MEMO_POLICY="skip", CELL_CAPACITY_LIMIT=3,
+                                     UMAP_MODEL_PATH=missing, UMAP_BOUNDS_PATH=missing,
+                                     UMAP_PROMPT_DATASET_PATH=missing, UMAP_EMBEDDINGS_PATH=missing,
+                                     UMAP_COORDS_PATH=missing):
+                cfg_generator = CFGPromptGenerator(config.CFG_RULES_PATH)
+                task_loader = TaskLoader(config.MACGYVER_DATASET_PATH)
+                evaluator = StubEvaluator()
+                algorithm = MAPElitesAlgorithm(cfg_generator, task_loader, evaluator, StubHandler(), StubUMAP())
+                algorithm.fitness_memo = FitnessMemo("skip")
+                algorithm.fixed_problem_id = task_loader.problems[0]['problem_id']
+                genotype = cfg_generator.generate_random_genotype(baseline=True)
+                for _ in range(3):
+                    algorithm._evaluate_and_place_new_individual(generation=0, genotype=genotype)
+
+        self.assertEqual(evaluator.calls, 1)
+        self.assertEqual(algorithm.archive.num_elites, 1)
+        # Duplicates still count as evaluations and are logged, marked as reused.
+        self.assertEqual(algorithm.evaluations, 3)
+        self.assertEqual([item.get("memo_reused", False) for item in algorithm._pending_evals], [False, True, True])
+
+if __name__ == "__main__":
+    unittest.main()
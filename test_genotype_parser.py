@@ -0,0 +1,76 @@
+# test_genotype_parser.py
+# Checks the Aho-Corasick matcher and the reconstruction of genotypes from prompt text.
+
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from compiled_grammar import CompiledGrammar
+from genotype_parser import AhoCorasick, GenotypeParser, reconstruct_results_genotypes
+from prompt_template import PromptTemplate
+
+RULES = {
+    "start": ["<role_instruction> <format_instruction>, <extra_instruction> Problem: <macgyver_problem_text>"],
+    "role_instruction": ["You are a pilot", "You are a pilot in a storm.", "You are a chef."],
+    "format_instruction": ["Use 2 steps", "Use 2 steps in a list."],
+    "extra_instruction": ["", "Be <adverb> careful."],
+    "adverb": ["very"],
+    "macgyver_problem_text": ["PROBLEM_PLACEHOLDER"],
+}
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_finds_every_occurrence(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            patterns = list({"".join(rng.choice("ab ") for _ in range(rng.randint(1, 4))) for _ in range(6)})
+            text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 30)))
+            expected = sorted((i, i + len(p), k) for k, p in enumerate(patterns)
+                              for i in range(len(text)) if text.startswith(p, i))
+            self.assertEqual(sorted(AhoCorasick(patterns).find_all(text)), expected)
+
+class TestGenotypeParser(unittest.TestCase):
+    def setUp(self):
+        genes = ["role_instruction", "format_instruction", "extra_instruction", "macgyver_problem_text"]
+        self.parser = GenotypeParser(CompiledGrammar(RULES, genes).gene_expansions())
+        self.template = PromptTemplate(RULES["start"][0])
+
+    def test_longest_match_wins(self):
+        # "You are a pilot" and "Use 2 steps" also occur inside the longer values.
+        genotype = {"role_instruction": "You are a pilot in a storm.", "format_instruction": "Use 2 steps in a list.",
+                    "extra_instruction": "Be very careful."}
+        prompt = self.template.render(genotype, "A door is stuck.")
+        self.assertEqual(self.parser.parse(prompt), genotype)
+
+    def test_round_trip_and_batch(self):
+        rng = random.Random(1)
+        values = {"role_instruction": RULES["role_instruction"], "format_instruction": RULES["format_instruction"],
+                  "extra_instruction": ["", "Be very careful."]}
+        genotypes = [{key: rng.choice(options) for key, options in values.items()} for _ in range(50)]
+        prompts = [self.template.render(genotype, "A door is stuck.") for genotype in genotypes]
+        for genotype, parsed in zip(genotypes, self.parser.parse_batch(prompts)):
+            self.assertEqual(parsed, genotype)
+
+    def test_unmatched_gene(self):
+        # Genes with an empty value fall back to it; others make the reconstruction fail.
+        self.assertEqual(self.parser.parse("You are a chef. Use 2 steps, Be careful.")["extra_instruction"], "")
+        self.assertIsNone(self.parser.parse("You are a chef."))
+
+    def test_results_directory(self):
+        with tempfile.TemporaryDirectory() as results_dir:
+            os.makedirs(os.path.join(results_dir, "run"))
+            with open(os.path.join(results_dir, "run", "baseline.jsonl"), "w") as f:
+                f.write(json.dumps({"prompt_text": "You are a chef. Use 2 steps, Be careful."}) + "\n")
+                f.write(json.dumps({"solution_text": "no prompt"}) + "\n")
+                f.write(json.dumps({"prompt_text": "nothing here"}) + "\n")
+            with open(os.path.join(results_dir, "run", "log.jsonl"), "w") as f:
+                f.write(json.dumps({"generation": 0}) + "\n")
+            reconstructed = reconstruct_results_genotypes(self.parser, results_dir)
+        self.assertEqual(list(reconstructed), [os.path.join(results_dir, "run", "baseline.jsonl")])
+        genotypes = next(iter(reconstructed.values()))
+        self.assertEqual(genotypes[0]["role_instruction"], "You are a chef.")
+        self.assertIsNone(genotypes[1])
+
+if __name__ == "__main__":
+    unittest.main()
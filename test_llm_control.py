@@ -0,0 +1,81 @@
+# test_llm_control.py
+# Checks the AIMD endpoint controller, Retry-After parsing and the jittered backoff.
+
+import random
+import time
+import unittest
+from email.utils import formatdate
+
+from llm_control import Backoff, EndpointController, parse_retry_after
+
+class TestEndpointController(unittest.TestCase):
+    def test_additive_increase_multiplicative_decrease(self):
+        controller = EndpointController(4, min_window=1, max_window=8, increase=1.0, decrease_factor=0.5,
+                                        adaptive=True)
+        for _ in range(4):
+            controller.record_response(0.1)
+        self.assertAlmostEqual(controller.window, 5.0, delta=0.2)  # about +1 per window of successes
+
+        sent_at = time.monotonic()
+        controller.record_congestion(sent_at)
+        self.assertAlmostEqual(controller.window, 2.5, delta=0.1)
+        # Requests sent before the cut were in flight under the old window: no second cut.
+        controller.record_congestion(sent_at - 1.0, timeout=True)
+        self.assertAlmostEqual(controller.window, 2.5, delta=0.1)
+        controller.record_congestion(time.monotonic())
+        self.assertGreaterEqual(controller.window, 1.0)
+        self.assertEqual(controller.stats()["timeouts"], 1)
+
+    def test_slow_responses_do_not_grow_window(self):
+        controller = EndpointController(2, max_window=8, latency_tolerance=2.0, adaptive=True)
+        for _ in range(10):
+            controller.record_response(0.1)
+        window = controller.window
+        controller.record_response(5.0)
+        self.assertEqual(controller.window, window)
+        p50, p95 = controller.latency_percentiles()
+        self.assertAlmostEqual(p50, 0.1)
+        self.assertGreater(p95, p50)
+
+    def test_fixed_window_when_not_adaptive(self):
+        controller = EndpointController(3, adaptive=False)
+        controller.record_response(0.1)
+        controller.record_congestion(time.monotonic())
+        self.assertEqual(controller.limit, 3)
+
+    def test_percentile_timeout_and_hedge_budget(self):
+        controller = EndpointController(4, hedge_budget=0.1)
+        self.assertEqual(controller.timeout(max_timeout=300, min_samples=5), 300)  # not enough samples yet
+        self.assertIsNone(controller.hedge_delay(min_samples=5))
+        for latency in [1.0] * 19 + [4.0]:
+            controller.record_response(latency)
+        self.assertAlmostEqual(controller.timeout(percentile=99, multiplier=3.0, min_timeout=1, max_timeout=300,
+                                                  min_samples=5), 3.0 * 3.43)
+        self.assertEqual(controller.timeout(multiplier=3.0, min_timeout=30, max_timeout=300, min_samples=5), 30)
+        self.assertGreater(controller.hedge_delay(min_samples=5), 1.0)
+
+        for _ in range(20):
+            with controller.slot():
+                pass
+        hedges = sum(controller.try_hedge() for _ in range(10))
+        self.assertEqual(hedges, 1)  # 10% of the 20 requests, counting the hedge itself as one of them
+
+class TestBackoff(unittest.TestCase):
+    def test_retry_after_parsing(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertAlmostEqual(parse_retry_after(formatdate(time.time() + 30, usegmt=True)), 30, delta=2)
+
+    def test_jittered_exponential_delays(self):
+        backoff = Backoff(base=1.0, cap=10.0, rng=random.Random(0))
+        for attempt in range(6):
+            self.assertLessEqual(backoff.delay(attempt), min(10.0, 2 ** attempt))
+        self.assertGreaterEqual(backoff.delay(0, retry_after=5.0), 5.0)
+
+        state = random.getstate()
+        Backoff().delay(3)
+        self.assertEqual(random.getstate(), state)  # the global RNG is untouched
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# test_llm_scheduler.py
+# Checks the LLM scheduler's grant order (priority classes, fair share) and its limits, in-process.
+
+import threading
+import time
+import unittest
+
+from llm_scheduler import LLMScheduler
+
+EP = "http://endpoint"
+
+class TestLLMScheduler(unittest.TestCase):
+    def _queue(self, scheduler, requests):
+        """Starts one thread per (experiment, priority) while the only slot is held; returns the grant order."""
+        order, threads = [], []
+        for experiment, priority in requests:
+            def run(experiment=experiment, priority=priority):
+                ticket = scheduler.acquire(EP, experiment, priority)
+                order.append((experiment, priority))
+                scheduler.release(ticket)
+            threads.append(threading.Thread(target=run))
+            threads[-1].start()
+            while scheduler.stats()["waiting"] < len(threads):
+                time.sleep(0.001)
+        return order, threads
+
+    def test_priority_then_fair_share(self):
+        scheduler = LLMScheduler(endpoint_concurrency={EP: 1}, rate_limits={})
+        held = scheduler.acquire(EP, "A", "generation")
+        order, threads = self._queue(scheduler, [("A", "generation"), ("A", "generation"),
+                                                 ("B", "generation"), ("C", "nli")])
+        scheduler.release(held)
+        for t in threads:
+            t.join()
+        # NLI first; then B, which has been served less than A; then A's remaining requests in order.
+        self.assertEqual(order, [("C", "nli"), ("B", "generation"), ("A", "generation"), ("A", "generation")])
+
+    def test_concurrency_limit_and_timeout(self):
+        scheduler = LLMScheduler(endpoint_concurrency={EP: 2}, rate_limits={})
+        tickets = [scheduler.acquire(EP), scheduler.acquire(EP)]
+        self.assertIsNone(scheduler.acquire(EP, timeout=0.05))
+        scheduler.release(tickets.pop())
+        self.assertIsNotNone(scheduler.acquire(EP, timeout=0.05))
+
+    def test_rate_limit(self):
+        scheduler = LLMScheduler(endpoint_concurrency={EP: 10}, rate_limits={EP: (20.0, 1)})
+        start = time.monotonic()
+        for _ in range(4):
+            scheduler.release(scheduler.acquire(EP))
+        self.assertGreaterEqual(time.monotonic() - start, 0.14)
+
+if __name__ == "__main__":
+    unittest.main()
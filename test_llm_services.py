@@ -0,0 +1,182 @@
+# test_llm_services.py
+# Checks single-flight coalescing of identical in-flight requests in LLM_API_Handler,
+# the replay slots of sampled requests and hedged requests.
+
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+import config
+from llm_cache import ResponseCache, replay_scope
+from llm_control import EndpointController
+from llm_services import LLM_API_Handler
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(config, "LLM_CACHE_ENABLED", False):
+            self.handler = LLM_API_Handler("test-key", max_workers=8)
+        self.sent = []
+        self.lock = threading.Lock()
+
+        def fake_post(endpoint_url, payload, priority="generation"):
+            with self.lock:
+                self.sent.append(payload["inputs"])
+            time.sleep(0.1)
+            return [[float(len(payload["inputs"]))]]
+        self.handler._post_with_retries = fake_post
+
+    def tearDown(self):
+        self.handler.close()
+
+    def test_identical_deterministic_requests_share_one_call(self):
+        payloads = [{"inputs": f"style {i % 2}"} for i in range(8)]
+        results = self.handler._map(lambda p: self.handler._make_request("http://embed", p, "embedding"), payloads)
+        self.assertEqual(sorted(self.sent), ["style 0", "style 1"])
+        self.assertEqual(results, [[[7.0]]] * 8)
+        self.assertEqual(self.handler.coalescing_stats(), {"sent": 2, "coalesced": 6})
+
+    def test_sampled_requests_are_not_coalesced(self):
+        payload = {"inputs": "x", "parameters": {"do_sample": True, "temperature": 0.9}}
+        self.handler._map(lambda p: self.handler._make_request("http://gen", p), [payload] * 4)
+        self.assertEqual(len(self.sent), 4)
+        self.assertEqual(self.handler.coalescing_stats()["coalesced"], 0)
+
+class TestReplaySlots(unittest.TestCase):
+    PAYLOAD = {"inputs": "x", "parameters": {"do_sample": True, "temperature": 0.9}}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.handlers = []
+
+    def tearDown(self):
+        for handler in self.handlers:
+            handler.close()
+        self.tmp.cleanup()
+
+    def make_handler(self):
+        with mock.patch.object(config, "LLM_CACHE_SAMPLED", True):
+            handler = LLM_API_Handler("test-key", cache=ResponseCache(os.path.join(self.tmp.name, "cache.sqlite")))
+        self.handlers.append(handler)
+        return handler
+
+    def scoped_keys(self, handler, scope, delay=0.0):
+        with replay_scope(scope):
+            keys = []
+            for _ in range(3):
+                time.sleep(delay)
+                keys.append(handler._cache_key("http://gen", self.PAYLOAD))
+            return keys
+
+    def test_scoped_slots_do_not_depend_on_thread_order(self):
+        sequential = self.make_handler()
+        expected = {scope: self.scoped_keys(sequential, scope) for scope in ("0:0", "0:1", "0:2", "0:3")}
+        self.assertEqual(len({key for keys in expected.values() for key in keys}), 12)
+
+        concurrent = self.make_handler()
+        rng = random.Random(0)
+        got = {}
+        def worker(scope, delay):
+            got[scope] = self.scoped_keys(concurrent, scope, delay)
+        threads = [threading.Thread(target=worker, args=(scope, rng.random() * 0.01)) for scope in reversed(list(expected))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(got, expected)
+
+    def test_unscoped_slots_count_occurrences(self):
+        first, second = self.make_handler(), self.make_handler()
+        keys = [first._cache_key("http://gen", self.PAYLOAD) for _ in range(3)]
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual([second._cache_key("http://gen", self.PAYLOAD) for _ in range(3)], keys)
+        self.assertNotIn(keys[0], self.scoped_keys(second, "0:0"))
+
+class FakeResponse:
+    def __init__(self, status_code, name):
+        self.status_code = status_code
+        self.name = name
+        self.ok = status_code < 400
+        self.headers = {}
+
+class TestHedgedRequests(unittest.TestCase):
+    HEDGE_AFTER = 0.05
+
+    def setUp(self):
+        with mock.patch.object(config, "LLM_CACHE_ENABLED", False):
+            self.handler = LLM_API_Handler("test-key")
+        self.controller = EndpointController(4, adaptive=False, hedge_budget=1.0)
+        for _ in range(config.LATENCY_MIN_SAMPLES):
+            self.controller.record_response(self.HEDGE_AFTER)
+        self.posts = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.handler.close()
+
+    def script(self, *calls):
+        """session.post answers its n-th call after calls[n][0] seconds with calls[n][1] (a status or an exception)."""
+        def fake_post(endpoint_url, json=None, timeout=None):
+            with self.lock:
+                n = len(self.posts)
+                self.posts.append(n)
+            delay, outcome = calls[n]
+            time.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return FakeResponse(outcome, "primary" if n == 0 else "hedge")
+        self.posts.clear()
+        self.handler.session.post = fake_post
+
+    def send(self):
+        return self.handler._send_hedged(self.controller, "http://gen", {"inputs": "x"}, "generation", 10)
+
+    def test_first_usable_response_wins(self):
+        self.script((1.0, 200), (0.0, 200))
+        self.assertEqual(self.send().name, "hedge")
+        self.assertEqual(self.controller.stats()["hedges"], 1)
+        self.assertEqual(self.controller.stats()["hedge_wins"], 1)
+
+    def test_throttled_responses_are_skipped(self):
+        self.script((0.3, 200), (0.0, 429))
+        self.assertEqual(self.send().name, "primary")
+        self.assertEqual(self.controller.stats()["hedge_wins"], 0)
+        self.script((0.1, 503), (0.2, 200))
+        self.assertEqual(self.send().name, "hedge")
+        self.assertEqual(self.controller.stats()["hedge_wins"], 1)
+
+    def test_loser_that_has_not_started_is_cancelled(self):
+        # With one hedge worker the duplicate queues behind the primary and never starts.
+        self.handler._hedge_executor.shutdown()
+        self.handler._hedge_executor = ThreadPoolExecutor(max_workers=1)
+        self.script((0.3, 200), (0.0, 200))
+        self.assertEqual(self.send().name, "primary")
+        self.handler._hedge_executor.shutdown(wait=True)
+        self.assertEqual(self.posts, [0])
+        self.assertEqual(self.controller.stats()["hedges"], 1)
+        self.assertEqual(self.controller.stats()["hedge_wins"], 0)
+
+    def test_both_failing_falls_back_to_primary(self):
+        self.script((0.1, 503), (0.0, 429))
+        response = self.send()
+        self.assertEqual((response.name, response.status_code), ("primary", 503))
+        self.script((0.1, requests.exceptions.Timeout("slow")), (0.0, 503))
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.send()
+        self.assertEqual(self.controller.stats()["hedges"], 2)
+        self.assertEqual(self.controller.stats()["hedge_wins"], 0)
+
+    def test_no_hedge_before_enough_samples(self):
+        self.controller = EndpointController(4, adaptive=False, hedge_budget=1.0)
+        self.script((0.1, 200))
+        self.assertEqual(self.send().name, "primary")
+        self.assertEqual(self.posts, [0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+# test_map_elites_pipeline.py
+# Checks that MAP-Elites with the pipelined evaluator writes byte-identical logs and archives
+# to the thread-pool path, using a deterministic stand-in for every LLM call and a fixed seed.
+
+import hashlib
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import config
+from algorithm.map_elites import MAPElitesAlgorithm
+from cfg_generator import CFGPromptGenerator
+from evaluation import PipelinedSolutionEvaluator, SolutionEvaluator
+from task_loader import TaskLoader
+
+def _digest(*parts) -> int:
+    return int.from_bytes(hashlib.sha256("|".join(map(str, parts)).encode()).digest()[:8], "big")
+
+class FakeLLMHandler:
+    """Answers every call the evaluators and MAP-Elites make with a function of its inputs."""
+    def generate_solution(self, prompt):
+        d = _digest(prompt)
+        return f"Step 1: use item {d % 7}.\nStep 2: finish {d % 11}."
+
+    def evaluate_solution_with_scores(self, problem_text, solution):
+        d = _digest(problem_text, solution)
+        return {"safety": d % 5 + 1.0, "feasibility": d // 5 % 5 + 1.0, "effectiveness": d // 25 % 5 + 1.0}
+
+    def generate_variations_for_step(self, solution):
+        return [f"variation {_digest(solution, i) % 4}" for i in range(5)]
+
+    def check_nli_entailment_batch(self, pairs):
+        return [1.0 if p == h else (_digest(p, h) % 10) / 10 for p, h in pairs]
+
+    def get_embeddings(self, texts):
+        return np.array([[(_digest(text) % 1000) / 100, len(text) / 30] for text in texts])
+
+    def get_embeddings_batch(self, texts, batch_size=32):
+        return [self.get_embeddings(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+
+class StubUMAP:
+    def transform(self, embeddings):
+        return np.asarray(embeddings)[:, :2]
+
+class TestPipelinedMAPElites(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        missing = os.path.join(self.tmp.name, "missing")
+        patcher = mock.patch.multiple(
+            config, LLM_CACHE_ENABLED=False, EVALUATION_WORKERS=4, NUM_GENERATIONS=5, POPULATION_SIZE=8,
+            NUM_INITIAL_POPULATION=8, ARCHIVE_BACKEND="grid",
+            UMAP_MODEL_PATH=missing, UMAP_BOUNDS_PATH=missing, UMAP_PROMPT_DATASET_PATH=missing,
+            UMAP_EMBEDDINGS_PATH=missing, UMAP_COORDS_PATH=missing)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cfg_generator = CFGPromptGenerator(config.CFG_RULES_PATH)
+        self.task_loader = TaskLoader(config.MACGYVER_DATASET_PATH)
+
+    def run_map_elites(self, name, make_evaluator, fixed_problem_id=None):
+        results_dir = os.path.join(self.tmp.name, name)
+        os.makedirs(results_dir)
+        handler = FakeLLMHandler()
+        random.seed(0)
+        np.random.seed(0)
+        with mock.patch.object(config, "RESULTS_DIR", results_dir):
+            algorithm = MAPElitesAlgorithm(self.cfg_generator, self.task_loader, make_evaluator(handler),
+                                           handler, StubUMAP())
+            algorithm.fixed_problem_id = fixed_problem_id
+            algorithm.run()
+        outputs = {}
+        for file_name in sorted(os.listdir(results_dir)):
+            if file_name != config.CHECKPOINT_FILENAME:
+                with open(os.path.join(results_dir, file_name), "rb") as f:
+                    outputs[file_name] = f.read()
+        return outputs, algorithm.fitness_memo.stats()
+
+    def test_pipelined_matches_thread_pool(self):
+        # With one problem, children often repeat a genotype, so the memo's claims are exercised too.
+        for fixed_problem_id in (None, self.task_loader.problems[0]['problem_id']):
+            thread_pool = self.run_map_elites(f"pool_{fixed_problem_id}", SolutionEvaluator, fixed_problem_id)
+            pipelined = self.run_map_elites(
+                f"pipelined_{fixed_problem_id}",
+                lambda handler: PipelinedSolutionEvaluator(handler, stage_workers={"generate": 3, "score": 2},
+                                                           queue_size=2),
+                fixed_problem_id)
+            outputs, memo_stats = thread_pool
+            self.assertIn("map_elites_final_archive.json", outputs)
+            self.assertTrue(set(MAPElitesAlgorithm.LOG_FILES) <= set(outputs))
+            self.assertEqual(list(pipelined[0]), list(outputs))
+            for file_name, content in pipelined[0].items():
+                self.assertEqual(content, outputs[file_name], file_name)
+            self.assertEqual(pipelined[1], memo_stats)
+        self.assertGreater(memo_stats["reused"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+# test_map_elites_resume.py
+# Checks that a MAP-Elites run resumed from a checkpoint continues bit-identically to an
+# uninterrupted run, using stubbed LLM components and a fixed seed.
+
+import hashlib
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import config
+from algorithm.map_elites import MAPElitesAlgorithm
+from cfg_generator import CFGPromptGenerator
+from task_loader import TaskLoader
+
+def _digest(*parts) -> int:
+    return int.from_bytes(hashlib.sha256("|".join(map(str, parts)).encode()).digest()[:8], "big")
+
+class StubHandler:
+    """Embeddings from a hash of the text, plus replay slots counted like LLM_API_Handler._sample_slots."""
+    def __init__(self):
+        self._sample_slots = {}
+
+    def next_slot(self, key: str) -> int:
+        slot = self._sample_slots.get(key, 0)
+        self._sample_slots[key] = slot + 1
+        return slot
+
+    def get_embeddings(self, texts):
+        return np.array([[(_digest(text) % 1000) / 100, len(text) / 30] for text in texts])
+
+    def get_embeddings_batch(self, texts, batch_size=32):
+        return [self.get_embeddings(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+
+class StubEvaluator:
+    """Scores depend on the prompt and on the handler's replay slot, as replayed samples would."""
+    def __init__(self, handler: StubHandler):
+        self.handler = handler
+
+    def evaluate_prompt(self, prompt_text, problem_text):
+        rng = random.Random(_digest(prompt_text, self.handler.next_slot(problem_text)))
+        scores = [rng.randint(1, 5) for _ in range(3)]
+        return {"raw_divergent": rng.random() * 2, "raw_convergent": float(np.prod(scores)) ** (1 / 3),
+                "scores": scores, "solution_text": f"Step 1: {rng.random():.6f}"}
+
+class StubUMAP:
+    def transform(self, embeddings):
+        return np.asarray(embeddings)[:, :2]
+
+class TestResume(unittest.TestCase):
+    GENERATIONS = 6
+    INTERRUPTED_AFTER = 3
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        missing = os.path.join(self.tmp.name, "missing")
+        patcher = mock.patch.multiple(
+            config, LLM_CACHE_ENABLED=False, EVALUATION_WORKERS=1, CHECKPOINT_INTERVAL=1,
+            POPULATION_SIZE=6, NUM_INITIAL_POPULATION=6, ARCHIVE_BACKEND="grid", PIPELINED_EVALUATION=False,
+            UMAP_MODEL_PATH=missing, UMAP_BOUNDS_PATH=missing, UMAP_PROMPT_DATASET_PATH=missing,
+            UMAP_EMBEDDINGS_PATH=missing, UMAP_COORDS_PATH=missing)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.cfg_generator = CFGPromptGenerator(config.CFG_RULES_PATH)
+        self.task_loader = TaskLoader(config.MACGYVER_DATASET_PATH)
+
+    def make_algorithm(self, results_dir):
+        handler = StubHandler()
+        with mock.patch.object(config, "RESULTS_DIR", results_dir):
+            algorithm = MAPElitesAlgorithm(self.cfg_generator, self.task_loader, StubEvaluator(handler),
+                                           handler, StubUMAP())
+        # One problem, so mutated children often repeat a genotype and the fitness memo is used.
+        algorithm.fixed_problem_id = self.task_loader.problems[0]['problem_id']
+        return algorithm
+
+    def run_generations(self, results_dir, generations, resume=False):
+        algorithm = self.make_algorithm(results_dir)
+        with mock.patch.multiple(config, RESULTS_DIR=results_dir, NUM_GENERATIONS=generations):
+            algorithm.run(resume=resume)
+        return algorithm
+
+    @staticmethod
+    def read_outputs(results_dir):
+        outputs = {}
+        for name in sorted(os.listdir(results_dir)):
+            if name != config.CHECKPOINT_FILENAME:
+                with open(os.path.join(results_dir, name), "rb") as f:
+                    outputs[name] = f.read()
+        return outputs
+
+    def test_resume_is_bit_identical(self):
+        straight_dir = os.path.join(self.tmp.name, "straight")
+        resumed_dir = os.path.join(self.tmp.name, "resumed")
+        os.makedirs(straight_dir)
+        os.makedirs(resumed_dir)
+
+        random.seed(0)
+        np.random.seed(0)
+        straight = self.run_generations(straight_dir, self.GENERATIONS)
+        straight_rng = (random.getstate(), np.random.get_state()[1].tolist())
+
+        random.seed(0)
+        np.random.seed(0)
+        self.run_generations(resumed_dir, self.INTERRUPTED_AFTER)
+        # The crashed run got further than its checkpoint: logged lines and RNG draws are lost.
+        for name in MAPElitesAlgorithm.LOG_FILES:
+            with open(os.path.join(resumed_dir, name), "a") as f:
+                f.write('{"partial": true}\n')
+        random.seed(1)
+        np.random.seed(1)
+        resumed = self.run_generations(resumed_dir, self.GENERATIONS, resume=True)
+        resumed_rng = (random.getstate(), np.random.get_state()[1].tolist())
+
+        straight_outputs = self.read_outputs(straight_dir)
+        self.assertIn("map_elites_archive_gen_5.json", straight_outputs)
+        self.assertTrue(set(MAPElitesAlgorithm.LOG_FILES) <= set(straight_outputs))
+        self.assertEqual(list(self.read_outputs(resumed_dir)), list(straight_outputs))
+        for name, content in self.read_outputs(resumed_dir).items():
+            self.assertEqual(content, straight_outputs[name], name)
+
+        self.assertEqual(resumed.llm_handler._sample_slots, straight.llm_handler._sample_slots)
+        self.assertGreater(straight.fitness_memo.stats()["reused"], 0)
+        self.assertEqual(resumed.fitness_memo.stats(), straight.fitness_memo.stats())
+        self.assertEqual(resumed.evaluations, straight.evaluations)
+        self.assertEqual(resumed_rng, straight_rng)
+
+if __name__ == "__main__":
+    unittest.main()
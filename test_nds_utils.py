@@ -0,0 +1,51 @@
+# test_nds_utils.py
+# Property tests for the non-dominated sorting fast paths.
+# Every path must return the same fronts, in the same order, as the reference implementation.
+
+import random
+import unittest
+
+import numpy as np
+
+from algorithm.nds_utils import (
+    fast_non_dominated_sort,
+    _fast_non_dominated_sort_reference,
+    _non_dominated_sort_2d,
+    _non_dominated_sort_broadcast,
+)
+
+def random_population(rng: random.Random, n: int, num_objectives: int = 2, levels: int = 6):
+    """Scores drawn from a few discrete levels, so ties and duplicates are frequent."""
+    return [{"scores": [rng.randint(0, levels) / 2 for _ in range(num_objectives)]} for _ in range(n)]
+
+class TestNonDominatedSortPaths(unittest.TestCase):
+    def test_two_objective_sweep_matches_reference(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            population = random_population(rng, rng.randint(1, 60), levels=rng.choice([2, 5, 50]))
+            values = np.array([ind['scores'] for ind in population], dtype=float)
+            self.assertEqual(_non_dominated_sort_2d(values), _fast_non_dominated_sort_reference(population))
+
+    def test_broadcast_matches_reference(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            population = random_population(rng, rng.randint(1, 40), num_objectives=rng.choice([2, 3, 4]))
+            values = np.array([ind['scores'] for ind in population], dtype=float)
+            self.assertEqual(_non_dominated_sort_broadcast(values), _fast_non_dominated_sort_reference(population))
+
+    def test_dispatch_on_large_population(self):
+        rng = random.Random(2)
+        population = random_population(rng, 300, levels=40)
+        self.assertEqual(fast_non_dominated_sort(population), _fast_non_dominated_sort_reference(population))
+
+    def test_continuous_scores(self):
+        rng = np.random.default_rng(3)
+        for n in (1, 2, 7, 300):
+            population = [{"scores": list(row)} for row in rng.random((n, 2))]
+            self.assertEqual(fast_non_dominated_sort(population), _fast_non_dominated_sort_reference(population))
+
+    def test_empty_population(self):
+        self.assertEqual(fast_non_dominated_sort([]), [])
+
+if __name__ == "__main__":
+    unittest.main()
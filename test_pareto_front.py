@@ -0,0 +1,71 @@
+# test_pareto_front.py
+# Checks the incremental per-cell Pareto front against rebuilding the cell with NDS and crowding,
+# which is what MAPElitesAlgorithm._place_in_archive did before.
+
+import random
+import unittest
+
+from algorithm.nds_utils import fast_non_dominated_sort, calculate_crowding_distance
+from algorithm.pareto_front import ParetoFront
+
+def rebuild_cell(current, candidate, capacity):
+    combined = current + [candidate]
+    new_front = [combined[i] for i in fast_non_dominated_sort(combined)[0]]
+    if len(new_front) > capacity:
+        distances = calculate_crowding_distance(new_front)
+        sorted_by_crowding = sorted(zip(new_front, distances), key=lambda x: x[1], reverse=True)
+        new_front = [item for item, dist in sorted_by_crowding[:capacity]]
+    return new_front
+
+def ids(items):
+    return sorted(item['id'] for item in items)
+
+class TestParetoFront(unittest.TestCase):
+    def test_matches_rebuild_with_continuous_scores(self):
+        rng = random.Random(0)
+        for trial in range(100):
+            capacity = rng.randint(3, 12)
+            front, reference = ParetoFront(capacity=capacity), []
+            for i in range(rng.randint(1, 80)):
+                candidate = {"id": i, "scores": [rng.random(), rng.random()]}
+                front.insert(candidate)
+                reference = rebuild_cell(reference, candidate, capacity)
+                self.assertEqual(ids(front), ids(reference))
+
+    def test_matches_rebuild_with_ties_and_duplicates(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            front, reference = ParetoFront(), []
+            for i in range(rng.randint(1, 40)):
+                candidate = {"id": i, "scores": [rng.randint(0, 4), rng.randint(0, 4)]}
+                front.insert(candidate)
+                reference = rebuild_cell(reference, candidate, 10 ** 6)
+                self.assertEqual(ids(front), ids(reference))
+            scores = front.scores()
+            self.assertTrue(all(scores[i, 0] <= scores[i + 1, 0] and scores[i, 1] >= scores[i + 1, 1]
+                                for i in range(len(front) - 1)))
+
+    def test_matches_rebuild_with_ties_and_capacity(self):
+        # Discrete scores, as the evaluator's 1-5 ratings give: truncation must break
+        # crowding-distance ties the way the rebuild's stable sort did.
+        rng = random.Random(2)
+        for _ in range(1000):
+            capacity = rng.choice([3, 5])
+            front, reference = ParetoFront(capacity=capacity), []
+            for i in range(20):
+                candidate = {"id": i, "scores": [rng.choice([0.0, 0.5, 1.0, 1.5]), rng.randint(1, 5)]}
+                survived = front.insert(candidate)
+                reference = rebuild_cell(reference, candidate, capacity)
+                self.assertEqual(ids(front), ids(reference))
+                self.assertEqual(survived, any(item is candidate for item in reference))
+
+    def test_insert_reports_membership(self):
+        front = ParetoFront(capacity=3)
+        self.assertTrue(front.insert({"id": 0, "scores": [1.0, 1.0]}))
+        self.assertFalse(front.insert({"id": 1, "scores": [0.5, 1.0]}))
+        self.assertTrue(front.insert({"id": 2, "scores": [1.0, 1.0]}))  # duplicates are kept
+        self.assertTrue(front.insert({"id": 3, "scores": [2.0, 2.0]}))
+        self.assertEqual(ids(front), [3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# test_projection.py
+# Checks the kNN projector: exact training matches, interpolation quality, fidelity report and export.
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import config
+from projection import KNNProjector, projection_fidelity
+from umap_artifacts import file_sha256
+
+def smooth_map(embeddings: np.ndarray) -> np.ndarray:
+    """A stand-in for the UMAP transform: a smooth 8-D -> 2-D map."""
+    return np.stack([np.sin(embeddings[:, 0]) + embeddings[:, 1], np.cos(embeddings[:, 2]) * embeddings[:, 3]], axis=1)
+
+class TestKNNProjector(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(1500, 8)).astype(np.float32)
+        self.coords = smooth_map(self.embeddings.astype(float))
+        self.projector = KNNProjector(self.embeddings, self.coords, k=5,
+                                      meta={"umap_model_hash": file_sha256(config.UMAP_MODEL_PATH)})
+
+    def test_training_points_project_exactly(self):
+        np.testing.assert_allclose(self.projector.transform(self.embeddings[:50]), self.coords[:50])
+
+    def test_fidelity_report(self):
+        umap_min, umap_max = self.coords.min(axis=0), self.coords.max(axis=0)
+        loo = projection_fidelity(self.projector.leave_one_out(), self.coords, umap_min, umap_max, (4, 4))
+        self.assertEqual(set(loo), {"mean_error", "p95_error", "mean_relative_error", "bin_agreement"})
+        self.assertLess(loo["mean_relative_error"], 0.25)
+        self.assertGreater(loo["bin_agreement"], 0.5)
+        perfect = projection_fidelity(self.coords, self.coords, umap_min, umap_max, (4, 4))
+        self.assertEqual(perfect["bin_agreement"], 1.0)
+        self.assertEqual(perfect["mean_error"], 0.0)
+
+    def test_save_and_load_without_umap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "knn.npz")
+            self.projector.save(path)
+            loaded = KNNProjector.load(path)
+        queries = np.random.default_rng(1).normal(size=(10, 8))
+        np.testing.assert_allclose(loaded.transform(queries), self.projector.transform(queries), rtol=1e-6)
+        self.assertNotIn("umap", sys.modules)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# test_prompt_template.py
+# Checks that compiled prompt templates render exactly what the replace-based construction did.
+
+import random
+import unittest
+
+from prompt_template import PromptTemplate
+
+START = "<role_instruction> <thinking_instruction> Here is the Problem: <macgyver_problem_text>"
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_compiles_slots(self):
+        template = PromptTemplate(START)
+        self.assertTrue(template.compiled)
+        self.assertEqual(template.slots, ["role_instruction", "thinking_instruction", "macgyver_problem_text"])
+        self.assertFalse(PromptTemplate("a > <role_instruction>").compiled)
+
+    def test_render(self):
+        template = PromptTemplate(START)
+        genotype = {"role_instruction": "", "thinking_instruction": "  Think\n about PROBLEM_PLACEHOLDER. ",
+                    "macgyver_problem_text": "PROBLEM_PLACEHOLDER"}
+        self.assertEqual(template.render(genotype, "a leak"),
+                         "Think about a leak. Here is the Problem: a leak")
+        # Missing genes stay as written; the problem slot is still filled.
+        self.assertEqual(template.render({}, "a leak"),
+                         "<role_instruction> <thinking_instruction> Here is the Problem: a leak")
+        self.assertEqual(template.render_batch([(genotype, "x"), ({}, "y")]),
+                         [template.render(genotype, "x"), template.render({}, "y")])
+
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        alphabet = [" ", "\n\t", "a", "bc", "<", ">", "<role_instruction>", "<macgyver_problem_text>",
+                    "<opening_salutation>", "PROBLEM_PLACEHOLDER", "<other>", ""]
+        def text():
+            return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+        sources = [START, "Given <macgyver_problem_text>, <role_instruction><opening_salutation> <other>|"]
+        keys = ["role_instruction", "thinking_instruction", "macgyver_problem_text", "opening_salutation", "start"]
+        for source in sources:
+            template = PromptTemplate(source)
+            for _ in range(3000):
+                genotype = {key: text() for key in rng.sample(keys, rng.randint(0, len(keys)))}
+                problem_text = text() + " problem " + text()
+                self.assertEqual(template.render(genotype, problem_text),
+                                 template.render_reference(genotype, problem_text))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+# test_steady_state_map_elites.py
+# Checks that steady-state MAP-Elites spends exactly its evaluation budget across several workers,
+# logs a summary every log_interval evaluations and snapshots the archive every snapshot_interval,
+# with the log and snapshot files written outside the archive lock. LLM components are stubbed.
+
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import config
+from algorithm.steady_state_map_elites import SteadyStateMAPElites
+from cfg_generator import CFGPromptGenerator
+from task_loader import TaskLoader
+
+def _digest(*parts) -> int:
+    return int.from_bytes(hashlib.sha256("|".join(map(str, parts)).encode()).digest()[:8], "big")
+
+class StubHandler:
+    def get_embeddings(self, texts):
+        return np.array([[(_digest(text) % 1000) / 100, len(text) / 30] for text in texts])
+
+    def get_embeddings_batch(self, texts, batch_size=32):
+        return [self.get_embeddings(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+
+class StubEvaluator:
+    """Scores from a hash of the prompt; sleeps a little so the workers finish out of order."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def evaluate_prompt(self, prompt_text, problem_text):
+        with self._lock:
+            self.calls += 1
+        rng = random.Random(_digest(prompt_text, problem_text))
+        time.sleep(rng.random() / 100)
+        scores = [rng.randint(1, 5) for _ in range(3)]
+        return {"raw_divergent": rng.random() * 2, "raw_convergent": float(np.prod(scores)) ** (1 / 3),
+                "scores": scores, "solution_text": f"Step 1: {rng.random():.6f}"}
+
+class StubUMAP:
+    def transform(self, embeddings):
+        return np.asarray(embeddings)[:, :2]
+
+class TestSteadyState(unittest.TestCase):
+    WORKERS = 4
+    TOTAL_EVALUATIONS = 23
+    LOG_INTERVAL = 5
+    SNAPSHOT_INTERVAL = 10
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        missing = os.path.join(self.tmp.name, "missing")
+        patcher = mock.patch.multiple(
+            config, RESULTS_DIR=self.tmp.name, LLM_CACHE_ENABLED=False, ARCHIVE_BACKEND="grid",
+            NUM_INITIAL_POPULATION=6, STEADY_STATE_WORKERS=self.WORKERS,
+            STEADY_STATE_TOTAL_EVALUATIONS=self.TOTAL_EVALUATIONS, STEADY_STATE_LOG_INTERVAL=self.LOG_INTERVAL,
+            STEADY_STATE_SNAPSHOT_INTERVAL=self.SNAPSHOT_INTERVAL,
+            UMAP_MODEL_PATH=missing, UMAP_BOUNDS_PATH=missing, UMAP_PROMPT_DATASET_PATH=missing,
+            UMAP_EMBEDDINGS_PATH=missing, UMAP_COORDS_PATH=missing)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_jsonl(self, name):
+        with open(os.path.join(self.tmp.name, name)) as f:
+            return [json.loads(line) for line in f]
+
+    def test_budget_summaries_and_snapshots(self):
+        evaluator = StubEvaluator()
+        algorithm = SteadyStateMAPElites(CFGPromptGenerator(config.CFG_RULES_PATH),
+                                         TaskLoader(config.MACGYVER_DATASET_PATH), evaluator,
+                                         StubHandler(), StubUMAP())
+        write_threads = []
+        write_archive = algorithm._write_archive
+        write_summary = algorithm._write_generation_summary
+
+        def record(write):
+            def wrapper(*args):
+                write_threads.append(threading.current_thread().name)
+                return write(*args)
+            return wrapper
+
+        with mock.patch.object(algorithm, "_write_archive", record(write_archive)), \
+                mock.patch.object(algorithm, "_write_generation_summary", record(write_summary)):
+            random.seed(0)
+            algorithm.run()
+
+        self.assertEqual(algorithm.submitted, self.TOTAL_EVALUATIONS)
+        self.assertEqual(algorithm.completed, self.TOTAL_EVALUATIONS)
+        self.assertEqual(algorithm.evaluations, self.TOTAL_EVALUATIONS)
+        self.assertLessEqual(evaluator.calls, self.TOTAL_EVALUATIONS)
+        self.assertEqual(len(self.read_jsonl("map_elites_evaluated_prompts.jsonl")), self.TOTAL_EVALUATIONS)
+
+        # One summary per log interval, in order, plus the flushed partial interval.
+        expected = [5, 10, 15, 20, 23]
+        for name in ("map_elites_evolution_log.jsonl", "map_elites_hypervolume_log.jsonl"):
+            entries = self.read_jsonl(name)
+            self.assertEqual([entry["evaluations"] for entry in entries], expected, name)
+            self.assertEqual([entry["generation"] for entry in entries], [1, 2, 3, 4, 5], name)
+
+        snapshots = sorted(name for name in os.listdir(self.tmp.name) if name.startswith("map_elites_archive_eval_"))
+        self.assertEqual(snapshots, ["map_elites_archive_eval_10.json", "map_elites_archive_eval_20.json"])
+        for name, evaluations in (("map_elites_archive_eval_10.json", 10), ("map_elites_archive_eval_20.json", 20)):
+            with open(os.path.join(self.tmp.name, name)) as f:
+                self.assertLessEqual(sum(len(cell) for cell in json.load(f).values()), evaluations)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "map_elites_final_archive.json")))
+
+        # Interval writes run on the writer thread, not on a worker holding the lock;
+        # the last summary and the final archive are written by run() itself.
+        self.assertEqual(write_threads, ["steady-state-writer_0"] * 6 + [threading.current_thread().name] * 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+# test_sweep.py
+# Checks that sweep.py runs every problem into its own directory and that the shared limiter
+# caps the LLM requests in flight across all worker processes. build_components and
+# run_search are stubbed: each run sends a burst of requests through a real LLM_API_Handler
+# whose HTTP session is faked.
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import types
+import unittest
+from unittest import mock
+
+import config
+import sweep
+from llm_services import LLM_API_Handler
+
+PROBLEM_IDS = ["macgyver_351", "macgyver_358", "macgyver_363", "macgyver_369"]
+MAX_LLM_REQUESTS = 2
+REQUESTS_PER_RUN = 6
+
+class FakeResponse:
+    status_code = 200
+    ok = True
+    headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return [[1.0]]
+
+class SharedCounter:
+    """Requests in flight across processes, and the peak; inherited by forked workers."""
+    def __init__(self):
+        self.lock = multiprocessing.Lock()
+        self.in_flight = multiprocessing.Value('i', 0, lock=False)
+        self.peak = multiprocessing.Value('i', 0, lock=False)
+
+    def post(self, endpoint_url, json=None, timeout=None):
+        with self.lock:
+            self.in_flight.value += 1
+            self.peak.value = max(self.peak.value, self.in_flight.value)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight.value -= 1
+        return FakeResponse()
+
+def make_fake_main(counter: SharedCounter) -> types.ModuleType:
+    fake_main = types.ModuleType("main")
+
+    def build_components():
+        return LLM_API_Handler("test-key", max_workers=REQUESTS_PER_RUN), None, None, None
+
+    def run_search(algorithm_name, llm_handler, cfg_generator, task_loader, solution_evaluator,
+                   problem_id=None, resume=False):
+        if problem_id == "macgyver_369":
+            raise RuntimeError("stub failure")
+        llm_handler.session.post = counter.post
+        texts = [f"{problem_id} {i}" for i in range(REQUESTS_PER_RUN)]
+        llm_handler._map(lambda text: llm_handler.get_embeddings([text]), texts)
+        with open(os.path.join(config.RESULTS_DIR, "output.txt"), "w") as f:
+            f.write(f"{algorithm_name} {problem_id} {os.getpid()}")
+
+    fake_main.build_components = build_components
+    fake_main.run_search = run_search
+    return fake_main
+
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork", "the stubs reach the workers by forking")
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.results_root = tmp.name
+        self.counter = SharedCounter()
+        # Worker processes fork from the test process, so they see the stubs and the patched config.
+        for patcher in (mock.patch.dict(sys.modules, {"main": make_fake_main(self.counter)}),
+                        mock.patch.multiple(config, RESULTS_DIR=config.RESULTS_DIR, LLM_CACHE_ENABLED=False,
+                                            HEDGE_ENABLED=False, LLM_SCHEDULER_ENABLED=False,
+                                            DEFAULT_ENDPOINT_CONCURRENCY=REQUESTS_PER_RUN)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_sweep(self, **kwargs):
+        return sweep.sweep("map_elites", PROBLEM_IDS, processes=3, max_llm_requests=MAX_LLM_REQUESTS,
+                           results_root=self.results_root, seed=7, **kwargs)
+
+    def test_runs_write_only_into_their_directories(self):
+        summaries = {s["problem_id"]: s for s in self.run_sweep()}
+        self.assertEqual(sorted(summaries), sorted(PROBLEM_IDS))
+        self.assertEqual(sorted(os.listdir(self.results_root)),
+                         sorted([f"map_elites_{pid}" for pid in PROBLEM_IDS] + ["sweep_map_elites_summary.json"]))
+        for pid in PROBLEM_IDS:
+            run_dir = sweep.run_dir_for(self.results_root, "map_elites", pid)
+            self.assertEqual(summaries[pid]["run_dir"], run_dir)
+            if pid == "macgyver_369":
+                # A failing run is reported, leaves no completion marker and does not stop the others.
+                self.assertEqual(summaries[pid]["status"], "failed")
+                self.assertIn("stub failure", summaries[pid]["error"])
+                self.assertEqual(os.listdir(run_dir), ["run.log"])
+                continue
+            self.assertEqual(summaries[pid]["status"], "ok")
+            self.assertEqual(sorted(os.listdir(run_dir)), ["output.txt", "run.log", sweep.DONE_MARKER])
+            with open(os.path.join(run_dir, "output.txt")) as f:
+                algorithm, problem_id, worker_pid = f.read().split()
+            self.assertEqual((algorithm, problem_id), ("map_elites", pid))
+            self.assertNotEqual(int(worker_pid), os.getpid())
+
+        # Completed problems are skipped on the next sweep; the failed one is retried.
+        self.assertEqual([s["problem_id"] for s in self.run_sweep()], ["macgyver_369"])
+
+    def test_shared_limiter_caps_requests_in_flight(self):
+        statuses = [s["status"] for s in self.run_sweep() if s["problem_id"] != "macgyver_369"]
+        self.assertEqual(statuses, ["ok"] * (len(PROBLEM_IDS) - 1))
+        # 3 processes x 6 concurrent requests each would reach 18 without the shared limiter.
+        self.assertEqual(self.counter.peak.value, MAX_LLM_REQUESTS)
+        self.assertEqual(self.counter.in_flight.value, 0)
+
+if __name__ == "__main__":
+    unittest.main()
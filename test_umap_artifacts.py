@@ -0,0 +1,82 @@
+# test_umap_artifacts.py
+# Checks that the UMAP artifacts round-trip through save/load and are rejected once the
+# UMAP model, the prompt dataset or the artifact version they were built for changes.
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import config
+from umap_artifacts import compute_bounds, load_umap_artifacts, save_umap_artifacts
+
+class TestUMAPArtifacts(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.model_path = os.path.join(tmp.name, "umap_model.pkl")
+        self.dataset_path = os.path.join(tmp.name, "prompts.json")
+        for path, content in ((self.model_path, b"model v1"), (self.dataset_path, b'["a", "b"]')):
+            with open(path, "wb") as f:
+                f.write(content)
+        patcher = mock.patch.multiple(
+            config, RESULTS_DIR=tmp.name, UMAP_MODEL_PATH=self.model_path, UMAP_PROMPT_DATASET_PATH=self.dataset_path,
+            UMAP_BOUNDS_PATH=os.path.join(tmp.name, "umap_bounds.json"),
+            UMAP_EMBEDDINGS_PATH=os.path.join(tmp.name, "umap_embeddings.npy"),
+            UMAP_COORDS_PATH=os.path.join(tmp.name, "umap_coords.npy"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(20, 6))
+        self.coords = rng.normal(size=(20, 2))
+
+    def test_round_trip(self):
+        self.assertIsNone(load_umap_artifacts())
+        saved = save_umap_artifacts(self.embeddings, self.coords)
+        for mmap in (True, False):
+            loaded = load_umap_artifacts(mmap=mmap)
+            self.assertIsNotNone(loaded)
+            np.testing.assert_allclose(loaded["embeddings"], self.embeddings.astype(np.float32))
+            np.testing.assert_allclose(loaded["coords"], self.coords.astype(np.float32))
+            self.assertEqual(isinstance(loaded["coords"], np.memmap), mmap)
+            umap_min, umap_max = compute_bounds(self.coords)
+            self.assertEqual((loaded["umap_min"], loaded["umap_max"]), (umap_min, umap_max))
+            self.assertEqual((loaded["num_rows"], loaded["embedding_dim"], loaded["n_components"]), (20, 6, 2))
+            self.assertEqual({k: v for k, v in loaded.items() if k not in ("embeddings", "coords")}, saved)
+        self.assertFalse([name for name in os.listdir(config.RESULTS_DIR) if ".tmp" in name])
+
+    def test_changed_model_is_rejected(self):
+        save_umap_artifacts(self.embeddings, self.coords)
+        with open(self.model_path, "wb") as f:
+            f.write(b"model v2")
+        self.assertIsNone(load_umap_artifacts())
+        os.remove(self.model_path)
+        self.assertIsNone(load_umap_artifacts())
+
+    def test_changed_dataset_is_rejected(self):
+        save_umap_artifacts(self.embeddings, self.coords)
+        with open(self.dataset_path, "wb") as f:
+            f.write(b'["a", "b", "c"]')
+        self.assertIsNone(load_umap_artifacts())
+
+    def test_other_version_is_rejected(self):
+        save_umap_artifacts(self.embeddings, self.coords)
+        with mock.patch.object(config, "UMAP_ARTIFACTS_VERSION", config.UMAP_ARTIFACTS_VERSION + 1):
+            self.assertIsNone(load_umap_artifacts())
+        with open(config.UMAP_BOUNDS_PATH) as f:
+            meta = json.load(f)
+        meta.pop("version")
+        with open(config.UMAP_BOUNDS_PATH, "w") as f:
+            json.dump(meta, f)
+        self.assertIsNone(load_umap_artifacts())
+
+    def test_missing_arrays_are_rejected(self):
+        save_umap_artifacts(self.embeddings, self.coords)
+        os.remove(config.UMAP_COORDS_PATH)
+        self.assertIsNone(load_umap_artifacts())
+
+if __name__ == "__main__":
+    unittest.main()
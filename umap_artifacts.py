@@ -0,0 +1,88 @@
+# umap_artifacts.py
+# Versioned artifacts written by prepare_umap.py alongside the UMAP model:
+# the training embedding matrix, its UMAP projection and the derived BD bounds.
+# Loading them replaces re-embedding the whole prompt dataset on every MAP-Elites start.
+
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+def file_sha256(path: str) -> Optional[str]:
+    """sha256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compute_bounds(coords: np.ndarray, padding_ratio: float = 0.10) -> Tuple[List[float], List[float]]:
+    """Min/max of the projected coordinates, padded by padding_ratio of the range on each side."""
+    min_bounds = np.min(coords, axis=0)
+    max_bounds = np.max(coords, axis=0)
+    padding = (max_bounds - min_bounds) * padding_ratio
+    return (min_bounds - padding).tolist(), (max_bounds + padding).tolist()
+
+def atomic_save_npy(path: str, array: np.ndarray):
+    """Saves an array to a temporary file and renames it over `path`, so readers never see a partial file."""
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def save_umap_artifacts(embeddings: np.ndarray, coords: np.ndarray) -> Dict[str, Any]:
+    """
+    Saves the training embeddings (.npy), their UMAP coordinates (.npy) and the bounds (.json).
+    The metadata records the artifact version and the hashes of the model and the prompt dataset.
+    """
+    umap_min, umap_max = compute_bounds(coords)
+    atomic_save_npy(config.UMAP_EMBEDDINGS_PATH, np.asarray(embeddings, dtype=np.float32))
+    atomic_save_npy(config.UMAP_COORDS_PATH, np.asarray(coords, dtype=np.float32))
+    meta = {
+        "version": config.UMAP_ARTIFACTS_VERSION,
+        "umap_model_hash": file_sha256(config.UMAP_MODEL_PATH),
+        "prompt_dataset_hash": file_sha256(config.UMAP_PROMPT_DATASET_PATH),
+        "num_rows": int(coords.shape[0]),
+        "embedding_dim": int(embeddings.shape[1]),
+        "n_components": int(coords.shape[1]),
+        "umap_min": umap_min,
+        "umap_max": umap_max,
+    }
+    # The metadata is written last: it is what marks the artifacts as complete.
+    tmp_path = config.UMAP_BOUNDS_PATH + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, config.UMAP_BOUNDS_PATH)
+    print(f"Saved UMAP artifacts ({meta['num_rows']} rows) to {config.RESULTS_DIR}")
+    return meta
+
+def load_umap_artifacts(mmap: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Loads the artifacts if they match the current artifact version, UMAP model and prompt dataset.
+    Arrays are memory-mapped by default. Returns None (and says why) if they are missing or stale.
+    """
+    if not os.path.exists(config.UMAP_BOUNDS_PATH):
+        return None
+    with open(config.UMAP_BOUNDS_PATH, 'r') as f:
+        meta = json.load(f)
+    if meta.get("version") != config.UMAP_ARTIFACTS_VERSION:
+        print(f"UMAP artifacts have version {meta.get('version')}, expected {config.UMAP_ARTIFACTS_VERSION}.")
+        return None
+    if meta.get("umap_model_hash") != file_sha256(config.UMAP_MODEL_PATH):
+        print("UMAP artifacts were built for a different UMAP model.")
+        return None
+    if meta.get("prompt_dataset_hash") != file_sha256(config.UMAP_PROMPT_DATASET_PATH):
+        print("UMAP artifacts were built from a different prompt dataset.")
+        return None
+    mmap_mode = 'r' if mmap else None
+    try:
+        embeddings = np.load(config.UMAP_EMBEDDINGS_PATH, mmap_mode=mmap_mode)
+        coords = np.load(config.UMAP_COORDS_PATH, mmap_mode=mmap_mode)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Could not load UMAP artifact arrays ({e}).")
+        return None
+    return dict(meta, embeddings=embeddings, coords=coords)